@@ -1,15 +1,159 @@
 import requests
-import pandas as pd
-import random
-from dash import Dash, html, dcc, Input, Output, State, no_update, callback_context
-import plotly.express as px
+import itertools
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction, Patch, no_update, callback_context
 import plotly.graph_objects as go
-from datetime import datetime
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 import math
+import base64
+import zlib
+from functools import lru_cache
+from urllib.parse import quote
+import time
+import os
+import re
+import mimetypes
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from flask import Response, g, jsonify, request, send_from_directory
+import upstream
+import fastjson
+import metrics
+import jobs
+import compression
+from static_assets import AssetManifest, DIST_DIR, IMMUTABLE, accepted_encodings
+from singleflight import SingleFlight
+from scheduler import nominatim_scheduler, QueueTimeout, INTERACTIVE, BACKGROUND
+from gazetteer import get_gazetteer, GAZETTEER_ENABLED, SUGGEST_LIMIT
+from warmer import CacheWarmer, WARMER_ENABLED, WARMER_LEAD
+from forecast import parse_forecast, day_range
+from archive import history_archive, latest_day, ARCHIVE_YEARS
+from cache import (
+    LRUCache, geocode_cache, forecast_cache, normalize_city, quantize_coords, forecast_key, forecast_expiry,
+    cache_stats, GEOCODE_TTL, GEOCODE_NEGATIVE_TTL, FORECAST_REVALIDATE_TTL
+)
+
+fastjson.install()
 
-app = Dash(__name__)
+assets = AssetManifest.load()
+
+app = Dash(
+    __name__, background_callback_manager=jobs.callback_manager(), assets_ignore=assets.assets_ignore()
+)
 server = app.server
 
+@server.route("/assets/dist/<path:filename>")
+def dist_asset(filename):
+    # fingerprinted build output: cached for good, AVIF/WebP or pre-compressed copies when accepted
+    filename = assets.variant(f"dist/{filename}", request.headers.get("Accept", ""))[len("dist/"):]
+    encodings = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    response = None
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encoding in encodings and os.path.exists(os.path.join(DIST_DIR, filename + suffix)):
+            response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetypes.guess_type(filename)[0])
+            response.headers["Content-Encoding"] = encoding
+            break
+    if response is None:
+        response = send_from_directory(DIST_DIR, filename)
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    return response
+
+@server.route("/cache/stats")
+def cache_stats_endpoint():
+    return jsonify({
+        **cache_stats(),
+        "singleflight": {"geocode": geocode_flight.stats(), "forecast": forecast_flight.stats()},
+        "warmer": cache_warmer.stats(),
+        "breakers": upstream.breaker_stats(),
+        "scheduler": {"nominatim": nominatim_scheduler.stats()}
+    })
+
+@server.route("/api/suggest")
+def suggest_endpoint():
+    query = request.args.get("q", "")
+    if not GAZETTEER_ENABLED or len(query.strip()) < 2:
+        return jsonify([])
+    return jsonify(get_gazetteer().suggest(query, SUGGEST_LIMIT))
+
+@server.before_request
+def start_background_jobs():
+    if WARMER_ENABLED:
+        cache_warmer.start()
+    if metrics.METRICS_ENABLED:
+        metrics.flusher.start()
+        g.request_started = time.perf_counter()
+
+def route_name():
+    # the first output id for callbacks, the Dash route otherwise; "index" for the page itself
+    if request.path.endswith("/_dash-update-component"):
+        output = (request.get_json(silent=True) or {}).get("output", "")
+        return output.strip(".").split(".")[0] or "unknown"
+    endpoint = request.endpoint or "unknown"
+    if endpoint.startswith("/_dash"):
+        return endpoint.split("/")[1]
+    return "index" if endpoint.startswith("/") else endpoint
+
+# Response Compression: registered first so it runs last, after the metrics saw the plain size
+@server.after_request
+def compress_response(response):
+    return compression.compress_response(response, request, route_name())
+
+# Metrics
+@server.after_request
+def record_callback_metrics(response):
+    if metrics.METRICS_ENABLED and request.path.endswith("/_dash-update-component"):
+        callback = route_name()
+        metrics.CALLBACK_SECONDS.observe(time.perf_counter() - g.request_started, callback)
+        metrics.CALLBACK_BYTES.observe(response.calculate_content_length() or 0, callback)
+    return response
+
+@metrics.collector
+def cache_counters():
+    # the stats the caches and coalescers keep anyway, read only when a snapshot is written
+    caches = cache_stats()
+    flights = {"geocode": geocode_flight.stats(), "forecast": forecast_flight.stats()}
+    warmer = cache_warmer.stats()
+    breakers = upstream.breaker_stats()
+    return {
+        ("weather_cache_lookups_total", "Cache lookups by result.", ("cache", "result")): [
+            [[name, result], stats[counter]]
+            for name, stats in caches.items()
+            for result, counter in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses"),
+                                    ("stale_hit", "stale_hits"))
+        ],
+        ("weather_cache_errors_total", "SQLite errors in the shared cache.", ("cache",)): [
+            [[name], stats["errors"]] for name, stats in caches.items()
+        ],
+        ("weather_singleflight_total", "Upstream calls made or coalesced.", ("flight", "kind")): [
+            [[name, kind], stats[kind]]
+            for name, stats in flights.items() for kind in ("executions", "coalesced", "cross_process_coalesced")
+        ],
+        ("weather_breaker_opened_total", "Times a circuit breaker opened.", ("service",)): [
+            [[name], stats["opened"]] for name, stats in breakers.items()
+        ],
+        ("weather_breaker_open", "Workers whose circuit breaker is open or probing.", ("service",), "gauge"): [
+            [[name], int(stats["state"] != "closed")] for name, stats in breakers.items()
+        ],
+        ("weather_scheduler_queue_depth", "Requests queued for a Nominatim slot.", ("priority",), "gauge"): [
+            [[priority], depth] for priority, depth in nominatim_scheduler.waiting().items()
+        ],
+        ("weather_scheduler_timeouts_total", "Requests that gave up waiting for a Nominatim slot.", ()): [
+            [[], nominatim_scheduler.stats()["timeouts"]]
+        ],
+        ("weather_warmer_refreshes_total", "Background forecast refreshes by result.", ("result",)): [
+            [["ok"], warmer["refreshes"]], [["failed"], warmer["failures"]]
+        ],
+    }
+
+@server.route("/metrics")
+def metrics_endpoint():
+    if not metrics.METRICS_ENABLED:
+        return Response("metrics disabled\n", status=404, mimetype="text/plain")
+    return Response(metrics.render(metrics.merged()), mimetype="text/plain; version=0.0.4")
+
 # Weather Mapping
 WEATHER_MAPPING = {
     # Clear
@@ -55,20 +199,28 @@ WEATHER_MAPPING = {
     99: ("Gewitter mit starkem Hagel", "GewitterMitStarkemHagel.png", "thunder", "light-text"),
 }
 
-# Get Icons
+# Get Icons (fingerprinted names once the asset build ran, see static_assets.py)
 def get_weather_info(code):
-    return WEATHER_MAPPING.get(code, ("Unbekannt", "Unbekannt.png", "default", "light-text"))
+    desc, icon, bg_class, text_class = WEATHER_MAPPING.get(code, ("Unbekannt", "Unbekannt.png", "default", "light-text"))
+    return desc, assets.name(icon), bg_class, text_class
 
 def temperature_icon(temp):
-    if temp < 5: return "cold_temp.png"
-    if temp < 20: return "mild_temp.png"
-    return "hot_temp.png"
+    if temp < 5: return assets.name("cold_temp.png")
+    if temp < 20: return assets.name("mild_temp.png")
+    return assets.name("hot_temp.png")
 
 def wind_speed_icon(speed):
-    if speed < 10: return "low_wind.png"
-    if speed < 20: return "mild_wind.png"
-    if speed < 35: return "strong_wind.png"
-    return "very_strong_wind.png"
+    if speed < 10: return assets.name("low_wind.png")
+    if speed < 20: return assets.name("mild_wind.png")
+    if speed < 35: return assets.name("strong_wind.png")
+    return assets.name("very_strong_wind.png")
+
+def icon_image(name, className, **kwargs):
+    # one cached sprite for every icon instead of a request per icon
+    sprite = assets.sprite_class(name)
+    if sprite:
+        return html.Div(className=f"{className} icon-sprite {sprite}", role="img", **kwargs)
+    return html.Img(src=f"/assets/{name}", className=className, **kwargs)
 
 # Wind Direction
 def wind_direction_cardinal(degree):
@@ -79,151 +231,56 @@ def wind_direction_cardinal(degree):
     return directions[index]
 
 
-def create_wind_compass(wind_speed, wind_direction):
-    display_direction = (wind_direction + 180) % 360
-    angle = math.radians(display_direction)
-    arrow_length = 26
-    end_x = 50 + arrow_length * math.sin(angle)
-    end_y = 50 - arrow_length * math.cos(angle)
-    
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        x=[50], y=[50],
-        mode='markers',
-        marker=dict(
-            size=95, 
-            color='rgba(255, 71, 87, 0.08)', 
-            line=dict(width=0)
-        ),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[50], y=[50],
-        mode='markers',
-        marker=dict(
-            size=85, 
-            color='rgba(255,255,255,0.08)', 
-            line=dict(width=2, color='rgba(255,255,255,0.25)')
-        ),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    directions = ["S", "SO", "O", "NO", "N", "NW", "W", "SW"]
-    angles = [0, 45, 90, 135, 180, 225, 270, 315]
-    
-    for dir_text, dir_angle in zip(directions, angles):
+# Wind Compass: the rings, labels and centre dots never change, only the arrow follows the direction
+WIND_COMPASS_RENDERER = os.environ.get("WIND_COMPASS_RENDERER", "plotly")
+COMPASS_LABELS = list(zip(["S", "SO", "O", "NO", "N", "NW", "W", "SW"], [0, 45, 90, 135, 180, 225, 270, 315]))
+COMPASS_ARROW_LENGTH = 26
+COMPASS_HEAD_LENGTH = 9
+COMPASS_HEAD_ANGLE = math.radians(30)
+COMPASS_LINE_END = 0.96
+COMPASS_SHADOW = 1.2
+
+def compass_arrow(wind_direction):
+    angle = math.radians((wind_direction + 180) % 360)
+    end_x = 50 + COMPASS_ARROW_LENGTH * math.sin(angle)
+    end_y = 50 - COMPASS_ARROW_LENGTH * math.cos(angle)
+    line_x = 50 + COMPASS_ARROW_LENGTH * COMPASS_LINE_END * math.sin(angle)
+    line_y = 50 - COMPASS_ARROW_LENGTH * COMPASS_LINE_END * math.cos(angle)
+    head = [
+        (end_x - COMPASS_HEAD_LENGTH * math.sin(angle - side), end_y + COMPASS_HEAD_LENGTH * math.cos(angle - side))
+        for side in (COMPASS_HEAD_ANGLE, -COMPASS_HEAD_ANGLE)
+    ]
+    return (end_x, end_y), (line_x, line_y), head
+
+@lru_cache(maxsize=1)
+def compass_base():
+    skip = dict(hoverinfo='skip', showlegend=False)
+    under = [
+        go.Scatter(x=[50], y=[50], mode='markers',
+                   marker=dict(size=95, color='rgba(255, 71, 87, 0.08)', line=dict(width=0)), **skip),
+        go.Scatter(x=[50], y=[50], mode='markers',
+                   marker=dict(size=85, color='rgba(255,255,255,0.08)', line=dict(width=2, color='rgba(255,255,255,0.25)')), **skip)
+    ]
+    for dir_text, dir_angle in COMPASS_LABELS:
         rad = math.radians(dir_angle)
-        radius = 58.5
-        x = 50 + radius * math.sin(rad)
-        y = 50 - radius * math.cos(rad)
-        
         is_cardinal = dir_text in ["N", "O", "S", "W"]
-        font_size = 15 if is_cardinal else 11
-        
-        fig.add_trace(go.Scatter(
-            x=[x], y=[y],
+        under.append(go.Scatter(
+            x=[50 + 58.5 * math.sin(rad)], y=[50 - 58.5 * math.cos(rad)],
             mode='text',
             text=dir_text,
             textfont=dict(
-                size=font_size, 
+                size=15 if is_cardinal else 11,
                 color='rgba(255,255,255,0.9)' if is_cardinal else 'rgba(255,255,255,0.6)',
                 family='Arial, sans-serif',
                 weight='bold' if is_cardinal else 'normal'
             ),
-            hoverinfo='skip',
-            showlegend=False
+            **skip
         ))
-    
-    head_length = 9
-    head_angle = math.radians(30)
-    
-    line_end_factor = 0.96
-    line_end_x = 50 + (arrow_length * line_end_factor) * math.sin(angle)
-    line_end_y = 50 - (arrow_length * line_end_factor) * math.cos(angle)
-    
-    shadow_offset = 1.2
-    fig.add_trace(go.Scatter(
-        x=[50 + shadow_offset, line_end_x + shadow_offset], 
-        y=[50 - shadow_offset, line_end_y - shadow_offset],
-        mode='lines',
-        line=dict(color='rgba(0,0,0,0.25)', width=3),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[50, line_end_x], y=[50, line_end_y],
-        mode='lines',
-        line=dict(color='#ff4757', width=3),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[50, line_end_x], y=[50, line_end_y],
-        mode='lines',
-        line=dict(color='rgba(255,255,255,0.3)', width=0.5),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    head_x1 = end_x - head_length * math.sin(angle - head_angle)
-    head_y1 = end_y + head_length * math.cos(angle - head_angle)
-    head_x2 = end_x - head_length * math.sin(angle + head_angle)
-    head_y2 = end_y + head_length * math.cos(angle + head_angle)
-    
-    fig.add_trace(go.Scatter(
-        x=[end_x + shadow_offset, head_x1 + shadow_offset, head_x2 + shadow_offset],
-        y=[end_y - shadow_offset, head_y1 - shadow_offset, head_y2 - shadow_offset],
-        mode='lines',
-        fill='toself',
-        fillcolor='rgba(0,0,0,0.25)',
-        line=dict(color='rgba(0,0,0,0.25)', width=0),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[end_x, head_x1, head_x2],
-        y=[end_y, head_y1, head_y2],
-        mode='lines',
-        fill='toself',
-        fillcolor='#ff4757',
-        line=dict(color='#ff4757', width=0),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[end_x, head_x1, head_x2, end_x],
-        y=[end_y, head_y1, head_y2, end_y],
-        mode='lines',
-        line=dict(color='rgba(255,255,255,0.3)', width=1),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[50], y=[50],
-        mode='markers',
-        marker=dict(size=12, color='rgba(255,255,255,0.3)'),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[50], y=[50],
-        mode='markers',
-        marker=dict(size=8, color='white'),
-        hoverinfo='skip',
-        showlegend=False
-    ))
-    
-    fig.update_layout(
+    over = [
+        go.Scatter(x=[50], y=[50], mode='markers', marker=dict(size=12, color='rgba(255,255,255,0.3)'), **skip),
+        go.Scatter(x=[50], y=[50], mode='markers', marker=dict(size=8, color='white'), **skip)
+    ]
+    layout = go.Layout(
         xaxis=dict(range=[-15, 115], visible=False, showgrid=False),
         yaxis=dict(range=[-15, 115], visible=False, showgrid=False, scaleanchor="x", scaleratio=1),
         plot_bgcolor='rgba(0,0,0,0)',
@@ -234,86 +291,354 @@ def create_wind_compass(wind_speed, wind_direction):
         hovermode=False,
         showlegend=False
     )
-    
-    return fig
+    return [t.to_plotly_json() for t in under], [t.to_plotly_json() for t in over], layout.to_plotly_json()
+
+def compass_arrow_traces(wind_direction):
+    (end_x, end_y), (line_x, line_y), ((head_x1, head_y1), (head_x2, head_y2)) = compass_arrow(wind_direction)
+    s = COMPASS_SHADOW
+    skip = dict(type='scatter', mode='lines', hoverinfo='skip', showlegend=False)
+    return [
+        dict(x=[50 + s, line_x + s], y=[50 - s, line_y - s], line=dict(color='rgba(0,0,0,0.25)', width=3), **skip),
+        dict(x=[50, line_x], y=[50, line_y], line=dict(color='#ff4757', width=3), **skip),
+        dict(x=[50, line_x], y=[50, line_y], line=dict(color='rgba(255,255,255,0.3)', width=0.5), **skip),
+        dict(x=[end_x + s, head_x1 + s, head_x2 + s], y=[end_y - s, head_y1 - s, head_y2 - s],
+             fill='toself', fillcolor='rgba(0,0,0,0.25)', line=dict(color='rgba(0,0,0,0.25)', width=0), **skip),
+        dict(x=[end_x, head_x1, head_x2], y=[end_y, head_y1, head_y2],
+             fill='toself', fillcolor='#ff4757', line=dict(color='#ff4757', width=0), **skip),
+        dict(x=[end_x, head_x1, head_x2, end_x], y=[end_y, head_y1, head_y2, end_y],
+             line=dict(color='rgba(255,255,255,0.3)', width=1), **skip)
+    ]
+
+@lru_cache(maxsize=360)
+def compass_figure(direction):
+    under, over, layout = compass_base()
+    return {"data": under + compass_arrow_traces(direction) + over, "layout": layout}
+
+def create_wind_compass(wind_speed, wind_direction):
+    # memoised per whole degree; the returned dict is shared and must not be mutated
+    return compass_figure(round(wind_direction) % 360)
+
+def svg_data_uri(svg):
+    # single-quoted attributes and a short safe list keep the URI close to the raw SVG size
+    return "data:image/svg+xml;utf8," + quote(svg.replace('"', "'"), safe=" /:=',.()-")
+
+@lru_cache(maxsize=360)
+def compass_svg(direction):
+    # same geometry as the Plotly figure, y flipped for SVG; 1 unit is about 0.92 px at 120 px
+    (end_x, end_y), (line_x, line_y), head = compass_arrow(direction)
+    s = COMPASS_SHADOW
+    def pts(points, dx=0.0, dy=0.0):
+        return " ".join(f"{x + dx:.2f},{100 - y + dy:.2f}" for x, y in points)
+    labels = "".join(
+        f'<text x="{50 + 58.5 * math.sin(math.radians(a)):.2f}" y="{100 - (50 - 58.5 * math.cos(math.radians(a))):.2f}" '
+        + (f'font-size="16" font-weight="bold" fill="rgba(255,255,255,0.9)">{t}</text>' if t in "NOSW"
+           else f'font-size="12" fill="rgba(255,255,255,0.6)">{t}</text>')
+        for t, a in COMPASS_LABELS
+    )
+    head = [(end_x, end_y)] + head
+    svg = (
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="-15 -15 130 130">'
+        '<circle cx="50" cy="50" r="51.5" fill="rgba(255,71,87,0.08)"/>'
+        '<circle cx="50" cy="50" r="46" fill="rgba(255,255,255,0.08)" stroke="rgba(255,255,255,0.25)" stroke-width="2"/>'
+        f'<g font-family="Arial, sans-serif" text-anchor="middle" dominant-baseline="central">{labels}</g>'
+        f'<polyline points="{pts([(50, 50), (line_x, line_y)], s, s)}" stroke="rgba(0,0,0,0.25)" stroke-width="3"/>'
+        f'<polyline points="{pts([(50, 50), (line_x, line_y)])}" stroke="#ff4757" stroke-width="3"/>'
+        f'<polygon points="{pts(head, s, s)}" fill="rgba(0,0,0,0.25)"/>'
+        f'<polygon points="{pts(head)}" fill="#ff4757" stroke="rgba(255,255,255,0.3)" stroke-width="1"/>'
+        '<circle cx="50" cy="50" r="6.5" fill="rgba(255,255,255,0.3)"/>'
+        '<circle cx="50" cy="50" r="4.3" fill="white"/>'
+        '</svg>'
+    )
+    return svg_data_uri(svg)
+
+def create_wind_compass_svg(wind_speed, wind_direction):
+    return html.Img(src=compass_svg(round(wind_direction) % 360), className="wind-compass-svg",
+                    style={'width': '100px', 'height': '100px'})
+
+@metrics.timed("wind_compass")
+def wind_compass_component(wind_speed, wind_direction, style=None):
+    if WIND_COMPASS_RENDERER == "svg":
+        return create_wind_compass_svg(wind_speed, wind_direction)
+    figure = create_wind_compass(wind_speed, wind_direction)
+    if style is None:
+        return dcc.Graph(figure=figure, config={'displayModeBar': False})
+    return dcc.Graph(figure=figure, config={'displayModeBar': False}, style=style)
 
 # Data Fetching
-def geocode_city(city_name):
-    url = "https://nominatim.openstreetmap.org/search"
+geocode_flight = SingleFlight("geocode")
+forecast_flight = SingleFlight("forecast")
+
+def cached_geocode(key):
+    cached = geocode_cache.get(key)
+    if cached is None:
+        return None
+    if cached["coords"]:
+        return tuple(cached["coords"]), None
+    return None, "Stadt nicht gefunden"
+
+@metrics.timed("geocode")
+def geocode_city(city_name, priority=INTERACTIVE):
+    # bundled gazetteer first, Nominatim only for places it does not know
+    if GAZETTEER_ENABLED:
+        coords = get_gazetteer().lookup(city_name)
+        if coords is not None:
+            return coords, None
+
+    key = normalize_city(city_name)
+    result = cached_geocode(key)
+    if result is not None:
+        return result
+    if priority == INTERACTIVE:
+        nominatim_scheduler.boost(key)
+    # concurrent lookups of the same city share one upstream call and one scheduler slot
+    return geocode_flight.do(
+        key, lambda: geocode_upstream(city_name, key, priority), recheck=lambda: cached_geocode(key)
+    )
+
+def geocode_background(city_name):
+    return geocode_city(city_name, priority=BACKGROUND)
+
+def geocode_upstream(city_name, key, priority=INTERACTIVE):
+    url = f"{upstream.NOMINATIM_URL}/search"
     params = {"q": city_name, "countrycodes": "de", "format": "json", "limit": 1}
-    headers = {"User-Agent": "WeatherDashboardStudentProject/1.0"}
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if data:
-                return (float(data[0]["lat"]), float(data[0]["lon"])), None
+        response = upstream.get(
+            url, params=params, timeout=upstream.GEOCODE_TIMEOUT, service="nominatim",
+            scheduler=nominatim_scheduler, priority=priority, key=key
+        )
+        # only an empty answer means the place does not exist; a throttled or failing Nominatim says nothing about it
+        if response.status_code != 200:
+            raise requests.HTTPError(f"Nominatim answered {response.status_code}", response=response)
+        data = upstream.decode(response)
+        if data:
+            coords = (float(data[0]["lat"]), float(data[0]["lon"]))
+            geocode_cache.set(key, {"coords": coords}, GEOCODE_TTL)
+            return coords, None
+        geocode_cache.set(key, {"coords": None}, GEOCODE_NEGATIVE_TTL)
         return None, "Stadt nicht gefunden"
-    except Exception as e:
+    except (QueueTimeout, requests.RequestException, sqlite3.Error, ValueError, KeyError) as e:
+        metrics.count_error("geocode", e)
+        # coordinates do not go stale in any way that matters, an expired entry beats an error
+        stale = geocode_cache.get_stale(key)
+        if stale is not None and stale[0]["coords"]:
+            return tuple(stale[0]["coords"]), None
+        throttled = getattr(getattr(e, "response", None), "status_code", None) == 429
+        if isinstance(e, QueueTimeout) or throttled:
+            return None, "Zu viele Anfragen, bitte gleich erneut versuchen"
         return None, "Verbindungsfehler"
 
-def fetch_weather(lat, lon):
+FORECAST_BATCH_SIZE = int(os.environ.get("FORECAST_BATCH_SIZE", 50))
+
+def forecast_url(lats, lons):
+    return (
+        f"{upstream.OPEN_METEO_URL}/v1/forecast?"
+        f"latitude={','.join(str(lat) for lat in lats)}&longitude={','.join(str(lon) for lon in lons)}"
+        f"&current=temperature_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m,wind_direction_10m"
+        f"&hourly=temperature_2m,precipitation"
+        f"&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,weather_code,sunrise,sunset"
+        f"&timezone=Europe%2FBerlin"
+    )
+
+@metrics.timed("fetch")
+def fetch_weather_batch(coords_list):
+    cells = [quantize_coords(lat, lon) for lat, lon in coords_list]
+    results = {}
+    leading = {}
+    waiting = {}
+    stale = []
+    fallback = {}
+    down = upstream.breaker("open_meteo").is_open()
+    for cell in dict.fromkeys(cells):
+        key = forecast_key(*cell)
+        cached = forecast_cache.get(key)
+        if cached is not None:
+            results[cell] = cached
+            continue
+        # stale-while-revalidate: a recently expired entry is answered right away and refreshed in the background,
+        # an older one only while Open-Meteo is down; otherwise it is refetched and kept in case that fails
+        entry = forecast_cache.get_stale(key)
+        if entry is not None and (down or time.time() - entry[1] <= FORECAST_REVALIDATE_TTL):
+            results[cell] = {**entry[0], "stale": True}
+            stale.append(cell)
+            continue
+        if entry is not None:
+            fallback[cell] = {**entry[0], "stale": True}
+        # cells already being fetched by another thread are awaited, the rest are fetched here
+        call, leader = forecast_flight.begin(key)
+        if leader:
+            leading[cell] = call
+        else:
+            waiting[cell] = call
+
+    fetched = {}
     try:
-        url = (
-            f"https://api.open-meteo.com/v1/forecast?"
-            f"latitude={lat}&longitude={lon}"
-            f"&current=temperature_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m,wind_direction_10m"
-            f"&hourly=temperature_2m,precipitation"
-            f"&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,weather_code,sunrise,sunset"
-            f"&timezone=Europe%2FBerlin"
-        )
-        response = requests.get(url, timeout=10)
-        return response.json() if response.status_code == 200 else {}
-    except:
-        return {}
+        with forecast_flight.process_lock([forecast_key(*cell) for cell in leading]):
+            fetched = fetch_forecast_cells(list(leading))
+    finally:
+        for cell, call in leading.items():
+            forecast_flight.finish(forecast_key(*cell), call, fetched.get(cell, {}))
+    results.update(fetched)
+
+    for cell, call in waiting.items():
+        results[cell] = forecast_flight.wait(call)
+    for cell, data in fallback.items():
+        if "current" not in results.get(cell, {}):
+            results[cell] = data
+
+    if stale:
+        revalidate(stale)
+    return [results.get(cell, {}) for cell in cells]
+
+REVALIDATE_WORKERS = int(os.environ.get("REVALIDATE_WORKERS", 2))
+revalidate_pool = ThreadPoolExecutor(max_workers=REVALIDATE_WORKERS, thread_name_prefix="revalidate")
+revalidating = set()
+revalidating_lock = threading.Lock()
+
+def revalidate(cells):
+    # one background refresh per cell and worker, however many requests see the stale entry
+    with revalidating_lock:
+        cells = [cell for cell in cells if cell not in revalidating]
+        revalidating.update(cells)
+    if not cells:
+        return
+    if jobs.in_job():
+        # a background-callback job exits right after answering, a pool thread would be killed with it
+        revalidate_cells(cells)
+    else:
+        revalidate_pool.submit(revalidate_cells, cells)
+
+def revalidate_cells(cells):
+    try:
+        with forecast_flight.process_lock([forecast_key(*cell) for cell in cells]):
+            fetch_forecast_cells(cells)
+    finally:
+        with revalidating_lock:
+            revalidating.difference_update(cells)
+
+def fetch_forecast_cells(cells, recheck=True, expires=None):
+    results = {}
+    missing = []
+    for cell in cells:
+        # another worker may have filled the shared cache while we waited for the lock
+        cached = forecast_cache.get(forecast_key(*cell)) if recheck else None
+        if cached is not None:
+            results[cell] = cached
+            forecast_flight.count("cross_process_coalesced")
+        else:
+            missing.append(cell)
+
+    # Open-Meteo accepts comma-separated coordinates and answers with one entry per location
+    for start in range(0, len(missing), FORECAST_BATCH_SIZE):
+        chunk = missing[start:start + FORECAST_BATCH_SIZE]
+        try:
+            response = upstream.get(forecast_url(*zip(*chunk)), timeout=upstream.FORECAST_TIMEOUT, service="open_meteo")
+            if response.status_code != 200:
+                # counted like any other failure, the cells are simply left out of this answer
+                raise requests.HTTPError(f"Open-Meteo answered {response.status_code}", response=response)
+            payload = upstream.decode(response)
+        except (requests.RequestException, ValueError) as e:
+            metrics.count_error("forecast", e)
+            continue
+        if isinstance(payload, dict):
+            payload = [payload]
+        for cell, data in zip(chunk, payload):
+            if "current" in data:
+                forecast_cache.set(forecast_key(*cell), data, expires=expires or forecast_expiry())
+            results[cell] = data
+    return results
+
+def fetch_weather(lat, lon):
+    return fetch_weather_batch([(lat, lon)])[0]
+
+def forecast_expires(coords):
+    return forecast_cache.expires(forecast_key(*quantize_coords(*coords)))
+
+def refresh_forecast(coords):
+    # refreshed ahead of the update boundary, so the entry has to outlive it
+    cell = quantize_coords(*coords)
+    fetched = fetch_forecast_cells([cell], recheck=False, expires=forecast_expiry(time.time() + WARMER_LEAD))
+    # popular cities get the archive's newest days here rather than on a dashboard render, on the archive pool so
+    # a slow archive API does not hold up the remaining refreshes
+    coverage = history_archive.coverage(*coords)
+    if coverage is not None:
+        update_archive(coords, coverage[0])
+    return "current" in fetched.get(cell, {})
+
+cache_warmer = CacheWarmer(geocode_background, forecast_expires, refresh_forecast)
 
 # UI Components
-def build_forecast_cards(daily_df, city_name):
-    if daily_df.empty or len(daily_df) < 7:
+@metrics.timed("forecast_cards")
+def build_forecast_cards(forecast, city_name):
+    if len(forecast) < 7:
         return html.Div([], className="cards-container forecast-container")
-    
+
+    days = forecast.daily_time[1:7].tolist()
+    lows = forecast.daily["temperature_2m_min"][1:7].tolist()
+    highs = forecast.daily["temperature_2m_max"][1:7].tolist()
+    codes = forecast.weather_code[1:7].tolist()
+
     cards = []
-    for i, row in daily_df.iloc[1:7].iterrows():
-        time_obj = pd.to_datetime(row["time"]) if isinstance(row["time"], str) else row["time"]
-        date_label = time_obj.strftime("%a %d.%m")
-        weather_desc, icon_file, _, _ = get_weather_info(row.get("weather_code", 0))
-        
+    for i, (day, low, high, code) in enumerate(zip(days, lows, highs, codes)):
+        weather_desc, icon_file, _, _ = get_weather_info(code)
         cards.append(html.Div([
-            html.H4(date_label, className="card-title"),
-            html.Img(src=f"/assets/{icon_file}", className="card-icon"),
-            html.P(f"{round(row['temperature_2m_min'])}° / {round(row['temperature_2m_max'])}°", className="card-value")
-        ], className="card card-animate forecast-card", style={"animationDelay": f"{0.4 + len(cards)*0.1}s"}))
-    
-    return html.Div(cards, className="cards-container forecast-container")
+            html.H4(day.strftime("%a %d.%m"), className="card-title"),
+            icon_image(icon_file, "card-icon"),
+            html.P(f"{round(low)}° / {round(high)}°", className="card-value")
+        ], className="card card-animate forecast-card", style={"animationDelay": f"{0.4 + i*0.1}s"}))
 
-def build_sun_card(daily_df):
-    if daily_df.empty or "sunrise" not in daily_df.columns or "sunset" not in daily_df.columns:
-        return html.Div()
+    return html.Div(cards, className="cards-container forecast-container")
 
-    sunrise = pd.to_datetime(daily_df.iloc[0]["sunrise"])
-    sunset = pd.to_datetime(daily_df.iloc[0]["sunset"])
+# Sun/Moon Arc: geometry is precomputed once, per request only progress and colours change
+BERLIN = ZoneInfo("Europe/Berlin")
+SUN_ARC_CX, SUN_ARC_CY, SUN_ARC_R = 70, 0, 52
+SUN_ARC_WIDTH, SUN_ARC_HEIGHT = 140, 100
+SUN_ARC_ANGLES = np.pi * np.arange(101) / 100
+SUN_ARC_X = SUN_ARC_CX + SUN_ARC_R * np.cos(SUN_ARC_ANGLES)
+SUN_ARC_Y = SUN_ARC_HEIGHT - (SUN_ARC_CY + SUN_ARC_R * np.sin(SUN_ARC_ANGLES))
+SUN_ARC_PATH = f"M{SUN_ARC_X[0]:.2f} {SUN_ARC_Y[0]:.2f}A{SUN_ARC_R} {SUN_ARC_R} 0 0 0 "
+
+def to_berlin(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif isinstance(value, np.datetime64):
+        value = value.astype("datetime64[s]").item()
+    return value.replace(tzinfo=BERLIN) if value.tzinfo is None else value.astimezone(BERLIN)
+
+@lru_cache(maxsize=512)
+def sun_arc_svg(permille, arc_color, celestial_color, glow_color):
+    steps = permille // 10
+    a = math.pi * permille / 1000
+    celestial_x = SUN_ARC_CX + SUN_ARC_R * math.cos(a)
+    celestial_y = SUN_ARC_HEIGHT - (SUN_ARC_CY + SUN_ARC_R * math.sin(a))
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {SUN_ARC_WIDTH} {SUN_ARC_HEIGHT}">'
+        f'<path d="{SUN_ARC_PATH}{SUN_ARC_X[-1]:.2f} {SUN_ARC_Y[-1]:.2f}" fill="none" stroke="rgba(255,255,255,0.18)" stroke-width="9"/>'
+        f'<path d="{SUN_ARC_PATH}{SUN_ARC_X[steps]:.2f} {SUN_ARC_Y[steps]:.2f}" fill="none" stroke="{arc_color}" stroke-width="9"/>'
+        f'<circle cx="{celestial_x:.2f}" cy="{celestial_y:.2f}" r="21" fill="{glow_color}" fill-opacity="0.4"/>'
+        f'<circle cx="{celestial_x:.2f}" cy="{celestial_y:.2f}" r="16" fill="{celestial_color}"/>'
+        '</svg>'
+    )
+    return svg_data_uri(svg)
 
-    if sunrise.tz is None:
-        sunrise = sunrise.tz_localize("Europe/Berlin")
-    else:
-        sunrise = sunrise.tz_convert("Europe/Berlin")
+@metrics.timed("sun_card")
+def build_sun_card(forecast, now=None):
+    if not len(forecast) or np.isnat(forecast.sunrise[0]) or np.isnat(forecast.sunset[0]):
+        return html.Div()
 
-    if sunset.tz is None:
-        sunset = sunset.tz_localize("Europe/Berlin")
-    else:
-        sunset = sunset.tz_convert("Europe/Berlin")
+    sunrise = to_berlin(forecast.sunrise[0])
+    sunset = to_berlin(forecast.sunset[0])
 
-    now = datetime.now(tz=sunrise.tz)
+    now = datetime.now(tz=BERLIN) if now is None else now
     is_night = now < sunrise or now > sunset
 
     day_length = sunset - sunrise
-    night_length = pd.Timedelta(hours=24) - day_length
+    night_length = timedelta(hours=24) - day_length
 
     if is_night:
         if now > sunset:
             progress = (now - sunset).total_seconds() / night_length.total_seconds()
         else:
-            progress = (now - (sunset - pd.Timedelta(hours=24))).total_seconds() / night_length.total_seconds()
+            progress = (now - (sunset - timedelta(hours=24))).total_seconds() / night_length.total_seconds()
         title_text = "Mond"
         duration_display = f"{night_length.seconds // 3600} Std. {(night_length.seconds % 3600) // 60} Min."
         duration_label = "Nachtdauer"
@@ -347,62 +672,13 @@ def build_sun_card(daily_df):
         glow_color = "#FFA500"
 
     progress = max(0, min(1, progress))
-
-    cx, cy, r = 70, 0, 52
-    width, height = 140, 100
-
-    angles = [math.pi * i / 100 for i in range(101)]
-    x_full = [cx + r * math.cos(a) for a in angles]
-    y_full = [cy + r * math.sin(a) for a in angles]
-
-    steps = int(progress * 100)
-    prog_angles = [math.pi * i / 100 for i in range(steps + 1)]
-    x_prog = [cx + r * math.cos(a) for a in prog_angles]
-    y_prog = [cy + r * math.sin(a) for a in prog_angles]
-
-    a = math.pi * progress
-    celestial_x = cx + r * math.cos(a)
-    celestial_y = cy + r * math.sin(a)
-
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(x=x_full, y=y_full, mode="lines",
-                             line=dict(color="rgba(255,255,255,0.18)", width=9),
-                             hoverinfo="skip", showlegend=False))
-
-    fig.add_trace(go.Scatter(x=x_prog, y=y_prog, mode="lines",
-                             line=dict(color=arc_color, width=9),
-                             hoverinfo="skip", showlegend=False))
-
-    fig.add_trace(go.Scatter(x=[celestial_x], y=[celestial_y], mode="markers",
-                             marker=dict(size=42, color=glow_color, opacity=0.4),
-                             hoverinfo="skip", showlegend=False))
-
-    fig.add_trace(go.Scatter(x=[celestial_x], y=[celestial_y], mode="markers",
-                             marker=dict(size=32, color=celestial_color),
-                             hoverinfo="skip", showlegend=False))
-
-    fig.update_layout(
-        xaxis=dict(range=[0, width], visible=False),
-        yaxis=dict(range=[0, height], visible=False, scaleanchor="x", scaleratio=1),
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        width=width,
-        height=height,
-        margin=dict(l=0, r=0, t=10, b=0),
-        hovermode=False,
-        showlegend=False
-    )
+    arc = sun_arc_svg(int(progress * 1000), arc_color, celestial_color, glow_color)
 
     return html.Div([
 
         html.H3(title_text, className="card-title"),
         
-        dcc.Graph(
-            figure=fig,
-            config={"displayModeBar": False},
-            className="sun-moon-graph"
-        ),
+        html.Img(src=arc, className="sun-moon-graph"),
    
         html.P(duration_display, className="card-value", style={"margin": "10px 0 4px 0"}),
         html.P(duration_label, className="card-subtitle", style={"margin": "0 0 20px 0"}),
@@ -432,106 +708,301 @@ def build_sun_card(daily_df):
        })
 
 
-# Animation Components
-def create_rain_drops():
-    drops = []
-    for i in range(120):
-        style = {
-            'left': f'{random.uniform(-5, 105)}%',
-            'top': f'{random.uniform(-100, 0)}px',
-            'height': f'{random.uniform(20, 50)}px',
-            'width': f'{random.uniform(1, 2)}px',
-            'opacity': 0.6 * random.uniform(0.8, 1.2),
-            'animationDelay': f'{random.uniform(0, 2)}s',
-            'animationDuration': f'{random.uniform(1.5, 3)}s'
-        }
-        drops.append(html.Div(className="rain-drop", style=style))
-    return drops, {'display': 'block', 'transition': 'opacity 1s ease'}
-
-def create_snow_flakes():
-    layers = []
-    for layer in range(3):
-        speed_factor = 1 + layer * 0.6
-        size_factor = 0.6 + layer * 0.4
-        duration = 60 / speed_factor
-        
-        flakes = []
-        for i in range(50):
-            style = {
-                "left": f"{random.uniform(-10, 110)}%",
-                "top": f"{random.uniform(0, 100)}vh",
-                "fontSize": f"{random.uniform(12, 24) * size_factor}px",
-                "opacity": random.uniform(0.7, 1.0),
-                "--sway-distance": f"{random.uniform(30, 80)}px",
-                "--sway-duration": f"{random.uniform(3,7)}s",
-                "--rotation-speed": f"{random.uniform(8,20)}s"
-            }
-            flakes.append(html.Div(className="snowflake", style=style))
-            flakes.append(html.Div(className="snowflake", style={**style, "top": f"{float(style['top'][:-2]) + 100}vh"}))
-        
-        layers.append(html.Div(className="snow-layer", style={"--fall-duration": f"{duration}s"}, children=flakes))
-    return layers, {"display": "block"}
-
-def create_clouds(is_partly_cloudy):
-    layers = []
-    count = 10 if is_partly_cloudy else 20
-    base_opacity = 0.85 if is_partly_cloudy else 0.95
-    base_width = 200 if is_partly_cloudy else 250
-    base_height = 80 if is_partly_cloudy else 100
-    
-    for layer in range(3):
-        scale = 1 - layer * 0.2
-        duration = 60 + layer * 30
-        
-        clouds = []
-        for _ in range(count):
-            style = {
-                'left': f'{random.uniform(0, 100)}vw',
-                'top': f'{random.uniform(10, 80 + layer * 10)}vh',
-                'width': f'{random.uniform(base_width * scale * 0.7, base_width * scale * 1.3)}px',
-                'height': f'{random.uniform(base_height * scale * 0.8, base_height * scale * 1.2)}px',
-                'opacity': random.uniform(base_opacity * 0.8, base_opacity * 1.2),
-                'filter': f'blur({1 + layer * 0.5}px)'
-            }
-            clouds.append(html.Div(className="cloud", style=style))
-            clouds.append(html.Div(className="cloud", style={**style, 'left': f'{float(style["left"][:-2]) + 100}vw'}))
-        
-        layers.append(html.Div(className="cloud-layer", style={'--scroll-duration': f'{duration}s'}, children=clouds))
-    return layers, {'display': 'block', 'transition': 'opacity 1s ease'}
-
-def create_thunder():
-    layers = []
-    for layer in range(4):
-        scale = 1 - layer * 0.2
-        containers = []
-        
-        for _ in range(12):
-            style = {
-                'left': f'{random.uniform(0, 100)}vw',
-                'top': f'{random.uniform(10, 50 + layer * 15)}vh',
-                'width': f'{random.uniform(280 * scale * 0.7, 280 * scale * 1.3)}px',
-                'height': f'{random.uniform(110 * scale * 0.8, 110 * scale * 1.2)}px'
+# Hourly Charts
+@lru_cache(maxsize=1)
+def empty_figure():
+    return {"data": [], "layout": {
+        "paper_bgcolor": "rgba(0,0,0,0)",
+        "plot_bgcolor": "rgba(0,0,0,0)",
+        "xaxis": {"visible": False},
+        "yaxis": {"visible": False}
+    }}
+
+@lru_cache(maxsize=2)
+def chart_theme(is_dark):
+    # validated and expanded once per theme, the plotly template included
+    font_color = "#1a1a1a" if is_dark else "#ffffff"
+    grid_color = "rgba(0,0,0,0.25)" if is_dark else "rgba(255,255,255,0.3)"
+    return go.Layout(
+        template="plotly_white" if is_dark else "plotly_dark",
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(255,255,255,0.1)" if is_dark else "rgba(0,0,0,0.2)",
+        font=dict(color=font_color, size=16),
+        margin=dict(t=100, l=80, r=80, b=90),
+        hovermode="x unified",
+        xaxis=dict(type="date", showgrid=True, gridcolor=grid_color, gridwidth=2),
+        yaxis=dict(showgrid=True, gridcolor=grid_color, gridwidth=2),
+        title_font=dict(size=22, color=font_color)
+    ).to_plotly_json()
+
+def chart_layout(title, yaxis_title, is_dark, **overrides):
+    theme = chart_theme(is_dark)
+    return {
+        **theme,
+        "title": {**theme["title"], "text": f"<b>{title}</b>"},
+        "yaxis": {**theme["yaxis"], "title": {"text": f"<b>{yaxis_title}</b>"}},
+        **overrides
+    }
+
+def typed_array(values, dtype="f4"):
+    # plotly.js typed-array spec, base64 instead of a JSON list of floats
+    values = np.ascontiguousarray(values, dtype=f"<{dtype}")
+    return {"dtype": dtype, "bdata": base64.b64encode(values.tobytes()).decode()}
+
+def time_axis(times):
+    # hourly series are evenly spaced, x0 + dx replaces the list of timestamps
+    step = np.diff(times)
+    if len(times) > 1 and (step == step[0]).all():
+        return {"x": None, "x0": str(times[0]), "dx": int(step[0] / np.timedelta64(1, "ms"))}
+    return {"x": np.datetime_as_string(times).tolist(), "x0": None, "dx": None}
+
+HOURLY_SERIES = {
+    "temperature_2m": {"title": "Temperaturverlauf", "yaxis_title": "Temperatur (°C)"},
+    "precipitation": {"title": "Niederschlag", "yaxis_title": "Niederschlag (mm)"}
+}
+
+@lru_cache(maxsize=2)
+def hourly_trace(name):
+    # validated on first use rather than at import, plotly's validators are slow to load
+    hovertemplate = f"time=%{{x}}<br>{name}=%{{y}}<extra></extra>"
+    if name == "precipitation":
+        return go.Bar(marker=dict(color="#45b7d1"), opacity=0.85, hovertemplate=hovertemplate, showlegend=False).to_plotly_json()
+    return go.Scatter(
+        mode="lines", line=dict(color="#ff6b6b", width=5), fill="tozeroy", fillcolor="rgba(255,107,107,0.15)",
+        hovertemplate=hovertemplate, showlegend=False
+    ).to_plotly_json()
+
+def hourly_series(hourly_store, view):
+    times = np.array(hourly_store.get("time", []), dtype="datetime64[m]")
+    if view == "today":
+        start, end = day_range(times, datetime.now().date())
+    else:
+        start, end = 0, len(times)
+    view_label = "Heute" if view == "today" else "7 Tage"
+    return times[start:end], start, end, view_label
+
+@metrics.timed("hourly_charts")
+def build_hourly_figures(hourly_store, view, chart_state=None):
+    # returns both figures and the chart state; a Patch with just the arrays when the
+    # theme of the figures already on the page still matches
+    if not hourly_store or not hourly_store.get("time"):
+        return empty_figure(), empty_figure(), None
+
+    times, start, end, view_label = hourly_series(hourly_store, view)
+    theme = hourly_store.get("text_class")
+    is_dark = theme == "dark-text"
+    patch = chart_state == {"theme": theme}
+
+    figures = []
+    for name, series in HOURLY_SERIES.items():
+        values = hourly_store.get(name)
+        if not values or end <= start:
+            return empty_figure(), empty_figure(), None
+        data = {**time_axis(times), "y": typed_array(np.array(values[start:end], dtype=float))}
+        title = f"{series['title']} - {view_label}"
+        if patch:
+            figure = Patch()
+            for key, value in data.items():
+                figure["data"][0][key] = value
+            figure["layout"]["title"]["text"] = f"<b>{title}</b>"
+        else:
+            figure = {
+                "data": [{**hourly_trace(name), **data}],
+                "layout": chart_layout(title, series["yaxis_title"], is_dark)
             }
-            
-            content = [html.Div(className="thunder-cloud", style={'width': '100%', 'height': '100%', 'opacity': random.uniform(0.85, 1.0), 'filter': f'blur({2 + layer}px)'})]
-            
-            if random.random() < 0.15:
-                lightning_style = {
-                    '--bolt-height': f'{random.uniform(20, 35)}vh',
-                    '--skew': f'{random.choice([-8, -5, 0, 5, 8])}deg',
-                    '--flash-duration': f'{random.uniform(3, 5)}s',
-                    '--flash-delay': f'{random.uniform(0, 20)}s'
-                }
-                content.append(html.Div(className="cloud-lightning", children=[
-                    html.Div(className="lightning-bolt", style=lightning_style),
-                    html.Div(className="cloud-glow", style={'--flash-duration': lightning_style['--flash-duration'], '--flash-delay': lightning_style['--flash-delay']})
-                ]))
-            
-            containers.append(html.Div(className="thunder-cloud-container", style=style, children=content))
-            containers.append(html.Div(className="thunder-cloud-container", style={**style, 'left': f'{float(style["left"][:-2]) + 100}vw'}, children=content))
-        
-        layers.append(html.Div(className="thunder-layer", style={'--scroll-duration': '120s'}, children=containers))
-    return layers, {"display": "block"}
+        figures.append(figure)
+
+    return figures[0], figures[1], no_update if patch else {"theme": theme}
+
+
+# Multi-City Comparison
+COMPARE_MAX_CITIES = int(os.environ.get("COMPARE_MAX_CITIES", 12))
+COMPARE_GEOCODE_WORKERS = int(os.environ.get("COMPARE_GEOCODE_WORKERS", 2))
+COMPARE_COLORS = [
+    "#ff6b6b", "#45b7d1", "#feca57", "#1dd1a1", "#a29bfe", "#ff9ff3",
+    "#54a0ff", "#ff9f43", "#00d2d3", "#c8d6e5", "#ee5253", "#10ac84"
+]
+
+def parse_city_list(text):
+    cities = {}
+    for name in re.split(r"[,;\n]+", text or ""):
+        name = name.strip()
+        if name and normalize_city(name) not in cities:
+            cities[normalize_city(name)] = name
+    return list(cities.values())[:COMPARE_MAX_CITIES]
+
+def geocode_cities(names):
+    with ThreadPoolExecutor(max_workers=COMPARE_GEOCODE_WORKERS) as pool:
+        return list(pool.map(geocode_city, names))
+
+@metrics.timed("compare_stack")
+def stack_forecasts(payloads, coords_list):
+    # one (cities x hours) matrix per variable, built from the parsed per-response columns
+    forecasts = [parse_forecast(p, quantize_coords(*coords)) for p, coords in zip(payloads, coords_list)]
+    n = min(len(f.hourly_time) for f in forecasts)
+
+    time = forecasts[0].hourly_time[:n]
+    temp = np.array([f.hourly["temperature_2m"][:n] for f in forecasts]).reshape(len(forecasts), n)
+    precip = np.array([f.hourly["precipitation"][:n] for f in forecasts]).reshape(len(forecasts), n)
+
+    today = forecasts[0].day_slice(datetime.now().date())
+    today_min = np.fmin.reduce(temp[:, today], axis=1, initial=np.inf)
+    today_max = np.fmax.reduce(temp[:, today], axis=1, initial=-np.inf)
+
+    current = [p.get("current", {}) for p in payloads]
+    return {
+        "time": time,
+        "temperature_2m": temp,
+        "precipitation": precip,
+        "current_temp": np.array([c.get("temperature_2m") for c in current], dtype=float),
+        "weather_code": [c.get("weather_code", 0) for c in current],
+        "today_min": np.where(np.isfinite(today_min), today_min, np.nan),
+        "today_max": np.where(np.isfinite(today_max), today_max, np.nan),
+        "today_precip": np.nansum(precip[:, today], axis=1)
+    }
+
+def degrees(value):
+    # a missing reading is NaN after stacking, round() would raise on it
+    return "–" if np.isnan(value) else f"{round(value)}°"
+
+def build_compare_cards(names, stacked):
+    # names as the user typed them, .title() would turn "Halle (Saale)" into "Halle (saale)"
+    cards = []
+    for i, name in enumerate(names):
+        desc, icon_file, _, _ = get_weather_info(stacked["weather_code"][i])
+        low, high = stacked["today_min"][i], stacked["today_max"][i]
+        range_text = f"{degrees(low)} / {degrees(high)}" if not np.isnan(low) else "–"
+        current = stacked["current_temp"][i]
+        cards.append(html.Div([
+            html.H4(name, className="card-title"),
+            icon_image(icon_file, "card-icon", title=desc),
+            html.P(f"{round(current)} °C" if not np.isnan(current) else "–", className="card-value"),
+            html.P(f"{range_text} · {stacked['today_precip'][i]:.1f} mm", className="card-subtitle")
+        ], className="card card-animate forecast-card", style={"animationDelay": f"{0.1 + i * 0.05}s"}))
+    return cards
+
+@metrics.timed("compare_charts")
+def build_compare_figures(names, stacked, is_dark):
+    colors = [COMPARE_COLORS[i % len(COMPARE_COLORS)] for i in range(len(names))]
+    x = time_axis(stacked["time"])
+    temp_fig = {
+        "data": [
+            {"type": "scatter", "mode": "lines", "name": name, "line": {"color": color, "width": 3},
+             **x, "y": typed_array(row)}
+            for name, row, color in zip(names, stacked["temperature_2m"], colors)
+        ],
+        "layout": chart_layout("Temperaturvergleich - 7 Tage", "Temperatur (°C)", is_dark)
+    }
+    precip_fig = {
+        "data": [
+            {"type": "scatter", "mode": "lines", "name": name, "line": {"color": color, "width": 2, "shape": "hv"},
+             **x, "y": typed_array(row)}
+            for name, row, color in zip(names, stacked["precipitation"], colors)
+        ],
+        "layout": chart_layout("Niederschlagsvergleich - 7 Tage", "Niederschlag (mm)", is_dark)
+    }
+    return temp_fig, precip_fig
+
+
+# Weather Archive: past days, weeks and months from the local history store (see archive.py)
+ARCHIVE_VIEWS = {
+    # view: (days back, aggregation, label)
+    "month": (30, "daily", "30 Tage"),
+    "year": (365, "weekly", "1 Jahr"),
+    "years": (ARCHIVE_YEARS * 365, "monthly", f"{ARCHIVE_YEARS} Jahre"),
+}
+ARCHIVE_FREQ_LABELS = {"daily": "täglich", "weekly": "wöchentlich", "monthly": "monatlich"}
+ARCHIVE_WORKERS = int(os.environ.get("ARCHIVE_WORKERS", 1))
+# how often an open dashboard looks for a finished backfill (ms); a failed one waits ARCHIVE_RETRY seconds
+ARCHIVE_POLL_INTERVAL = int(os.environ.get("ARCHIVE_POLL_INTERVAL", 1000))
+ARCHIVE_RETRY = int(os.environ.get("ARCHIVE_RETRY", 60))
+archive_pool = ThreadPoolExecutor(max_workers=ARCHIVE_WORKERS, thread_name_prefix="archive")
+archive_updating = set()
+archive_failed = LRUCache(1024)
+archive_lock = threading.Lock()
+
+def update_archive(coords, start):
+    # upstream backfills stay off the request thread -> "ready", "loading" or "failed"
+    key = history_archive.location(*coords)[1]
+    with archive_lock:
+        if key in archive_updating:
+            return "loading"
+        if not history_archive.needs_update(*coords, start):
+            return "ready"
+        if archive_failed.get(key) is not None:
+            return "failed"
+        archive_updating.add(key)
+    if jobs.in_job():
+        # a background-callback job exits right after answering, see revalidate()
+        return "ready" if run_archive_update(key, coords, start) else "failed"
+    archive_pool.submit(run_archive_update, key, coords, start)
+    return "loading"
+
+def run_archive_update(key, coords, start):
+    updated = False
+    try:
+        updated = history_archive.update(*coords, start)
+    except OSError as e:
+        metrics.count_error("archive", e)
+    finally:
+        with archive_lock:
+            archive_updating.discard(key)
+            if not updated:
+                archive_failed.set(key, True, time.time() + ARCHIVE_RETRY)
+    return updated
+
+@metrics.timed("archive_charts")
+def build_archive_figures(history, view, is_dark):
+    _, freq, label = ARCHIVE_VIEWS[view]
+    suffix = f"{label} ({ARCHIVE_FREQ_LABELS[freq]})"
+    x = time_axis(history["time"])
+    band = {"type": "scatter", "mode": "lines", "line": {"width": 0}, "showlegend": False, **x}
+    temp_fig = {
+        "data": [
+            {**band, "name": "Min", "y": typed_array(history["temperature_2m_min"])},
+            {**band, "name": "Max", "y": typed_array(history["temperature_2m_max"]),
+             "fill": "tonexty", "fillcolor": "rgba(255,107,107,0.25)"},
+            {"type": "scatter", "mode": "lines", "name": "Mittel", "line": {"color": "#ff6b6b", "width": 3},
+             "showlegend": False, **x, "y": typed_array(history["temperature_2m_mean"])}
+        ],
+        "layout": chart_layout(f"Temperaturarchiv - {suffix}", "Temperatur (°C)", is_dark)
+    }
+    precip_fig = {
+        "data": [{"type": "bar", "name": "Niederschlag", "marker": {"color": "#45b7d1"}, "opacity": 0.85,
+                  "showlegend": False, **x, "y": typed_array(history["precipitation_sum"])}],
+        "layout": chart_layout(f"Niederschlagsarchiv - {suffix}", "Niederschlag (mm)", is_dark)
+    }
+    return temp_fig, precip_fig
+
+
+# Animation Parameters (the layers themselves are built in the browser by assets/particles.js)
+ANIMATION_VARIANTS = int(os.environ.get("ANIMATION_VARIANTS", 4))
+animation_rotation = itertools.count()
+
+def animation_key(container_class):
+    kinds = [kind for kind in ("rain", "snow", "thunder") if kind in container_class]
+    if "partly-cloudy" in container_class:
+        kinds.append("partly-cloudy")
+    elif "cloudy" in container_class:
+        kinds.append("cloudy")
+    return " ".join(kinds)
+
+@lru_cache(maxsize=64)
+def animation_spec(key, variant):
+    # a small fixed pool of seeded variants per weather class, built once per worker
+    kinds = key.split()
+    spec = {"key": key, "seed": zlib.crc32(f"{key}:{variant}".encode()) % 2 ** 31}
+    if "rain" in kinds:
+        spec["rain"] = {"count": 120}
+    if "snow" in kinds:
+        spec["snow"] = {"layers": 3, "count": 50}
+    if "partly-cloudy" in kinds:
+        spec["clouds"] = {"layers": 3, "count": 10, "partly": True}
+    elif "cloudy" in kinds:
+        spec["clouds"] = {"layers": 3, "count": 20, "partly": False}
+    if "thunder" in kinds:
+        spec["thunder"] = {"layers": 4, "count": 12, "lightning": 0.15}
+    return spec
 
 # Layout
 app.layout = html.Div([
@@ -553,7 +1024,7 @@ app.layout = html.Div([
         ], className="title-card fade-in"),
         html.Div([
             html.Label("Stadt eingeben", className="input-label"),
-            dcc.Input(id="city-input", type="text", placeholder="z. B. Berlin, Hamburg, München …", debounce=True, className="city-input", value="Berlin"),
+            dcc.Input(id="city-input", type="text", placeholder="z. B. Berlin, Hamburg, München …", debounce=True, className="city-input", value="Berlin", list="city-suggestions", autoComplete="off"),
         ], className="input-container fade-in"),
         html.Div(id="status-message", className="status-message"),
         html.Div(id="current-weather", className="cards-container"),
@@ -566,6 +1037,31 @@ app.layout = html.Div([
             html.Div(dcc.Graph(id="precip-hourly", config={'displayModeBar': False}), className="graph-card slide-up")
         ], id="hourly-graphs-container", className="hourly-graphs", style={'display': 'none'}),
 
+        html.Div([
+            html.Div([
+                html.Button(label, id=f"btn-archive-{view}", n_clicks=0,
+                            className="view-btn active" if view == "year" else "view-btn")
+                for view, (_, _, label) in ARCHIVE_VIEWS.items()
+            ], className="buttons-container"),
+            html.Div([
+                html.Div(dcc.Graph(id="archive-temp", config={'displayModeBar': False}), className="graph-card slide-up"),
+                html.Div(dcc.Graph(id="archive-precip", config={'displayModeBar': False}), className="graph-card slide-up")
+            ], className="hourly-graphs")
+        ], id="archive-container", style={'display': 'none'}),
+        html.Div(id="archive-status", className="status-message"),
+        dcc.Interval(id="archive-poll", interval=ARCHIVE_POLL_INTERVAL, disabled=True),
+
+        html.Div([
+            html.Label("Städte vergleichen", className="input-label"),
+            dcc.Input(id="compare-input", type="text", placeholder="z. B. Berlin, Hamburg, München", debounce=True, className="city-input"),
+        ], className="input-container fade-in"),
+        html.Div(id="compare-status", className="status-message"),
+        html.Div(id="compare-cards", className="cards-container forecast-container compare-container"),
+        html.Div([
+            html.Div(dcc.Graph(id="compare-temp", config={'displayModeBar': False}), className="graph-card slide-up"),
+            html.Div(dcc.Graph(id="compare-precip", config={'displayModeBar': False}), className="graph-card slide-up")
+        ], id="compare-graphs-container", className="hourly-graphs", style={'display': 'none'}),
+
     ], className="content-wrapper"),
 
    html.Div([
@@ -581,36 +1077,35 @@ app.layout = html.Div([
     ], style={"position": "fixed", "bottom": "10px", "left": "0", "width": "100%", "display": "flex", "justifyContent": "center", "gap": "10px", "opacity": "0.5", "zIndex": "1000"}),
 
     dcc.Store(id="temp-view-store", data="7days"),
+    dcc.Store(id="archive-view-store", data="year"),
+    dcc.Store(id="hourly-store"),
+    dcc.Store(id="hourly-chart-state"),
+    dcc.Store(id="animation-store"),
     dcc.Store(id="test-weather-store", data={"active": False, "index": 0}),
 ], id="main-container", className="weather-bg default light-text")
 
 @app.callback(
+    Output("animation-store", "data"),
+    Input("main-container", "className"),
+    State("animation-store", "data")
+)
+@metrics.timed("animation")
+def update_weather_animation(container_class, current_spec):
+    key = animation_key(container_class or "")
+    # refreshes and view changes rewrite the class without changing the weather
+    if current_spec and current_spec.get("key") == key:
+        return no_update
+    return animation_spec(key, next(animation_rotation) % ANIMATION_VARIANTS)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="weather", function_name="renderParticles"),
     Output("rain-container", "children"), Output("rain-container", "style"),
     Output("snow-container", "children"), Output("snow-container", "style"),
     Output("clouds-container", "children"), Output("clouds-container", "style"),
     Output("thunder-container", "children"), Output("thunder-container", "style"),
-    Input("main-container", "className")
+    Input("animation-store", "data")
 )
 
-def update_weather_animation(container_class):
-    rain_drops, rain_style = ([], {"display": "none"})
-    snow_flakes, snow_style = ([], {"display": "none"})
-    clouds_children, clouds_style = ([], {"display": "none"})
-    thunder_children, thunder_style = ([], {"display": "none"})
-
-    if "rain" in container_class:
-        rain_drops, rain_style = create_rain_drops()
-    if "snow" in container_class:
-        snow_flakes, snow_style = create_snow_flakes()
-    if "partly-cloudy" in container_class:
-        clouds_children, clouds_style = create_clouds(True)
-    elif "cloudy" in container_class:
-        clouds_children, clouds_style = create_clouds(False)
-    if "thunder" in container_class:
-        thunder_children, thunder_style = create_thunder()
-
-    return (rain_drops, rain_style, snow_flakes, snow_style, clouds_children, clouds_style, thunder_children, thunder_style)
-
 @app.callback(
     Output("test-weather-store", "data"),
     [Input(f"btn-test-{i}", "n_clicks") for i in range(8)] + [Input("btn-stop-test", "n_clicks")],
@@ -626,7 +1121,8 @@ def update_test_mode(*n_clicks):
     try:
         index = int(triggered_id.split("-")[-1])
         return {"active": True, "index": index}
-    except:
+    except ValueError as e:
+        metrics.count_error("test_mode", e)
         return no_update
 
 @app.callback(
@@ -634,37 +1130,16 @@ def update_test_mode(*n_clicks):
     Output("selected-city-display", "children"),
     Output("city-separator", "style"),
     Output("current-weather", "children"),
-    Output("temp-hourly", "figure"),
-    Output("precip-hourly", "figure"),
-    Output("btn-today", "className"),
-    Output("btn-7days", "className"),
-    Output("temp-view-store", "data"),
+    Output("hourly-store", "data"),
     Output("main-container", "className"),
     Output("hourly-graphs-container", "style"),
     Input("city-input", "value"),
-    Input("btn-today", "n_clicks"),
-    Input("btn-7days", "n_clicks"),
     Input("test-weather-store", "data"),
-    State("temp-view-store", "data")
+    background=jobs.BACKGROUND_ENABLED,
+    interval=jobs.BACKGROUND_POLL_INTERVAL,
+    running=[(Output("city-input", "className"), "city-input loading", "city-input")]
 )
-def update_dashboard(city_name, n_today, n_7days, test_store, current_view):
-    ctx = callback_context
-    triggered_id = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else None
-
-    if triggered_id == "btn-today":
-        view = "today"
-    elif triggered_id == "btn-7days":
-        view = "7days"
-    else:
-        view = current_view or "7days"
-
-    empty_fig = go.Figure().update_layout(
-        paper_bgcolor="rgba(0,0,0,0)", 
-        plot_bgcolor="rgba(0,0,0,0)", 
-        xaxis_visible=False, 
-        yaxis_visible=False
-    )
-
+def update_dashboard(city_name, test_store):
     if test_store.get("active", False):
         idx = test_store.get("index", 0)
         conditions = [
@@ -679,15 +1154,15 @@ def update_dashboard(city_name, n_today, n_7days, test_store, current_view):
         wind = 15
         wind_dir = 225  # SW
         wind_cardinal = wind_direction_cardinal(wind_dir)
-        wind_compass = create_wind_compass(wind, wind_dir)
+        wind_compass = wind_compass_component(wind, wind_dir)
         desc = "Test Wetter"
-        icon = "ÜberwiegendKlar.png"
+        icon = assets.name("ÜberwiegendKlar.png")
         sun_card = html.Div()
 
         cards = html.Div([
             html.Div([
                 html.H3("Temperatur", className="card-title"),
-                html.Img(src=f"/assets/{temperature_icon(temp)}", className="card-icon"),
+                icon_image(temperature_icon(temp), "card-icon"),
                 html.P(f"{temp} °C", className="card-value"),
                 html.P(f"Gefühlt: {apparent} °C", className="feels-like")
             ], className="card card-animate", style={"animationDelay": "0.1s"}),
@@ -695,15 +1170,15 @@ def update_dashboard(city_name, n_today, n_7days, test_store, current_view):
             html.Div([
                 html.H3("Windgeschwindigkeit", className="card-title"),
                 html.Div([
-                    html.Div([html.Img(src=f"/assets/{wind_speed_icon(wind)}", className="card-icon wind-speed-icon")], className="wind-icon-wrapper"),
-                    html.Div([dcc.Graph(figure=wind_compass, config={'displayModeBar': False})], className="wind-compass-wrapper")
+                    html.Div([icon_image(wind_speed_icon(wind), "card-icon wind-speed-icon")], className="wind-icon-wrapper"),
+                    html.Div([wind_compass], className="wind-compass-wrapper")
                 ], className="wind-icons-container"),
                 html.P(f"{wind} km/h", className="card-value")
             ], className="card card-animate wind-card-content", style={"animationDelay": "0.2s"}),
 
             html.Div([
                 html.H3("Wetterlage", className="card-title"),
-                html.Img(src=f"/assets/{icon}", className="card-icon"),
+                icon_image(icon, "card-icon"),
                 html.P(desc, className="card-value")
             ], className="card card-animate", style={"animationDelay": "0.3s"}),
 
@@ -715,9 +1190,7 @@ def update_dashboard(city_name, n_today, n_7days, test_store, current_view):
             "Test Stadt", 
             {"display": "inline"}, 
             html.Div([cards, html.Div()]), 
-            empty_fig, empty_fig,
-            "view-btn", "view-btn active", 
-            view, 
+            None,
             f"weather-bg {bg_class} {text_class}",
             {"display": "none"}
         )
@@ -725,9 +1198,7 @@ def update_dashboard(city_name, n_today, n_7days, test_store, current_view):
     if not city_name or not city_name.strip():
         return (
             "", "", {"display": "none"}, html.Div(), 
-            empty_fig, empty_fig, 
-            "view-btn", "view-btn active", 
-            view, 
+            None,
             "weather-bg default light-text",
             {"display": "none"}
         )
@@ -737,13 +1208,18 @@ def update_dashboard(city_name, n_today, n_7days, test_store, current_view):
     if error:
         return (
             error, "", {"display": "none"}, html.Div(), 
-            no_update, no_update, 
-            "view-btn", "view-btn active", 
-            view, 
+            no_update,
             "weather-bg default light-text",
             {"display": "none"}
         )
 
+    cache_warmer.record(city_name)
+    if jobs.in_job():
+        # the job process exits before the warmer thread would flush the count
+        try:
+            cache_warmer.flush()
+        except (sqlite3.Error, OSError) as e:
+            metrics.count_error("warmer", e)
     lat, lon = coords
     data = fetch_weather(lat, lon)
     if not data or "current" not in data:
@@ -753,15 +1229,12 @@ def update_dashboard(city_name, n_today, n_7days, test_store, current_view):
             {"display": "none"}, 
             html.Div(), 
             no_update, 
-            no_update, 
-            "view-btn", 
-            "view-btn active", 
-            view, 
             "weather-bg default light-text",
             {"display": "none"}
         )
 
     current = data["current"]
+    status = f"Daten von {current['time'][11:16]}" if data.get("stale") else ""
     temp = round(current.get("temperature_2m", 0))
     apparent = round(current.get("apparent_temperature", temp), 1)
     wind = round(current.get("wind_speed_10m", 0))
@@ -769,22 +1242,19 @@ def update_dashboard(city_name, n_today, n_7days, test_store, current_view):
     code = current.get("weather_code", 0)
 
     wind_cardinal = wind_direction_cardinal(wind_dir)
-    wind_compass = create_wind_compass(wind, wind_dir)
+    wind_compass = wind_compass_component(wind, wind_dir, style={'width': '100px', 'height': '100px'})
 
     desc, icon, bg_class, text_class = get_weather_info(code)
     city_label = f"Wetterdaten für: {city_name.capitalize()}"
 
-    daily_df = pd.DataFrame(data.get("daily", {}))
-    if not daily_df.empty and "time" in daily_df.columns:
-        daily_df["time"] = pd.to_datetime(daily_df["time"])
-
-    sun_card = build_sun_card(daily_df)
-    forecast_cards = build_forecast_cards(daily_df, city_name)
+    forecast = parse_forecast(data, quantize_coords(lat, lon))
+    sun_card = build_sun_card(forecast)
+    forecast_cards = build_forecast_cards(forecast, city_name)
 
     cards = html.Div([
         html.Div([
             html.H3("Temperatur", className="card-title"),
-            html.Img(src=f"/assets/{temperature_icon(temp)}", className="card-icon"),
+            icon_image(temperature_icon(temp), "card-icon"),
             html.P(f"{temp} °C", className="card-value"),
             html.P(f"Gefühlt: {apparent} °C", className="feels-like")
         ], className="card card-animate", style={"animationDelay": "0.1s"}),
@@ -792,96 +1262,151 @@ def update_dashboard(city_name, n_today, n_7days, test_store, current_view):
         html.Div([
             html.H3("Windgeschwindigkeit", className="card-title"),
             html.Div([
-                html.Div([html.Img(src=f"/assets/{wind_speed_icon(wind)}", className="card-icon wind-speed-icon")], className="wind-icon-wrapper"),
-                html.Div([dcc.Graph(figure=wind_compass, config={'displayModeBar': False}, style={'width': '100px', 'height': '100px'})], className="wind-compass-wrapper")
+                html.Div([icon_image(wind_speed_icon(wind), "card-icon wind-speed-icon")], className="wind-icon-wrapper"),
+                html.Div([wind_compass], className="wind-compass-wrapper")
             ], className="wind-icons-container"),
             html.P(f"{wind} km/h", className="card-value")
         ], className="card card-animate", style={"animationDelay": "0.2s"}),
 
         html.Div([
             html.H3("Wetterlage", className="card-title"),
-            html.Img(src=f"/assets/{icon}", className="card-icon"),
+            icon_image(icon, "card-icon"),
             html.P(desc, className="card-value")
         ], className="card card-animate", style={"animationDelay": "0.3s"}),
 
         sun_card
     ], className="cards-container")
 
-    # Hourly graphs
-    hourly_df = pd.DataFrame(data.get("hourly", {}))
-    if not hourly_df.empty and "time" in hourly_df.columns:
-        hourly_df["time"] = pd.to_datetime(hourly_df["time"])
-        today_date = pd.Timestamp.now().date()
-        today_hourly = hourly_df[hourly_df["time"].dt.date == today_date]
-
-        temp_data = today_hourly if view == "today" else hourly_df
-        precip_data = today_hourly if view == "today" else hourly_df
-        view_label = "Heute" if view == "today" else "7 Tage"
-    else:
-        temp_data = pd.DataFrame()
-        precip_data = pd.DataFrame()
-        view_label = "Keine Daten"
-
-    is_dark = text_class == "dark-text"
-    template = "plotly_white" if is_dark else "plotly_dark"
-    font_color = "#1a1a1a" if is_dark else "#ffffff"
-    grid_color = "rgba(0,0,0,0.25)" if is_dark else "rgba(255,255,255,0.3)"
-
-    if not temp_data.empty and "temperature_2m" in temp_data.columns:
-        temp_fig = px.line(temp_data, x="time", y="temperature_2m")
-        temp_fig.update_traces(line=dict(color="#ff6b6b", width=5), fill='tozeroy', fillcolor="rgba(255,107,107,0.15)")
-        temp_fig.update_layout(
-            title=f"<b>Temperaturverlauf - {view_label}</b>",
-            yaxis_title="<b>Temperatur (°C)</b>",
-            template=template,
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(255,255,255,0.1)" if is_dark else "rgba(0,0,0,0.2)",
-            font=dict(color=font_color, size=16),
-            margin=dict(t=100, l=80, r=80, b=90),
-            hovermode="x unified",
-            xaxis=dict(showgrid=True, gridcolor=grid_color, gridwidth=2),
-            yaxis=dict(showgrid=True, gridcolor=grid_color, gridwidth=2),
-            title_font=dict(size=22, color=font_color)
-        )
-    else:
-        temp_fig = empty_fig
-
-    if not precip_data.empty and "precipitation" in precip_data.columns:
-        precip_fig = px.bar(precip_data, x="time", y="precipitation")
-        precip_fig.update_traces(marker_color="#45b7d1", opacity=0.85)
-        precip_fig.update_layout(
-            title=f"<b>Niederschlag - {view_label}</b>",
-            yaxis_title="<b>Niederschlag (mm)</b>",
-            template=template,
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(255,255,255,0.1)" if is_dark else "rgba(0,0,0,0.2)",
-            font=dict(color=font_color, size=16),
-            margin=dict(t=100, l=80, r=80, b=90),
-            hovermode="x unified",
-            xaxis=dict(showgrid=True, gridcolor=grid_color, gridwidth=2),
-            yaxis=dict(showgrid=True, gridcolor=grid_color, gridwidth=2),
-            title_font=dict(size=22, color=font_color)
-        )
-    else:
-        precip_fig = empty_fig
-
-    today_class = "view-btn active" if view == "today" else "view-btn"
-    seven_class = "view-btn active" if view == "7days" else "view-btn"
+    # Hourly data is kept in the browser so the view toggle never goes upstream
+    hourly = data.get("hourly", {})
+    hourly_store = {
+        "time": hourly.get("time", []),
+        "temperature_2m": hourly.get("temperature_2m", []),
+        "precipitation": hourly.get("precipitation", []),
+        "text_class": text_class
+    }
 
     return (
-        "", 
+        status, 
         city_label, 
         {"display": "inline"}, 
         html.Div([cards, forecast_cards]), 
-        temp_fig, precip_fig,
-        today_class, seven_class, 
-        view, 
+        hourly_store,
         f"weather-bg {bg_class} {text_class}",
         {"display": "flex"}
     )
 
+@app.callback(
+    Output("temp-hourly", "figure"),
+    Output("precip-hourly", "figure"),
+    Output("btn-today", "className"),
+    Output("btn-7days", "className"),
+    Output("temp-view-store", "data"),
+    Output("hourly-chart-state", "data"),
+    Input("btn-today", "n_clicks"),
+    Input("btn-7days", "n_clicks"),
+    Input("hourly-store", "data"),
+    State("temp-view-store", "data"),
+    State("hourly-chart-state", "data")
+)
+def update_hourly_view(n_today, n_7days, hourly_store, current_view, chart_state):
+    ctx = callback_context
+    triggered_id = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else None
+
+    if triggered_id == "btn-today":
+        view = "today"
+    elif triggered_id == "btn-7days":
+        view = "7days"
+    else:
+        view = current_view or "7days"
+
+    temp_fig, precip_fig, chart_state = build_hourly_figures(hourly_store, view, chart_state)
+
+    today_class = "view-btn active" if view == "today" else "view-btn"
+    seven_class = "view-btn active" if view == "7days" else "view-btn"
+
+    return temp_fig, precip_fig, today_class, seven_class, view, chart_state
+
+@app.callback(
+    Output("archive-temp", "figure"),
+    Output("archive-precip", "figure"),
+    Output("archive-status", "children"),
+    Output("archive-container", "style"),
+    *[Output(f"btn-archive-{view}", "className") for view in ARCHIVE_VIEWS],
+    Output("archive-view-store", "data"),
+    Output("archive-poll", "disabled"),
+    *[Input(f"btn-archive-{view}", "n_clicks") for view in ARCHIVE_VIEWS],
+    # follows the dashboard: runs once it has rendered (or hidden) the hourly charts for the city
+    Input("hourly-graphs-container", "style"),
+    # and ticks while a backfill runs in the background
+    Input("archive-poll", "n_intervals"),
+    State("hourly-store", "data"),
+    State("city-input", "value"),
+    State("archive-view-store", "data"),
+    background=jobs.BACKGROUND_ENABLED,
+    interval=jobs.BACKGROUND_POLL_INTERVAL
+)
+def update_archive_view(*args):
+    hourly_style, _, hourly_store, city_name, current_view = args[len(ARCHIVE_VIEWS):]
+    ctx = callback_context
+    triggered_id = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else ""
+    view = triggered_id[len("btn-archive-"):] if triggered_id.startswith("btn-archive-") else current_view or "year"
+    classes = ["view-btn active" if v == view else "view-btn" for v in ARCHIVE_VIEWS]
+
+    visible = (hourly_style or {}).get("display") != "none" and hourly_store and hourly_store.get("time")
+    coords, error = geocode_city(city_name.strip()) if visible and city_name else (None, True)
+    if error:
+        return empty_figure(), empty_figure(), "", {"display": "none"}, *classes, view, True
+
+    # only the days missing from the local store go upstream, in the background; the rest is read from disk
+    days, freq, _ = ARCHIVE_VIEWS[view]
+    end = latest_day()
+    state = update_archive(coords, end - days + 1)
+    history = history_archive.query(*coords, end - days + 1, end, freq)
+    loading = state == "loading"
+    if not len(history["time"]):
+        status = "Archiv wird geladen …" if loading else "Archivdaten nicht verfügbar"
+        return empty_figure(), empty_figure(), status, {"display": "none"}, *classes, view, not loading
+
+    status = {"loading": "Archiv wird geladen …",
+              "failed": f"Archiv nicht aktualisiert, Stand {history['time'][-1]}"}.get(state, "")
+    temp_fig, precip_fig = build_archive_figures(history, view, hourly_store.get("text_class") == "dark-text")
+    return temp_fig, precip_fig, status, {"display": "block"}, *classes, view, not loading
+
+@app.callback(
+    Output("compare-status", "children"),
+    Output("compare-cards", "children"),
+    Output("compare-temp", "figure"),
+    Output("compare-precip", "figure"),
+    Output("compare-graphs-container", "style"),
+    Input("compare-input", "value"),
+    State("main-container", "className"),
+    prevent_initial_call=True
+)
+def update_comparison(city_list, container_class):
+    names = parse_city_list(city_list)
+    if not names:
+        return "", [], empty_figure(), empty_figure(), {"display": "none"}
+
+    geocoded = geocode_cities(names)
+    found = [(name, coords) for name, (coords, error) in zip(names, geocoded) if not error]
+    missing = [name for name, (coords, error) in zip(names, geocoded) if error]
+
+    payloads = fetch_weather_batch([coords for _, coords in found]) if found else []
+    available = [(name, coords, data) for (name, coords), data in zip(found, payloads) if "current" in data]
+    missing += [name for (name, _), data in zip(found, payloads) if "current" not in data]
+
+    status = f"Nicht verfügbar: {', '.join(missing)}" if missing else ""
+    if not available:
+        return status, [], empty_figure(), empty_figure(), {"display": "none"}
+
+    names = [name for name, _, _ in available]
+    stacked = stack_forecasts([data for _, _, data in available], [coords for _, coords, _ in available])
+    temp_fig, precip_fig = build_compare_figures(names, stacked, "dark-text" in (container_class or ""))
+
+    return status, build_compare_cards(names, stacked), temp_fig, precip_fig, {"display": "flex"}
+
 if __name__ == "__main__":
-    import os
     app.run_server(
         host="0.0.0.0",
         port=int(os.environ.get("PORT", 8050)),
@@ -0,0 +1,264 @@
+import datetime as dt
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import requests
+
+import upstream
+from cache import CACHE_DIR, LRUCache, quantize_coords
+from metrics import timed, count_error
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: writers are serialised within the process only
+    fcntl = None
+
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", os.path.join(CACHE_DIR, "archive"))
+# the reanalysis behind Open-Meteo's archive is about 10 km, nearby places share one history
+ARCHIVE_GRID = float(os.environ.get("ARCHIVE_GRID", 0.1))
+ARCHIVE_YEARS = int(os.environ.get("ARCHIVE_YEARS", 5))
+# the archive trails real time by a few days; the newest days are asked for again after ARCHIVE_RECHECK
+ARCHIVE_LAG_DAYS = int(os.environ.get("ARCHIVE_LAG_DAYS", 5))
+ARCHIVE_RECHECK = int(os.environ.get("ARCHIVE_RECHECK", 3600))
+ARCHIVE_TIMEZONE = "Europe/Berlin"
+# read-only maps kept open per worker; the pages are shared with the writer through the page cache
+ARCHIVE_OPEN_PARTITIONS = int(os.environ.get("ARCHIVE_OPEN_PARTITIONS", 256))
+
+# daily column -> how it rolls up into weeks and months
+ARCHIVE_VARIABLES = {
+    "temperature_2m_max": "max",
+    "temperature_2m_min": "min",
+    "temperature_2m_mean": "mean",
+    "precipitation_sum": "sum",
+}
+COLUMNS = tuple(ARCHIVE_VARIABLES)
+PARTITION_DAYS = 366
+FREQUENCIES = ("daily", "weekly", "monthly")
+
+
+def today():
+    return np.datetime64(dt.datetime.now(ZoneInfo(ARCHIVE_TIMEZONE)).date(), "D")
+
+def latest_day():
+    return today() - ARCHIVE_LAG_DAYS
+
+def year_of(day):
+    return int(day.astype("datetime64[Y]").astype(int)) + 1970
+
+def year_start(year):
+    return np.datetime64(f"{year:04d}-01-01", "D")
+
+def split_years(start, end):
+    # [start, end] in per-year pieces, one partition and one upstream request each
+    pieces = []
+    while start <= end:
+        last = min(end, year_start(year_of(start) + 1) - 1)
+        pieces.append((start, last))
+        start = last + 1
+    return pieces
+
+
+# Aggregation: weeks start on Monday, 1970-01-05 is day 4 of the epoch
+def period_starts(days, freq):
+    if freq == "weekly":
+        return ((days.astype(int) - 4) // 7 * 7 + 4).astype("datetime64[D]")
+    if freq == "monthly":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    return days
+
+def aggregate(days, columns, freq):
+    if freq == "daily" or not len(days):
+        return {"time": days, **columns, "days": np.ones(len(days), dtype=int)}
+    keys = period_starts(days, freq)
+    # days are sorted, so every period is one contiguous run
+    bounds = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    result = {"time": keys[bounds]}
+    for name, values in columns.items():
+        finite = np.isfinite(values)
+        counts = np.add.reduceat(finite.astype(int), bounds)
+        how = ARCHIVE_VARIABLES[name]
+        if how == "max":
+            rolled = np.fmax.reduceat(values, bounds)
+        elif how == "min":
+            rolled = np.fmin.reduceat(values, bounds)
+        else:
+            rolled = np.add.reduceat(np.where(finite, values, 0), bounds)
+            if how == "mean":
+                rolled = rolled / np.maximum(counts, 1)
+        result[name] = np.where(counts > 0, rolled, np.nan)
+    result["days"] = np.diff(np.r_[bounds, len(days)])
+    return result
+
+
+# Columnar Store: <location>/<year>.npy holds one row per variable and one column per day of the year,
+# NaN where nothing was fetched yet; queries memory-map only the years they touch
+class HistoryArchive:
+    def __init__(self, path=ARCHIVE_DIR, grid=ARCHIVE_GRID):
+        self.path = path
+        self.grid = grid
+        self._maps = LRUCache(ARCHIVE_OPEN_PARTITIONS)
+        self._write_lock = threading.Lock()
+
+    def location(self, lat, lon):
+        cell = quantize_coords(lat, lon, self.grid)
+        return cell, os.path.join(self.path, f"{cell[0]:.2f}_{cell[1]:.2f}")
+
+    @contextmanager
+    def _lock(self, directory):
+        # one writer per location across threads and workers; readers never wait
+        os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            with self._write_lock:
+                yield
+            return
+        with open(os.path.join(directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _meta(self, directory):
+        try:
+            with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, directory, meta):
+        path = os.path.join(directory, "meta.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def _partition(self, directory, year, create=False):
+        path = os.path.join(directory, f"{year}.npy")
+        if not create:
+            cached = self._maps.get(path)
+            if cached is not None:
+                return cached
+        if not os.path.exists(path):
+            if not create:
+                return None
+            # written whole and renamed, a reader never maps a half-written header
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, np.full((len(COLUMNS), PARTITION_DAYS), np.nan, dtype=np.float32))
+            os.replace(path + ".tmp", path)
+        if create:
+            return np.load(path, mmap_mode="r+")
+        partition = np.load(path, mmap_mode="r")
+        self._maps.set(path, partition, float("inf"))
+        return partition
+
+    def coverage(self, lat, lon):
+        meta = self._meta(self.location(lat, lon)[1])
+        if "first" not in meta:
+            return None
+        return np.datetime64(meta["first"], "D"), np.datetime64(meta["through"], "D")
+
+    def fetch(self, cell, start, end):
+        response = upstream.get(
+            f"{upstream.OPEN_METEO_ARCHIVE_URL}/v1/archive",
+            params={"latitude": cell[0], "longitude": cell[1], "start_date": str(start), "end_date": str(end),
+                    "daily": ",".join(COLUMNS), "timezone": ARCHIVE_TIMEZONE},
+            timeout=upstream.ARCHIVE_TIMEOUT, service="open_meteo_archive"
+        )
+        response.raise_for_status()
+        return upstream.decode(response)["daily"]
+
+    def write(self, directory, daily):
+        # -> last day with any value; days past it are left empty to be fetched again
+        days = np.array(daily["time"], dtype="datetime64[D]")
+        if not len(days):
+            return None
+        values = np.array([[np.nan if v is None else v for v in daily.get(name) or [None] * len(days)]
+                           for name in COLUMNS], dtype=np.float32)
+        year = year_of(days[0])
+        partition = self._partition(directory, year, create=True)
+        partition[:, (days - year_start(year)).astype(int)] = values
+        partition.flush()
+        filled = np.flatnonzero(np.isfinite(values).any(axis=0))
+        return days[filled[-1]] if len(filled) else None
+
+    def _window(self, start):
+        end = latest_day()
+        return min(start if start is not None else year_start(year_of(end) - ARCHIVE_YEARS), end), end
+
+    def _pieces(self, meta, start, end):
+        if "first" not in meta:
+            return split_years(start, end)
+        first, through = np.datetime64(meta["first"], "D"), np.datetime64(meta["through"], "D")
+        requested = np.datetime64(meta.get("requested", meta["through"]), "D")
+        # older years newest first, so the stored range stays contiguous if a request fails
+        pieces = split_years(start, first - 1)[::-1] if start < first else []
+        # days never asked for are fetched right away, days that came back empty again after ARCHIVE_RECHECK
+        if requested < end or through < end and time.time() - meta.get("checked", 0) > ARCHIVE_RECHECK:
+            pieces += split_years(through + 1, end)
+        return pieces
+
+    def needs_update(self, lat, lon, start=None):
+        # cheap check without the lock, update() decides again under it
+        return bool(self._pieces(self._meta(self.location(lat, lon)[1]), *self._window(start)))
+
+    @timed("archive_update")
+    def update(self, lat, lon, start=None):
+        # incremental: only the days before the stored range and after its end are fetched
+        cell, directory = self.location(lat, lon)
+        start, end = self._window(start)
+        with self._lock(directory):
+            meta = self._meta(directory)
+            try:
+                for piece_start, piece_end in self._pieces(meta, start, end):
+                    last = self.write(directory, self.fetch(cell, piece_start, piece_end))
+                    first = min(np.datetime64(meta.get("first", piece_start), "D"), piece_start)
+                    through = np.datetime64(meta.get("through", piece_start - 1), "D")
+                    requested = np.datetime64(meta.get("requested", through), "D")
+                    if last is not None and last > through:
+                        through = last
+                    meta.update(first=str(first), through=str(through), requested=str(max(requested, piece_end)),
+                                latitude=cell[0], longitude=cell[1])
+                    if piece_end == end:
+                        meta["checked"] = time.time()
+                    self._write_meta(directory, meta)
+            except (requests.RequestException, ValueError, KeyError) as e:
+                count_error("archive", e)
+                return False
+        return True
+
+    @timed("archive_query")
+    def query(self, lat, lon, start, end, freq="daily"):
+        # [start, end] clipped to what is stored, aggregated; reads only the slices of the years it spans
+        directory = self.location(lat, lon)[1]
+        coverage = self.coverage(lat, lon)
+        if coverage is not None:
+            start, end = max(np.datetime64(start, "D"), coverage[0]), min(np.datetime64(end, "D"), coverage[1])
+        if coverage is None or start > end:
+            return aggregate(np.zeros(0, "datetime64[D]"), {name: np.zeros(0) for name in COLUMNS}, freq)
+        parts = []
+        for piece_start, piece_end in split_years(start, end):
+            year = year_of(piece_start)
+            partition = self._partition(directory, year)
+            i, j = (piece_start - year_start(year)).astype(int), (piece_end - year_start(year)).astype(int) + 1
+            parts.append(partition[:, i:j] if partition is not None else np.full((len(COLUMNS), j - i), np.nan))
+        values = np.concatenate(parts, axis=1).astype(float)
+        days = np.arange(start, end + 1)
+        return aggregate(days, dict(zip(COLUMNS, values)), freq)
+
+
+history_archive = HistoryArchive()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "update":
+        sys.exit("usage: python archive.py update LAT LON [years]")
+    lat, lon = float(sys.argv[2]), float(sys.argv[3])
+    years = int(sys.argv[4]) if len(sys.argv) > 4 else ARCHIVE_YEARS
+    ok = history_archive.update(lat, lon, year_start(year_of(latest_day()) - years))
+    coverage = history_archive.coverage(lat, lon)
+    print(f"{'updated' if ok else 'update failed'}: {coverage[0]} to {coverage[1]}" if coverage else "nothing stored")
@@ -0,0 +1,35 @@
+// City autocomplete: fills a <datalist> for #city-input from the offline gazetteer
+(function () {
+    var cache = {};
+
+    function render(names) {
+        var list = document.getElementById("city-suggestions");
+        if (!list) {
+            list = document.createElement("datalist");
+            list.id = "city-suggestions";
+            document.body.appendChild(list);
+        }
+        list.replaceChildren.apply(list, names.map(function (name) {
+            var option = document.createElement("option");
+            option.value = name;
+            return option;
+        }));
+    }
+
+    document.addEventListener("input", function (event) {
+        var input = event.target;
+        if (!input || input.id !== "city-input") return;
+
+        var query = input.value.trim();
+        if (query.length < 2) return render([]);
+        if (cache[query]) return render(cache[query]);
+
+        fetch("/api/suggest?q=" + encodeURIComponent(query))
+            .then(function (response) { return response.json(); })
+            .then(function (names) {
+                cache[query] = names;
+                if (input.value.trim() === query) render(names);
+            })
+            .catch(function () {});
+    });
+})();
@@ -0,0 +1,180 @@
+// Weather backgrounds built in the browser from a small spec sent by update_weather_animation
+(function () {
+    function mulberry32(seed) {
+        return function () {
+            seed = seed + 0x6D2B79F5 | 0;
+            var t = Math.imul(seed ^ seed >>> 15, 1 | seed);
+            t = t + Math.imul(t ^ t >>> 7, 61 | t) ^ t;
+            return ((t ^ t >>> 14) >>> 0) / 4294967296;
+        };
+    }
+
+    function div(className, style, children) {
+        var props = {className: className};
+        if (style) props.style = style;
+        if (children) props.children = children;
+        return {type: "Div", namespace: "dash_html_components", props: props};
+    }
+
+    function uniform(random, a, b) {
+        return a + (b - a) * random();
+    }
+
+    function fixed(value) {
+        return +value.toFixed(3);
+    }
+
+    function rainDrops(spec, random) {
+        var drops = [];
+        for (var i = 0; i < spec.count; i++) {
+            drops.push(div("rain-drop", {
+                left: fixed(uniform(random, -5, 105)) + "%",
+                top: fixed(uniform(random, -100, 0)) + "px",
+                height: fixed(uniform(random, 20, 50)) + "px",
+                width: fixed(uniform(random, 1, 2)) + "px",
+                opacity: fixed(0.6 * uniform(random, 0.8, 1.2)),
+                animationDelay: fixed(uniform(random, 0, 2)) + "s",
+                animationDuration: fixed(uniform(random, 1.5, 3)) + "s"
+            }));
+        }
+        return drops;
+    }
+
+    function snowLayers(spec, random) {
+        var layers = [];
+        for (var layer = 0; layer < spec.layers; layer++) {
+            var speedFactor = 1 + layer * 0.6;
+            var sizeFactor = 0.6 + layer * 0.4;
+            var flakes = [];
+            for (var i = 0; i < spec.count; i++) {
+                var top = uniform(random, 0, 100);
+                var style = {
+                    left: fixed(uniform(random, -10, 110)) + "%",
+                    top: fixed(top) + "vh",
+                    fontSize: fixed(uniform(random, 12, 24) * sizeFactor) + "px",
+                    opacity: fixed(uniform(random, 0.7, 1.0)),
+                    "--sway-distance": fixed(uniform(random, 30, 80)) + "px",
+                    "--sway-duration": fixed(uniform(random, 3, 7)) + "s",
+                    "--rotation-speed": fixed(uniform(random, 8, 20)) + "s"
+                };
+                flakes.push(div("snowflake", style));
+                flakes.push(div("snowflake", Object.assign({}, style, {top: fixed(top + 100) + "vh"})));
+            }
+            layers.push(div("snow-layer", {"--fall-duration": fixed(60 / speedFactor) + "s"}, flakes));
+        }
+        return layers;
+    }
+
+    function cloudLayers(spec, random) {
+        var baseOpacity = spec.partly ? 0.85 : 0.95;
+        var baseWidth = spec.partly ? 200 : 250;
+        var baseHeight = spec.partly ? 80 : 100;
+        var layers = [];
+        for (var layer = 0; layer < spec.layers; layer++) {
+            var scale = 1 - layer * 0.2;
+            var clouds = [];
+            for (var i = 0; i < spec.count; i++) {
+                var left = uniform(random, 0, 100);
+                var style = {
+                    left: fixed(left) + "vw",
+                    top: fixed(uniform(random, 10, 80 + layer * 10)) + "vh",
+                    width: fixed(uniform(random, baseWidth * scale * 0.7, baseWidth * scale * 1.3)) + "px",
+                    height: fixed(uniform(random, baseHeight * scale * 0.8, baseHeight * scale * 1.2)) + "px",
+                    opacity: fixed(uniform(random, baseOpacity * 0.8, baseOpacity * 1.2)),
+                    filter: "blur(" + (1 + layer * 0.5) + "px)"
+                };
+                clouds.push(div("cloud", style));
+                clouds.push(div("cloud", Object.assign({}, style, {left: fixed(left + 100) + "vw"})));
+            }
+            layers.push(div("cloud-layer", {"--scroll-duration": (60 + layer * 30) + "s"}, clouds));
+        }
+        return layers;
+    }
+
+    function thunderLayers(spec, random) {
+        var skews = [-8, -5, 0, 5, 8];
+        var layers = [];
+        for (var layer = 0; layer < spec.layers; layer++) {
+            var scale = 1 - layer * 0.2;
+            var containers = [];
+            for (var i = 0; i < spec.count; i++) {
+                var left = uniform(random, 0, 100);
+                var style = {
+                    left: fixed(left) + "vw",
+                    top: fixed(uniform(random, 10, 50 + layer * 15)) + "vh",
+                    width: fixed(uniform(random, 280 * scale * 0.7, 280 * scale * 1.3)) + "px",
+                    height: fixed(uniform(random, 110 * scale * 0.8, 110 * scale * 1.2)) + "px"
+                };
+                var cloudStyle = {
+                    width: "100%", height: "100%",
+                    opacity: fixed(uniform(random, 0.85, 1.0)),
+                    filter: "blur(" + (2 + layer) + "px)"
+                };
+                var lightning = null;
+                if (random() < spec.lightning) {
+                    lightning = {
+                        "--bolt-height": fixed(uniform(random, 20, 35)) + "vh",
+                        "--skew": skews[Math.floor(random() * skews.length)] + "deg",
+                        "--flash-duration": fixed(uniform(random, 3, 5)) + "s",
+                        "--flash-delay": fixed(uniform(random, 0, 20)) + "s"
+                    };
+                }
+                [style, Object.assign({}, style, {left: fixed(left + 100) + "vw"})].forEach(function (containerStyle) {
+                    var content = [div("thunder-cloud", cloudStyle)];
+                    if (lightning) {
+                        content.push(div("cloud-lightning", null, [
+                            div("lightning-bolt", lightning),
+                            div("cloud-glow", {
+                                "--flash-duration": lightning["--flash-duration"],
+                                "--flash-delay": lightning["--flash-delay"]
+                            })
+                        ]));
+                    }
+                    containers.push(div("thunder-cloud-container", containerStyle, content));
+                });
+            }
+            layers.push(div("thunder-layer", {"--scroll-duration": "120s"}, containers));
+        }
+        return layers;
+    }
+
+    var HIDDEN = {display: "none"};
+    var CACHE_SIZE = 16;
+    var built = new Map();
+
+    function renderParticles(spec) {
+        spec = spec || {};
+        // the server rotates through a few seeded variants per class, so built layers are reused
+        var cacheKey = (spec.key || "") + ":" + spec.seed;
+        if (built.has(cacheKey)) {
+            var hit = built.get(cacheKey);
+            built.delete(cacheKey);
+            built.set(cacheKey, hit);
+            return hit;
+        }
+        var result = build(spec);
+        built.set(cacheKey, result);
+        if (built.size > CACHE_SIZE) built.delete(built.keys().next().value);
+        return result;
+    }
+
+    function build(spec) {
+        var seed = spec.seed || 1;
+        function layer(kind, stream, build, style) {
+            if (!spec[kind]) return [[], HIDDEN];
+            return [build(spec[kind], mulberry32(seed * 4 + stream)), style];
+        }
+        return [].concat(
+            layer("rain", 0, rainDrops, {display: "block", transition: "opacity 1s ease"}),
+            layer("snow", 1, snowLayers, {display: "block"}),
+            layer("clouds", 2, cloudLayers, {display: "block", transition: "opacity 1s ease"}),
+            layer("thunder", 3, thunderLayers, {display: "block"})
+        );
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        weather: Object.assign({}, (window.dash_clientside || {}).weather, {
+            renderParticles: renderParticles
+        })
+    });
+})();
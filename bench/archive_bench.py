@@ -0,0 +1,127 @@
+"""Backfill, incremental append and range-query timings of the history archive, fully offline.
+
+Fills the archive for one location from the stub's /v1/archive, then appends a few days the way
+a daily refresh would and times range queries for every dashboard view, memory-mapped against
+reading every partition whole. Aggregates are checked against a plain per-period reference.
+
+    python bench/archive_bench.py [--years 20] [--repeat 200] [--append-days 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_upstream import StubUpstream  # noqa: E402
+
+LAT, LON = 47.5975, 11.0650
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def reference(history, archive, freq):
+    # the same aggregation as plain Python loops over the daily rows
+    import numpy as np
+    groups = {}
+    for i, day in enumerate(archive.period_starts(history["time"], freq)):
+        groups.setdefault(day, []).append(i)
+    result = {}
+    for name, how in archive.ARCHIVE_VARIABLES.items():
+        rows = []
+        for indices in groups.values():
+            values = [v for v in history[name][indices] if not np.isnan(v)]
+            if not values:
+                rows.append(np.nan)
+            elif how == "max":
+                rows.append(max(values))
+            elif how == "min":
+                rows.append(min(values))
+            elif how == "mean":
+                rows.append(sum(values) / len(values))
+            else:
+                rows.append(sum(values))
+        result[name] = np.array(rows)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=20, help="years to backfill")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--append-days", type=int, default=3, help="days missing before the incremental update")
+    args = parser.parse_args()
+
+    stub = StubUpstream().start()
+    os.environ["OPEN_METEO_ARCHIVE_URL"] = stub.url
+    os.environ["WEATHER_CACHE_DIR"] = tempfile.mkdtemp(prefix="weather-cache-")
+    import numpy as np
+    import archive
+
+    store = archive.HistoryArchive(tempfile.mkdtemp(prefix="weather-archive-"))
+    end = archive.latest_day()
+    start = archive.year_start(archive.year_of(end) - args.years)
+    try:
+        began = time.perf_counter()
+        store.update(LAT, LON, start)
+        backfill = time.perf_counter() - began
+        requests = stub.paths.get("/v1/archive", 0)
+        directory = store.location(LAT, LON)[1]
+        size = sum(os.path.getsize(os.path.join(directory, n)) for n in os.listdir(directory))
+        print(f"backfill {start} to {end}: {requests} requests, {backfill * 1000:.0f} ms, {size / 1024:.0f} KB on disk")
+
+        # a daily refresh: the newest days are missing and the recheck interval has passed
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        meta.update(through=str(end - args.append_days), checked=0)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        stub.reset()
+        began = time.perf_counter()
+        store.update(LAT, LON, start)
+        print(f"append {args.append_days} days: {stub.paths.get('/v1/archive', 0)} request, "
+              f"{(time.perf_counter() - began) * 1000:.1f} ms, coverage {store.coverage(LAT, LON)[1]}")
+        stub.reset()
+        began = time.perf_counter()
+        store.update(LAT, LON, start)
+        print(f"up to date: {stub.paths.get('/v1/archive', 0)} requests, {(time.perf_counter() - began) * 1000:.2f} ms")
+    finally:
+        stub.stop()
+
+    def load_all(first, last, freq):
+        # baseline: every partition read whole, then sliced
+        parts = [np.load(os.path.join(directory, f"{year}.npy")) for year in range(archive.year_of(start),
+                                                                                  archive.year_of(end) + 1)]
+        values = np.concatenate(parts, axis=1).astype(float)
+        days = np.concatenate([np.arange(archive.year_start(y), archive.year_start(y + 1))
+                               for y in range(archive.year_of(start), archive.year_of(end) + 1)])
+        keep = (days >= first) & (days <= last)
+        return archive.aggregate(days[keep], {n: v[:len(days)][keep] for n, v in zip(archive.COLUMNS, values)}, freq)
+
+    views = [("30 days daily", 30, "daily"), ("1 year weekly", 365, "weekly"),
+             (f"{archive.ARCHIVE_YEARS} years monthly", archive.ARCHIVE_YEARS * 365, "monthly"),
+             (f"{args.years} years monthly", (end - start).astype(int) + 1, "monthly")]
+    print(f"\n  {'view':<22}{'periods':>9}{'mmap ms':>10}{'read all ms':>13}{'max error':>11}")
+    for name, days, freq in views:
+        first = end - days + 1
+        result = store.query(LAT, LON, first, end, freq)
+        expected = reference(store.query(LAT, LON, first, end), archive, freq)
+        error = max(np.nanmax(np.abs(result[n] - expected[n])) for n in archive.COLUMNS)
+        mmap = median_ms(lambda: store.query(LAT, LON, first, end, freq), args.repeat)
+        whole = median_ms(lambda: load_all(first, end, freq), max(args.repeat // 10, 5))
+        print(f"  {name:<22}{len(result['time']):>9}{mmap:>10.3f}{whole:>13.3f}{error:>11.2g}")
+
+
+if __name__ == "__main__":
+    main()
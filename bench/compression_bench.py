@@ -0,0 +1,168 @@
+"""Response sizes and compression CPU cost per route and callback, with mobile transfer estimates.
+
+Collects real responses from the app (page, layout, dependencies, every server callback against
+the local stub, the largest Dash bundle), then compresses each body with a range of gzip levels
+and brotli qualities. Reports bytes, CPU milliseconds and the estimated time to first use on
+typical mobile links (CPU time plus transfer time; latency is the same for every setting).
+Finally checks what the server's own compression hook puts on the wire with the current settings.
+
+    python bench/compression_bench.py [--repeat 20] [--links 3g=1.6,4g=12] [--output results.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_upstream import StubUpstream  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVELS = (1, 4, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 6, 9, 11)
+
+
+def call(client, deps, output, inputs, state=(), changed=()):
+    spec = next(cb for cb in deps if cb["output"].strip(".").split(".")[0] == output)
+    outputs = []
+    for part in spec["output"].strip(".").split("..."):
+        cid, prop = part.rsplit(".", 1)
+        outputs.append({"id": cid, "property": prop})
+    body = {
+        "output": spec["output"],
+        "outputs": outputs if len(outputs) > 1 else outputs[0],
+        "inputs": [{**s, "value": v} for s, v in zip(spec["inputs"], inputs)],
+        "state": [{**s, "value": v} for s, v in zip(spec["state"], state)],
+        "changedPropIds": list(changed),
+    }
+    response = client.post("/_dash-update-component", json=body)
+    return response.get_data(), response.get_json().get("response", {})
+
+
+def collect(client):
+    # -> [(name, body, static)], uncompressed as the app produces them
+    page = client.get("/").get_data()
+    bodies = [("index", page, False), ("_dash-layout", client.get("/_dash-layout").get_data(), False)]
+    deps_response = client.get("/_dash-dependencies")
+    deps = deps_response.get_json()
+    bodies.append(("_dash-dependencies", deps_response.get_data(), False))
+
+    data, out = call(client, deps, "status-message", ["Bayrischzell", {"active": False, "index": 0}],
+                     changed=["city-input.value"])
+    bodies.append(("update_dashboard", data, False))
+    store = out["hourly-store"]["data"]
+    container = out["main-container"]["className"]
+    data, out = call(client, deps, "temp-hourly", [None, None, store], ["7days", None], changed=["hourly-store.data"])
+    bodies.append(("hourly charts, full", data, False))
+    chart = out["hourly-chart-state"]["data"]
+    data, _ = call(client, deps, "temp-hourly", [1, None, store], ["7days", chart], changed=["btn-today.n_clicks"])
+    bodies.append(("hourly charts, Patch", data, False))
+    data, _ = call(client, deps, "animation-store", [container], [None])
+    bodies.append(("animation", data, False))
+    data, _ = call(client, deps, "compare-status", ["Berlin, Hamburg, München"], [container],
+                   changed=["compare-input.value"])
+    bodies.append(("comparison", data, False))
+    data, _ = call(client, deps, "test-weather-store", [1] + [None] * 8, changed=["btn-test-0.n_clicks"])
+    bodies.append(("test mode", data, False))
+
+    suites = set(re.findall(rb'"(/_dash-component-suites/[^"]+\.js)"', page + client.get("/_dash-layout").get_data()))
+    largest = max((client.get(url.decode()).get_data() for url in suites), key=len, default=None)
+    if largest:
+        bodies.append(("largest Dash bundle", largest, True))
+    return bodies
+
+
+def settings():
+    rows = [(f"gzip {level}", "gzip", lambda data, level=level: gzip.compress(data, level, mtime=0))
+            for level in GZIP_LEVELS]
+    if brotli is not None:
+        rows += [(f"br {quality}", "br", lambda data, quality=quality: brotli.compress(data, quality=quality))
+                 for quality in BROTLI_QUALITIES]
+    return rows
+
+
+def measure(data, fn, repeat):
+    samples, body = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(data)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, len(body)
+
+
+def run(bodies, links, repeat):
+    results = []
+    header = "".join(f"{name + ' ms':>10}" for name in links)
+    for name, data, static in bodies:
+        # big static bundles are compressed once per worker, a few rounds are enough
+        rounds = 3 if len(data) > 1_000_000 else repeat
+        rows = [("identity", 0.0, len(data))]
+        rows += [(label, *measure(data, fn, rounds)) for label, _, fn in settings()]
+        print(f"\n{name}: {len(data)} bytes{' (static, compressed once)' if static else ''}")
+        print(f"  {'setting':<12}{'bytes':>10}{'ratio':>8}{'cpu ms':>10}{header}")
+        for label, ms, size in rows:
+            # Mbit/s -> ms on the wire, plus the compression CPU for per-request bodies
+            times = {link: size * 8 / (mbit * 1000) + (0 if static else ms) for link, mbit in links.items()}
+            print(f"  {label:<12}{size:>10}{size / len(data):>8.2f}{ms:>10.3f}"
+                  + "".join(f"{t:>10.1f}" for t in times.values()))
+            results.append({"response": name, "setting": label, "bytes": size, "raw_bytes": len(data),
+                            "cpu_ms": round(ms, 4), "static": static,
+                            "est_ms": {link: round(t, 2) for link, t in times.items()}})
+    return results
+
+
+def wire_check(client, bodies):
+    # what the after_request hook actually sends with the configured levels
+    import compression
+    print(f"\nserver hook (gzip {compression.GZIP_LEVEL}, br {compression.BROTLI_QUALITY}, "
+          f"at least {compression.COMPRESS_MIN_BYTES} bytes)")
+    rows = [(name, len(data)) for name, data, _ in bodies if name in ("index", "_dash-layout", "_dash-dependencies")]
+    for path in ("/", "/_dash-layout", "/_dash-dependencies"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip, deflate, br"})
+        name = {"/": "index"}.get(path, path.strip("/"))
+        raw = dict(rows)[name]
+        print(f"  {name:<22}{raw:>10} -> {len(response.get_data()):>8} {response.headers.get('Content-Encoding')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--links", default="3g=1.6,4g=12,wifi=50", help="NAME=Mbit/s pairs for the estimates")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+    links = {name: float(mbit) for name, mbit in (item.split("=") for item in args.links.split(","))}
+
+    stub = StubUpstream().start()
+    os.environ["NOMINATIM_URL"] = stub.url
+    os.environ["OPEN_METEO_URL"] = stub.url
+    # the stub is local: without a high rate the bench would measure the 1 req/s Nominatim pacing
+    os.environ.setdefault("NOMINATIM_RATE", "1000")
+    os.environ["WEATHER_CACHE_DIR"] = tempfile.mkdtemp(prefix="weather-cache-")
+    os.environ["WARMER_ENABLED"] = "0"
+    import app
+
+    client = app.server.test_client()
+    try:
+        bodies = collect(client)
+        results = run(bodies, links, args.repeat)
+        wire_check(client, bodies)
+    finally:
+        stub.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Concurrent slow-upstream dashboard requests one gunicorn worker sustains, blocking vs background.
+
+Starts the stub with a fixed latency and one `gunicorn app:server` worker per mode, then fires
+bursts of concurrent update_dashboard calls for places nobody asked for before (a geocode and a
+forecast fetch each, so two slow upstream calls per request). While a burst runs, a probe keeps
+requesting /_dash-layout to show whether the worker still answers cheap requests.
+
+    python bench/concurrency_bench.py [--threads 4] [--latency 1.0] [--levels 4,16,32,64]
+                                      [--modes blocking,background] [--output results.json]
+
+Background mode needs dash[diskcache] (diskcache, multiprocess, psutil).
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from load_test import free_port, percentile, wait_for  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+
+
+# Dash Client: a plain POST in blocking mode, job submission plus polling in background mode
+class DashboardClient:
+    def __init__(self, base):
+        self.base = base
+        page = requests.get(base + "/", timeout=30).text
+        config = json.loads(re.search(r'<script id="_dash-config" type="application/json">(.*?)</script>', page, re.S).group(1))
+        self.end_id = config.get("end_id")
+        deps = requests.get(base + "/_dash-dependencies", timeout=30).json()
+        self.spec = next(cb for cb in deps if cb["output"].startswith("..status-message.children"))
+
+    def body(self, city):
+        outputs = []
+        for part in self.spec["output"].strip(".").split("..."):
+            cid, prop = part.rsplit(".", 1)
+            outputs.append({"id": cid, "property": prop})
+        values = [city, {"active": False, "index": 0}]
+        return {
+            "output": self.spec["output"],
+            "outputs": outputs,
+            "inputs": [{**spec, "value": value} for spec, value in zip(self.spec["inputs"], values)],
+            "state": [],
+            "changedPropIds": ["city-input.value"],
+        }
+
+    def update_dashboard(self, city, interval):
+        session = requests.Session()
+        body = self.body(city)
+        params = {"endId": self.end_id} if self.end_id else {}
+        url = self.base + "/_dash-update-component"
+        data = session.post(url, params=params, json=body, timeout=120).json()
+        if "cacheKey" not in data:
+            return data
+        # the browser polls with the signed handles and blanked inputs
+        params = {**params, "cacheKey": data["cacheKey"], "job": data["job"]}
+        for spec in body["inputs"]:
+            spec["value"] = None
+        while True:
+            time.sleep(interval)
+            data = session.post(url, params=params, json=body, timeout=120).json()
+            if "response" in data:
+                return data
+
+
+def burst(client, concurrency, offset, interval):
+    latencies, errors, probes = [], 0, []
+    done = threading.Event()
+
+    def one(n):
+        start = time.perf_counter()
+        data = client.update_dashboard(f"Ort {offset + n}", interval)
+        # errors leave the city label empty
+        ok = bool(data.get("response", {}).get("selected-city-display", {}).get("children"))
+        return time.perf_counter() - start, ok
+
+    def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                requests.get(client.base + "/_dash-layout", timeout=120)
+            except requests.RequestException:
+                pass
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for seconds, ok in pool.map(one, range(concurrency)):
+            latencies.append(seconds)
+            errors += not ok
+    wall = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    latencies = sorted(s * 1000 for s in latencies)
+    probes = sorted(s * 1000 for s in probes)
+    return {
+        "concurrency": concurrency,
+        "wall_s": round(wall, 2),
+        "completed_per_s": round(concurrency / wall, 2),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+        "max_ms": round(latencies[-1], 1),
+        "probe_p50_ms": round(statistics.median(probes), 1) if probes else None,
+        "probe_max_ms": round(probes[-1], 1) if probes else None,
+    }
+
+
+def run_mode(mode, args, stub_url):
+    port = free_port()
+    cache_dir = tempfile.mkdtemp(prefix="weather-cache-")
+    env = {
+        **os.environ,
+        "NOMINATIM_URL": stub_url, "OPEN_METEO_URL": stub_url, "WEATHER_CACHE_DIR": cache_dir,
+        # the stub is local: without a high rate the bench would measure the 1 req/s Nominatim pacing
+        "NOMINATIM_RATE": os.environ.get("NOMINATIM_RATE", "1000"),
+        "WARMER_ENABLED": "0", "BACKGROUND_CALLBACKS": "1" if mode == "background" else "0",
+        "BACKGROUND_POLL_INTERVAL": str(int(args.interval * 1000)),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:server", "--workers", "1", "--threads", str(args.threads),
+         "--bind", f"127.0.0.1:{port}", "--timeout", "300", "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    rows = []
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_for(base + "/_dash-layout", timeout=60)
+        client = DashboardClient(base)
+        if mode == "background" and not client.spec.get("background"):
+            print("background callbacks unavailable (pip install \"dash[diskcache]\"), skipped")
+            return []
+        offset = 0
+        for level in args.levels:
+            row = {"mode": mode, **burst(client, level, offset, args.interval)}
+            offset += level
+            print(f"  {mode:<11}{row['concurrency']:>6}{row['wall_s']:>9.2f}{row['completed_per_s']:>10.2f}"
+                  f"{row['p50_ms']:>10.0f}{row['p95_ms']:>10.0f}{row['probe_max_ms'] or 0:>12.0f}{row['errors']:>8}")
+            rows.append(row)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads of the single worker")
+    parser.add_argument("--latency", type=float, default=1.0, help="stub upstream latency in seconds")
+    parser.add_argument("--levels", default="4,16,32,64", help="comma-separated burst sizes")
+    parser.add_argument("--modes", default="blocking,background")
+    parser.add_argument("--interval", type=float, default=0.25, help="background poll interval in seconds")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+    args.levels = [int(n) for n in args.levels.split(",")]
+
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH, "stub_upstream.py"), "--port", str(stub_port),
+         "--latency", str(args.latency)],
+        stdout=subprocess.DEVNULL
+    )
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    results = []
+    try:
+        wait_for(stub_url + "/search?q=berlin")
+        print(f"1 worker x {args.threads} threads, {args.latency}s per upstream call")
+        print(f"  {'mode':<11}{'burst':>6}{'wall s':>9}{'done/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+              f"{'probe max':>12}{'errors':>8}")
+        for mode in args.modes.split(","):
+            results.extend(run_mode(mode, args, stub_url))
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    if args.output:
+        settings = {k: v for k, v in vars(args).items() if k != "output"}
+        with open(args.output, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
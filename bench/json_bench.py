@@ -0,0 +1,99 @@
+"""Decode and encode timings for the stdlib and orjson JSON paths.
+
+Decodes Open-Meteo forecast documents (recorded responses passed with --payload, otherwise
+the stub's synthetic ones) and encodes typical callback outputs the way Dash does.
+
+    python bench/json_bench.py [--repeat 300] [--payload recorded.json ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_upstream import StubUpstream, location_payload
+
+stub = StubUpstream().start()
+os.environ["NOMINATIM_URL"] = stub.url
+os.environ["OPEN_METEO_URL"] = stub.url
+# the stub is local: without a high rate the bench would measure the 1 req/s Nominatim pacing
+os.environ.setdefault("NOMINATIM_RATE", "1000")
+os.environ["WEATHER_CACHE_DIR"] = tempfile.mkdtemp(prefix="weather-cache-")
+os.environ.setdefault("WARMER_ENABLED", "0")
+
+from plotly.io.json import to_json_plotly  # noqa: E402
+
+import app  # noqa: E402
+import fastjson  # noqa: E402
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def report(section, size, rows):
+    print(f"\n{section} ({size / 1024:.1f} KB)")
+    baseline = rows[0][1]
+    for name, ms in rows:
+        print(f"  {name:<34}{ms:>10.3f} ms{baseline / ms:>8.1f}x")
+
+
+def bench_decode(documents, repeat):
+    for name, raw in documents:
+        rows = [("json.loads (requests default)", median_ms(lambda: json.loads(raw), repeat))]
+        if fastjson.orjson is not None:
+            assert fastjson.orjson.loads(raw) == json.loads(raw)
+            rows.append(("orjson.loads", median_ms(lambda: fastjson.orjson.loads(raw), repeat)))
+        report(f"decode {name}", len(raw), rows)
+
+
+def bench_encode(outputs, repeat):
+    for name, value in outputs:
+        reference = to_json_plotly(value, engine="json")
+        rows = [("plotly json engine", median_ms(lambda: to_json_plotly(value, engine="json"), repeat))]
+        if fastjson.orjson is not None:
+            assert json.loads(fastjson.to_json(value)) == json.loads(reference), f"{name}: encoders disagree"
+            rows.append(("plotly orjson engine", median_ms(lambda: to_json_plotly(value, engine="orjson"), repeat)))
+            rows.append(("fastjson.to_json (FAST_JSON=1)", median_ms(lambda: fastjson.to_json(value), repeat)))
+        report(f"encode {name}", len(reference), rows)
+
+
+def callback_outputs():
+    dashboard = list(app.update_dashboard("Bayrischzell", {"active": False}))
+    hourly_store = dashboard[4]
+    full = app.build_hourly_figures(hourly_store, "7days")
+    patch = app.build_hourly_figures(hourly_store, "today", full[2])
+    compare = list(app.update_comparison(", ".join(["Bayrischzell", "Hiddensee", "Wangerooge"] * 4), "light-text"))
+    return [
+        ("update_dashboard outputs", dashboard),
+        ("hourly figures, full", list(full)),
+        ("hourly figures, patch", list(patch)),
+        ("comparison outputs", compare),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=300)
+    parser.add_argument("--payload", nargs="*", default=[], help="recorded Open-Meteo responses")
+    args = parser.parse_args()
+
+    if fastjson.orjson is None:
+        print("orjson is not installed, only the stdlib path is measured")
+
+    documents = [(os.path.basename(path), open(path, "rb").read()) for path in args.payload] or [
+        ("one location, 7 days", json.dumps(location_payload(52.52, 13.405)).encode()),
+        ("12 locations, 7 days", json.dumps([location_payload(52.52 + i / 10, 13.405) for i in range(12)]).encode()),
+    ]
+    bench_decode(documents, args.repeat)
+    bench_encode(callback_outputs(), args.repeat)
+    stub.stop()
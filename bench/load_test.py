@@ -0,0 +1,301 @@
+"""Load test of the gunicorn deployment against stubbed upstreams.
+
+Starts the stub (configurable latency and error rate) and `gunicorn app:server` for every
+workers x threads setting in the matrix, drives Dash callback traffic from concurrent virtual
+users and reports throughput and p50/p95/p99 latency per callback.
+
+    python bench/load_test.py [--matrix 1x1,2x4,4x4] [--users 16] [--duration 20]
+                              [--latency 0.15] [--error-rate 0.02] [--output results.json]
+
+Each virtual user loads the page, then loops over a session: pick a city, toggle the hourly
+view, load the archive charts (polling while a backfill runs), occasionally switch the
+archive view or the weather class through test mode. Every callback answer feeds
+the next request the way the browser would (hourly store, chart state, container class).
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+
+# gazetteer hits and names only the stub knows, so both geocode paths are exercised
+CITIES = [
+    "Berlin", "Hamburg", "München", "Köln", "Frankfurt am Main", "Stuttgart", "Düsseldorf",
+    "Leipzig", "Dortmund", "Essen", "Bremen", "Dresden", "Bayrischzell", "Hiddensee", "Wangerooge",
+]
+TEST_CLASSES = 8
+ARCHIVE_VIEWS = 3
+ARCHIVE_POLLS = 30
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+
+# Dash Client
+class DashClient:
+    def __init__(self, base):
+        self.base = base
+        self.session = requests.Session()
+        self.callbacks = {}
+        self.samples = []
+
+    def load(self):
+        for path in ("/", "/_dash-layout"):
+            self.timed("page" if path == "/" else "layout", lambda: self.session.get(self.base + path, timeout=30))
+        deps = self.timed("dependencies", lambda: self.session.get(self.base + "/_dash-dependencies", timeout=30))
+        for cb in deps.json():
+            if not cb.get("clientside_function"):
+                self.callbacks[cb["output"].strip(".").split(".")[0]] = cb
+
+    def timed(self, name, fn):
+        start = time.perf_counter()
+        try:
+            response = fn()
+            ok = response.status_code in (200, 204)
+        except requests.RequestException:
+            response, ok = None, False
+        self.samples.append((name, time.perf_counter() - start, ok))
+        return response
+
+    def call(self, name, inputs, state=(), changed=()):
+        cb = self.callbacks[name]
+        outputs = []
+        for part in cb["output"].strip(".").split("..."):
+            cid, prop = part.rsplit(".", 1)
+            outputs.append({"id": cid, "property": prop})
+        body = {
+            "output": cb["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": [{**spec, "value": value} for spec, value in zip(cb["inputs"], inputs)],
+            "state": [{**spec, "value": value} for spec, value in zip(cb["state"], state)],
+            "changedPropIds": list(changed),
+        }
+        response = self.timed(name, lambda: self.session.post(
+            self.base + "/_dash-update-component", json=body, timeout=60))
+        if response is None or response.status_code != 200:
+            return {}
+        return {cid: props for cid, props in response.json().get("response", {}).items()}
+
+
+# Virtual User
+def user_session(client, rng, state):
+    def dashboard(city, test_store):
+        out = client.call("status-message", [city, test_store], changed=["city-input.value"])
+        store = out.get("hourly-store", {}).get("data")
+        container = out.get("main-container", {}).get("className")
+        if container:
+            spec = client.call("animation-store", [container], [state.get("animation")])
+            if "animation-store" in spec:
+                state["animation"] = spec["animation-store"]["data"]
+        return store, out.get("hourly-graphs-container", {}).get("style")
+
+    def hourly(store, trigger):
+        out = client.call("temp-hourly", [1, 1, store], [state.get("view", "7days"), state.get("chart")],
+                          changed=[trigger])
+        if "temp-view-store" in out:
+            state["view"] = out["temp-view-store"]["data"]
+        if "hourly-chart-state" in out:
+            state["chart"] = out["hourly-chart-state"]["data"]
+
+    def archive(city, store, style, trigger):
+        # the browser's interval keeps asking while the backfill runs in the background
+        for tick in range(ARCHIVE_POLLS):
+            out = client.call("archive-temp", [1] * ARCHIVE_VIEWS + [style, tick],
+                              [store, city, state.get("archive_view", "year")], changed=[trigger])
+            if "archive-view-store" in out:
+                state["archive_view"] = out["archive-view-store"]["data"]
+            if out.get("archive-poll", {}).get("disabled", True):
+                return
+            trigger = "archive-poll.n_intervals"
+            time.sleep(1)
+
+    # city change, then the hourly and archive charts render from the new store
+    city = rng.choice(CITIES)
+    store, style = dashboard(city, {"active": False, "index": 0})
+    if store:
+        hourly(store, "hourly-store.data")
+        for _ in range(rng.randint(1, 3)):
+            hourly(store, rng.choice(["btn-today.n_clicks", "btn-7days.n_clicks"]))
+        archive(city, store, style, "hourly-graphs-container.style")
+        if rng.random() < 0.25:
+            view = rng.choice(["month", "year", "years"])
+            archive(city, store, style, f"btn-archive-{view}.n_clicks")
+
+    # weather-class change through test mode, about every fourth session
+    if rng.random() < 0.25:
+        index = rng.randrange(TEST_CLASSES)
+        out = client.call("test-weather-store", [1] * (TEST_CLASSES + 1), changed=[f"btn-test-{index}.n_clicks"])
+        test_store = out.get("test-weather-store", {}).get("data", {"active": True, "index": index})
+        dashboard("", test_store)
+
+
+def drive(args):
+    base, users, duration, warmup, think, seed = args
+    results, lock = [], threading.Lock()
+    stop_at = time.time() + warmup + duration
+    measure_from = time.time() + warmup
+
+    def user(n):
+        rng = random.Random(seed * 1000 + n)
+        client = DashClient(base)
+        client.load()
+        state = {}
+        while time.time() < stop_at:
+            client.samples = []
+            started = time.time()
+            user_session(client, rng, state)
+            if started >= measure_from:
+                with lock:
+                    results.extend(client.samples)
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def run_config(workers, threads, args, stub_url):
+    port = free_port()
+    cache_dir = tempfile.mkdtemp(prefix="weather-cache-")
+    env = {
+        **os.environ,
+        "NOMINATIM_URL": stub_url, "OPEN_METEO_URL": stub_url, "OPEN_METEO_ARCHIVE_URL": stub_url,
+        "WEATHER_CACHE_DIR": cache_dir,
+        # the stub is local: without a high rate the bench would measure the 1 req/s Nominatim pacing
+        "NOMINATIM_RATE": os.environ.get("NOMINATIM_RATE", "1000"),
+        "WARMER_ENABLED": "1" if args.warmer else "0",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:server", "--workers", str(workers), "--threads", str(threads),
+         "--bind", f"127.0.0.1:{port}", "--timeout", "120", "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_for(base + "/_dash-layout", timeout=60)
+        # drivers run in their own processes so the load generator is not the bottleneck
+        per_process = -(-args.users // args.driver_processes)
+        jobs = [(base, min(per_process, args.users - i * per_process), args.duration, args.warmup, args.think,
+                 args.seed + i) for i in range(args.driver_processes) if args.users - i * per_process > 0]
+        with ProcessPoolExecutor(len(jobs)) as pool:
+            samples = [s for chunk in pool.map(drive, jobs) for s in chunk]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return summarise(samples, args.duration, workers, threads)
+
+
+def summarise(samples, duration, workers, threads):
+    by_name = {}
+    for name, seconds, ok in samples:
+        by_name.setdefault(name, []).append((seconds, ok))
+    callbacks = {}
+    for name, rows in sorted(by_name.items()):
+        latencies = sorted(s * 1000 for s, _ in rows)
+        callbacks[name] = {
+            "requests": len(rows),
+            "errors": sum(1 for _, ok in rows if not ok),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+        }
+    total = sum(c["requests"] for c in callbacks.values())
+    return {
+        "workers": workers,
+        "threads": threads,
+        "requests": total,
+        "errors": sum(c["errors"] for c in callbacks.values()),
+        "throughput_rps": round(total / duration, 1),
+        "callbacks": callbacks,
+    }
+
+
+def print_config(result):
+    print(f"\n{result['workers']} worker(s) x {result['threads']} thread(s): "
+          f"{result['throughput_rps']} req/s, {result['errors']} errors of {result['requests']}")
+    print(f"  {'callback':<22}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, c in result["callbacks"].items():
+        print(f"  {name:<22}{c['requests']:>10}{c['errors']:>8}{c['p50_ms']:>10.1f}{c['p95_ms']:>10.1f}{c['p99_ms']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matrix", default="1x1,1x4,2x4,4x4", help="comma-separated WORKERSxTHREADS settings")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per setting")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before each run")
+    parser.add_argument("--think", type=float, default=0.0, help="mean think time between sessions in seconds")
+    parser.add_argument("--latency", type=float, default=0.15, help="stub upstream latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="share of stub requests answered with 503")
+    parser.add_argument("--driver-processes", type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)))
+    parser.add_argument("--warmer", action="store_true", help="keep the background cache warmer running")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    matrix = [tuple(int(n) for n in item.lower().split("x")) for item in args.matrix.split(",")]
+
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH, "stub_upstream.py"), "--port", str(stub_port), "--vary-weather",
+         "--latency", str(args.latency), "--error-rate", str(args.error_rate)],
+        stdout=subprocess.DEVNULL
+    )
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    results = []
+    try:
+        wait_for(stub_url + "/search?q=berlin")
+        for workers, threads in matrix:
+            result = run_config(workers, threads, args, stub_url)
+            print_config(result)
+            results.append(result)
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    if args.output:
+        settings = {k: v for k, v in vars(args).items() if k != "output"}
+        with open(args.output, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Per-stage timings of the update_dashboard pipeline, fully offline.
+
+Runs geocoding and forecast fetches against the local stub (synthetic responses, or recorded
+ones with --fixtures), then times every rendering stage for each weather class and both
+hourly views. Results are written as JSON so runs from different commits can be compared.
+
+    python bench/pipeline_bench.py [--repeat 50] [--fixtures bench/fixtures] [--output results.json]
+    python bench/pipeline_bench.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_upstream import StubUpstream  # noqa: E402
+
+# one representative current.weather_code per background class
+WEATHER_CLASSES = {
+    "clear": 0, "partly-cloudy": 2, "cloudy": 3, "foggy": 45,
+    "rain": 61, "snow": 71, "thunder": 95, "default": 100,
+}
+VIEWS = ("today", "7days")
+CITY = "Bayrischzell"  # not in the gazetteer, so a cold geocode reaches the stub
+
+
+def timed(fn, repeat, setup=None):
+    samples, result = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 4),
+    }, result
+
+
+def run(app, stub, repeat):
+    from dash._utils import to_json
+    from forecast import Forecast, forecast_columns
+
+    results = []
+
+    def record(stage, fn, weather_class=None, view=None, setup=None, size=None):
+        stats, result = timed(fn, repeat, setup)
+        if size is not None:
+            stats["bytes"] = len(to_json(size(result)))
+        results.append({"stage": stage, "weather_class": weather_class, "view": view, **stats})
+        return result
+
+    def cold_geocode():
+        app.geocode_cache.clear()
+
+    def cold_forecast():
+        app.forecast_cache.clear()
+        forecast_columns.clear()
+
+    coords = record("geocode", lambda: app.geocode_city(CITY), setup=cold_geocode)[0]
+    record("geocode (cached)", lambda: app.geocode_city(CITY))
+
+    for weather_class, code in WEATHER_CLASSES.items():
+        stub.weather_code = code
+        cold_forecast()
+        data = record("fetch", lambda: app.fetch_weather(*coords), weather_class, setup=cold_forecast)
+        record("fetch (cached)", lambda: app.fetch_weather(*coords), weather_class)
+
+        forecast = record("parse", lambda: Forecast(data), weather_class)
+        record("build_sun_card", lambda: app.build_sun_card(forecast), weather_class, size=lambda r: r)
+        record("build_forecast_cards", lambda: app.build_forecast_cards(forecast, CITY), weather_class, size=lambda r: r)
+        current = data["current"]
+        record("create_wind_compass", lambda: app.wind_compass_component(
+            current["wind_speed_10m"], current["wind_direction_10m"]), weather_class, size=lambda r: r)
+
+        container_class = app.update_dashboard(CITY, {"active": False})[5]
+        record("animation", lambda: app.animation_spec.__wrapped__(app.animation_key(container_class), 0),
+               weather_class, size=lambda r: r)
+
+        outputs = record("update_dashboard", lambda: app.update_dashboard(CITY, {"active": False}), weather_class)
+        record("serialise update_dashboard", lambda: to_json(list(outputs)), weather_class)
+
+        hourly_store = outputs[4]
+        for view in VIEWS:
+            figures = record("charts", lambda: app.build_hourly_figures(hourly_store, view), weather_class, view,
+                             size=lambda r: list(r[:2]))
+            record("charts (patch)", lambda: app.build_hourly_figures(hourly_store, view, figures[2]),
+                   weather_class, view, size=lambda r: list(r[:2]))
+
+    stub.weather_code = None
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarise(results):
+    # one line per stage, the median over all weather classes and views
+    stages = {}
+    for row in results:
+        stages.setdefault(row["stage"], []).append(row)
+    return {
+        stage: {
+            "median_ms": round(statistics.median(r["median_ms"] for r in rows), 4),
+            "bytes": max((r.get("bytes", 0) for r in rows), default=0),
+        }
+        for stage, rows in stages.items()
+    }
+
+
+def print_summary(summary, out=sys.stderr):
+    print(f"{'stage':<30}{'median ms':>12}{'bytes':>10}", file=out)
+    for stage, row in summary.items():
+        print(f"{stage:<30}{row['median_ms']:>12.3f}{row['bytes'] or '':>10}", file=out)
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    print(f"{'stage':<30}{'before ms':>12}{'after ms':>12}{'change':>10}")
+    for stage, row in after["summary"].items():
+        old = before["summary"].get(stage)
+        if old is None:
+            print(f"{stage:<30}{'-':>12}{row['median_ms']:>12.3f}{'new':>10}")
+            continue
+        change = (row["median_ms"] / old["median_ms"] - 1) * 100 if old["median_ms"] else 0.0
+        print(f"{stage:<30}{old['median_ms']:>12.3f}{row['median_ms']:>12.3f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--fixtures", help="directory of recorded responses (see stub_upstream.py --record)")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    stub = StubUpstream(fixtures=args.fixtures).start()
+    os.environ["NOMINATIM_URL"] = stub.url
+    os.environ["OPEN_METEO_URL"] = stub.url
+    # the stub is local: without a high rate the bench would measure the 1 req/s Nominatim pacing
+    os.environ.setdefault("NOMINATIM_RATE", "1000")
+    os.environ["WEATHER_CACHE_DIR"] = tempfile.mkdtemp(prefix="weather-cache-")
+    os.environ["WARMER_ENABLED"] = "0"
+    import app
+
+    results = run(app, stub, args.repeat)
+    stub.stop()
+
+    summary = summarise(results)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "fast_json": app.fastjson.FAST_JSON_ENABLED,
+            "fixtures": "recorded" if args.fixtures else "synthetic",
+            "repeat": args.repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "summary": summary,
+        "results": results,
+    }
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
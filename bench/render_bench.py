@@ -0,0 +1,210 @@
+"""Build and serialisation timings for the dashboard's figure renderers.
+
+    python bench/render_bench.py [--repeat 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("WARMER_ENABLED", "0")
+
+import plotly.graph_objects as go  # noqa: E402
+from plotly.io.json import to_json_plotly  # noqa: E402
+
+import app  # noqa: E402
+from forecast import Forecast  # noqa: E402
+
+
+def measure(fn, repeat):
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        payload = to_json_plotly(fn(i))
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, len(payload)
+
+
+def report(section, rows):
+    print(f"\n{section}")
+    print(f"  {'variant':<38}{'median ms':>12}{'bytes':>10}")
+    for name, (ms, size) in rows:
+        print(f"  {name:<38}{ms:>12.3f}{size:>10}")
+
+
+def bench_compass(repeat):
+    directions = [(i * 37) % 360 for i in range(repeat)]
+    rows = [
+        ("go.Figure, validated (previous path)", measure(
+            lambda i: go.Figure(app.compass_figure.__wrapped__(directions[i])), repeat)),
+        ("template + arrow dicts, uncached", measure(
+            lambda i: app.compass_figure.__wrapped__(directions[i]), repeat)),
+        ("template + arrow dicts, memoised", measure(
+            lambda i: app.create_wind_compass(0, directions[i]), repeat)),
+        ("inline SVG, uncached", measure(
+            lambda i: app.html.Img(src=app.compass_svg.__wrapped__(directions[i])), repeat)),
+        ("inline SVG, memoised", measure(
+            lambda i: app.create_wind_compass_svg(0, directions[i]), repeat)),
+    ]
+    report("wind compass (build + JSON)", rows)
+
+
+def plotly_sun_arc(progress, arc_color, celestial_color, glow_color):
+    # the per-request Plotly figure the sun card used to build, kept as the baseline
+    import math
+    cx, cy, r = 70, 0, 52
+    angles = [math.pi * i / 100 for i in range(101)]
+    prog_angles = angles[:int(progress * 100) + 1]
+    a = math.pi * progress
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=[cx + r * math.cos(t) for t in angles], y=[cy + r * math.sin(t) for t in angles],
+                             mode="lines", line=dict(color="rgba(255,255,255,0.18)", width=9)))
+    fig.add_trace(go.Scatter(x=[cx + r * math.cos(t) for t in prog_angles], y=[cy + r * math.sin(t) for t in prog_angles],
+                             mode="lines", line=dict(color=arc_color, width=9)))
+    fig.add_trace(go.Scatter(x=[cx + r * math.cos(a)], y=[cy + r * math.sin(a)], mode="markers",
+                             marker=dict(size=42, color=glow_color, opacity=0.4)))
+    fig.add_trace(go.Scatter(x=[cx + r * math.cos(a)], y=[cy + r * math.sin(a)], mode="markers",
+                             marker=dict(size=32, color=celestial_color)))
+    fig.update_layout(xaxis=dict(range=[0, 140], visible=False), yaxis=dict(range=[0, 100], visible=False),
+                      width=140, height=100, showlegend=False)
+    return app.dcc.Graph(figure=fig, config={"displayModeBar": False}, className="sun-moon-graph")
+
+
+def bench_sun_card(repeat):
+    progress = [(i * 0.0137) % 1 for i in range(repeat)]
+    colours = ("#FFB84D", "#FFD700", "#FFA500")
+    rows = [
+        ("Plotly dcc.Graph (previous path)", measure(lambda i: plotly_sun_arc(progress[i], *colours), repeat)),
+        ("SVG arc, uncached", measure(
+            lambda i: app.html.Img(src=app.sun_arc_svg.__wrapped__(int(progress[i] * 1000), *colours)), repeat)),
+        ("SVG arc, memoised", measure(
+            lambda i: app.html.Img(src=app.sun_arc_svg(int(progress[i] * 1000), *colours)), repeat)),
+    ]
+    report("sun/moon arc (build + JSON)", rows)
+
+
+def px_hourly_figures(hourly_store, view):
+    # the plotly.express path the hourly charts used to take, kept as the baseline
+    import pandas as pd
+    import plotly.express as px
+    df = pd.DataFrame({k: v for k, v in hourly_store.items() if k != "text_class"})
+    df["time"] = pd.to_datetime(df["time"])
+    if view == "today":
+        df = df[df["time"].dt.date == pd.Timestamp.now().date()]
+    is_dark = hourly_store["text_class"] == "dark-text"
+    font_color = "#1a1a1a" if is_dark else "#ffffff"
+    grid_color = "rgba(0,0,0,0.25)" if is_dark else "rgba(255,255,255,0.3)"
+    layout = dict(
+        template="plotly_white" if is_dark else "plotly_dark", paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(255,255,255,0.1)" if is_dark else "rgba(0,0,0,0.2)", font=dict(color=font_color, size=16),
+        margin=dict(t=100, l=80, r=80, b=90), hovermode="x unified",
+        xaxis=dict(showgrid=True, gridcolor=grid_color, gridwidth=2),
+        yaxis=dict(showgrid=True, gridcolor=grid_color, gridwidth=2), title_font=dict(size=22, color=font_color)
+    )
+    temp_fig = px.line(df, x="time", y="temperature_2m")
+    temp_fig.update_traces(line=dict(color="#ff6b6b", width=5), fill="tozeroy", fillcolor="rgba(255,107,107,0.15)")
+    temp_fig.update_layout(title="<b>Temperaturverlauf</b>", yaxis_title="<b>Temperatur (°C)</b>", **layout)
+    precip_fig = px.bar(df, x="time", y="precipitation")
+    precip_fig.update_traces(marker_color="#45b7d1", opacity=0.85)
+    precip_fig.update_layout(title="<b>Niederschlag</b>", yaxis_title="<b>Niederschlag (mm)</b>", **layout)
+    return [temp_fig, precip_fig]
+
+
+def hourly_store(hours):
+    start = app.np.datetime64(app.datetime.now().date(), "h")
+    times = start + app.np.arange(hours)
+    return {
+        "time": app.np.datetime_as_string(times, unit="m").tolist(),
+        "temperature_2m": [round(12 + 6 * app.math.sin(i / 24 * 2 * app.math.pi), 1) for i in range(hours)],
+        "precipitation": [round(max(0.0, app.math.sin(i / 7)), 1) for i in range(hours)],
+        "text_class": "light-text"
+    }
+
+
+def bench_hourly_charts(repeat):
+    repeat = max(1, repeat // 4)
+    for hours, view in ((24, "today"), (168, "7days")):
+        store = hourly_store(hours)
+        rows = [
+            ("plotly.express (previous path)", measure(lambda i: px_hourly_figures(store, view), repeat)),
+            ("cached theme + typed arrays", measure(lambda i: app.build_hourly_figures(store, view)[:2], repeat)),
+            ("Patch, same theme", measure(
+                lambda i: app.build_hourly_figures(store, view, {"theme": "light-text"})[:2], repeat)),
+        ]
+        report(f"hourly charts, {hours} h (both figures, build + JSON)", rows)
+
+
+def pandas_daily_cards(payload):
+    # the DataFrame + iterrows path the forecast and sun cards used to take, kept as the baseline
+    import pandas as pd
+    daily_df = pd.DataFrame(payload["daily"])
+    daily_df["time"] = pd.to_datetime(daily_df["time"])
+    cards = []
+    for i, row in daily_df.iloc[1:7].iterrows():
+        time_obj = pd.to_datetime(row["time"]) if isinstance(row["time"], str) else row["time"]
+        _, icon_file, _, _ = app.get_weather_info(row.get("weather_code", 0))
+        cards.append(app.html.Div([
+            app.html.H4(time_obj.strftime("%a %d.%m"), className="card-title"),
+            app.icon_image(icon_file, "card-icon"),
+            app.html.P(f"{round(row['temperature_2m_min'])}° / {round(row['temperature_2m_max'])}°", className="card-value")
+        ], className="card card-animate forecast-card", style={"animationDelay": f"{0.4 + len(cards)*0.1}s"}))
+    sunrise = app.to_berlin(daily_df.iloc[0]["sunrise"])
+    sunset = app.to_berlin(daily_df.iloc[0]["sunset"])
+    hourly_df = pd.DataFrame(payload["hourly"])
+    hourly_df["time"] = pd.to_datetime(hourly_df["time"])
+    today = hourly_df[hourly_df["time"].dt.date == pd.Timestamp.now().date()]
+    return app.html.Div(cards, className="cards-container forecast-container"), sunrise, sunset, len(today)
+
+
+def columnar_daily_cards(forecast):
+    today = forecast.day_slice(app.datetime.now().date())
+    sunrise, sunset = app.to_berlin(forecast.sunrise[0]), app.to_berlin(forecast.sunset[0])
+    return app.build_forecast_cards(forecast, ""), sunrise, sunset, today.stop - today.start
+
+
+def forecast_payload(days=7):
+    store = hourly_store(24 * days)
+    start = app.np.datetime64(app.datetime.now().date(), "D")
+    dates = start + app.np.arange(days)
+    minutes = dates.astype("datetime64[m]")
+    return {
+        "latitude": 52.52, "longitude": 13.42,
+        "current": {"time": store["time"][0]},
+        "hourly": {k: v for k, v in store.items() if k != "text_class"},
+        "daily": {
+            "time": app.np.datetime_as_string(dates).tolist(),
+            "temperature_2m_max": [14.2 + d for d in range(days)],
+            "temperature_2m_min": [6.1 + d for d in range(days)],
+            "precipitation_sum": [1.2] * days,
+            "weather_code": [61, 3, 2, 1, 0, 61, 71][:days],
+            "sunrise": app.np.datetime_as_string(minutes + 441).tolist(),
+            "sunset": app.np.datetime_as_string(minutes + 1092).tolist(),
+        }
+    }
+
+
+def bench_forecast_parse(repeat):
+    payload = forecast_payload()
+    legacy, columnar = pandas_daily_cards(payload), columnar_daily_cards(app.parse_forecast(payload, (52.52, 13.42)))
+    assert to_json_plotly(legacy[0]) == to_json_plotly(columnar[0]) and legacy[1:] == columnar[1:], \
+        "columnar forecast differs from the DataFrame path"
+    rows = [
+        ("DataFrame + iterrows (previous path)", measure(lambda i: pandas_daily_cards(payload)[0], repeat)),
+        ("columnar, parsed per request", measure(
+            lambda i: columnar_daily_cards(Forecast(payload))[0], repeat)),
+        ("columnar, parsed once per response", measure(
+            lambda i: columnar_daily_cards(app.parse_forecast(payload, (52.52, 13.42)))[0], repeat)),
+    ]
+    report("forecast parse + day cards + today slice", rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    bench_compass(args.repeat)
+    bench_sun_card(args.repeat)
+    bench_hourly_charts(args.repeat)
+    bench_forecast_parse(args.repeat)
@@ -0,0 +1,103 @@
+"""Check that the Nominatim scheduler holds the rate limit across worker processes.
+
+Several forked processes, each with its own copy of the app, geocode places only the stub knows
+while one process geocodes at background priority. Exits non-zero if two Nominatim requests
+ever arrive closer together than the configured rate allows, if throughput falls well short
+of it, if background lookups are served ahead of interactive ones, or if identical pending
+queries reach the stub more than once.
+
+    python bench/scheduler_check.py [--rate 5] [--workers 4] [--lookups 6]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_upstream import StubUpstream  # noqa: E402
+
+failures = []
+
+def check(name, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}: {detail}")
+    if not ok:
+        failures.append(name)
+
+
+def worker(names, priority, start_at, results):
+    import app
+    time.sleep(max(0.0, start_at - time.time()))
+    for name in names:
+        started = time.time()
+        coords, error = app.geocode_city(name, priority=priority)
+        results.put((priority, name, time.time() - started, error))
+
+
+def run(processes):
+    results = multiprocessing.get_context("fork").Queue()
+    procs = [multiprocessing.get_context("fork").Process(target=worker, args=(*p, results)) for p in processes]
+    for p in procs:
+        p.start()
+    rows = [results.get(timeout=300) for p in processes for _ in p[0]]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=5.0, help="Nominatim requests per second")
+    parser.add_argument("--workers", type=int, default=4, help="interactive processes")
+    parser.add_argument("--lookups", type=int, default=6, help="distinct places per interactive process")
+    args = parser.parse_args()
+
+    stub = StubUpstream().start()
+    os.environ.update({
+        "NOMINATIM_URL": stub.url, "OPEN_METEO_URL": stub.url, "WARMER_ENABLED": "0",
+        "WEATHER_CACHE_DIR": tempfile.mkdtemp(prefix="weather-cache-"), "NOMINATIM_RATE": str(args.rate),
+        "NOMINATIM_QUEUE_TIMEOUT": "120", "NOMINATIM_BACKGROUND_QUEUE_TIMEOUT": "120",
+    })
+    from scheduler import INTERACTIVE, BACKGROUND, NOMINATIM_SLOT_MARGIN
+    interval = 1.0 / args.rate
+    best = 1.0 / (interval + NOMINATIM_SLOT_MARGIN)
+
+    # interactive processes plus a background one, all released at the same moment
+    start_at = time.time() + 2
+    interactive = [[f"Ort {w * 100 + i}" for i in range(args.lookups)] for w in range(args.workers)]
+    background = [f"Ort {9000 + i}" for i in range(args.lookups)]
+    rows = run([(names, INTERACTIVE, start_at) for names in interactive] + [(background, BACKGROUND, start_at)])
+
+    searches = sorted(t for path, t, _ in stub.arrivals if path == "/search")
+    gaps = [b - a for a, b in zip(searches, searches[1:])]
+    span = searches[-1] - searches[0] if len(searches) > 1 else 0.0
+    check("errors", not any(r[3] for r in rows), f"{sum(1 for r in rows if r[3])} of {len(rows)} lookups failed")
+    check("rate limit", min(gaps) >= interval,
+          f"{len(searches)} requests, smallest gap {min(gaps) * 1000:.0f} ms (limit {interval * 1000:.0f} ms)")
+    achieved = (len(searches) - 1) / span if span else 0.0
+    check("throughput", achieved >= best * 0.95,
+          f"{achieved:.2f} req/s, {best:.2f} possible with the slot margin, {args.rate:g} allowed")
+
+    # background lookups only get slots nobody interactive is waiting for
+    order = [name for path, _, name in sorted(stub.arrivals, key=lambda a: a[1]) if path == "/search"]
+    last_interactive = max(i for i, name in enumerate(order) if not name.startswith("ort 9"))
+    early_background = sum(1 for name in order[:last_interactive] if name.startswith("ort 9"))
+    waits = {p: sorted(r[2] for r in rows if r[0] == p) for p in (INTERACTIVE, BACKGROUND)}
+    check("priority", early_background <= 1,
+          f"{early_background} background lookup(s) served before the interactive queue drained; "
+          f"longest wait interactive {waits[INTERACTIVE][-1]:.2f}s, background {waits[BACKGROUND][-1]:.2f}s")
+
+    # the same place asked by every process at once reaches Nominatim once
+    stub.reset()
+    rows = run([(["Hiddensee"], INTERACTIVE, time.time() + 1) for _ in range(args.workers)])
+    check("dedupe", stub.paths.get("/search", 0) == 1 and not any(r[3] for r in rows),
+          f"{args.workers} concurrent lookups, {stub.paths.get('/search', 0)} Nominatim request(s)")
+
+    stub.stop()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Cold-start budget for a dashboard worker: import time, time to first served layout, RSS.
+
+    python bench/startup_bench.py [--runs 5] [--max-import-ms 1500] [--max-first-layout-ms 1750] [--max-rss-mb 120]
+
+Every run boots a fresh interpreter, like a gunicorn worker without --preload. Exits with
+status 1 when a median exceeds its budget or a deferred module was loaded during boot.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# loaded on first use only, a worker that imports them at boot has regressed
+DEFERRED_MODULES = ["pandas", "plotly.express", "plotly.graph_objs._scatter", "plotly.graph_objs._layout",
+                    "PIL.Image", "diskcache", "multiprocess"]
+
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.server.test_client()
+assert client.get("/").status_code == 200
+assert client.get("/_dash-layout").status_code == 200
+assert client.get("/_dash-dependencies").status_code == 200
+served = time.perf_counter()
+
+rss = 0
+try:
+    with open("/proc/self/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+except (OSError, StopIteration):
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_layout_ms": (served - start) * 1000,
+    "rss_mb": rss,
+    "loaded": [m for m in %r if m in sys.modules]
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def boot():
+    env = {**os.environ, "WARMER_ENABLED": "0", "PYTHONDONTWRITEBYTECODE": "1"}
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=float(os.environ.get("STARTUP_MAX_IMPORT_MS", 1500)))
+    parser.add_argument("--max-first-layout-ms", type=float,
+                        default=float(os.environ.get("STARTUP_MAX_FIRST_LAYOUT_MS", 1750)))
+    parser.add_argument("--max-rss-mb", type=float, default=float(os.environ.get("STARTUP_MAX_RSS_MB", 120)))
+    args = parser.parse_args()
+
+    boot()  # warm the OS page cache, the first boot reads every .py from disk
+    runs = [boot() for _ in range(args.runs)]
+
+    budgets = {"import_ms": args.max_import_ms, "first_layout_ms": args.max_first_layout_ms, "rss_mb": args.max_rss_mb}
+    failed = False
+    print(f"{'metric':<18}{'median':>10}{'max':>10}{'budget':>10}")
+    for metric, budget in budgets.items():
+        values = [run[metric] for run in runs]
+        median = statistics.median(values)
+        over = median > budget
+        failed |= over
+        print(f"{metric:<18}{median:>10.1f}{max(values):>10.1f}{budget:>10.0f}{'  OVER BUDGET' if over else ''}")
+
+    loaded = sorted({m for run in runs for m in run["loaded"]})
+    if loaded:
+        failed = True
+        print(f"deferred modules loaded at boot: {', '.join(loaded)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""Local stand-in for Nominatim and Open-Meteo.
+
+Serves /search, /v1/forecast and /v1/archive over HTTP/1.1 keep-alive with configurable
+latency and error rate, and counts connections and requests so callers can
+check pooling and retry behaviour. Responses are synthetic unless a directory
+of recorded ones is given; --record captures them from the real services.
+
+    python bench/stub_upstream.py --port 8081 --latency 0.2 --error-rate 0.05
+    python bench/stub_upstream.py --record bench/fixtures
+    python bench/stub_upstream.py --fixtures bench/fixtures
+"""
+import argparse
+import datetime as dt
+import gzip
+import json
+import math
+import os
+import random
+import socket
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+CITIES = {
+    "berlin": (52.5200, 13.4050),
+    "hamburg": (53.5511, 9.9937),
+    "muenchen": (48.1372, 11.5756),
+    "koeln": (50.9375, 6.9603),
+    "frankfurt am main": (50.1109, 8.6821),
+    "stuttgart": (48.7758, 9.1829),
+    "duesseldorf": (51.2277, 6.7735),
+    "leipzig": (51.3397, 12.3731),
+    "dortmund": (51.5136, 7.4653),
+    "essen": (51.4556, 7.0116),
+    "bremen": (53.0793, 8.8017),
+    "dresden": (51.0504, 13.7373),
+    # not in the bundled gazetteer, so lookups reach the stub
+    "bayrischzell": (47.6742, 12.0147),
+    "hiddensee": (54.5500, 13.1000),
+    "wangerooge": (53.7900, 7.8994),
+}
+
+# one code per background class, see WEATHER_MAPPING in app.py
+VARIED_CODES = (0, 2, 3, 45, 61, 71, 95)
+
+FOLDING = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+def query_name(query):
+    return " ".join(query.get("q", [""])[0].split()).casefold().translate(FOLDING)
+
+
+def synthetic_place(name):
+    # "Ort 17": any number of distinct places on a 0.1° grid over Germany, each its own forecast cell
+    prefix, _, number = name.partition(" ")
+    if prefix != "ort" or not number.isdigit():
+        return None
+    n = int(number)
+    return round(47.5 + n % 50 * 0.1, 4), round(6.0 + n // 50 % 80 * 0.1, 4)
+
+
+def nominatim_payload(query):
+    name = query_name(query)
+    if name not in CITIES and synthetic_place(name) is None:
+        return []
+    lat, lon = CITIES.get(name) or synthetic_place(name)
+    return [{"lat": str(lat), "lon": str(lon), "display_name": name.title()}]
+
+
+def forecast_payload(query, weather_code=61, days=7):
+    lats = query.get("latitude", ["52.52"])[0].split(",")
+    lons = query.get("longitude", ["13.40"])[0].split(",")
+    if len(lats) > 1:
+        return [location_payload(float(lat), float(lon), weather_code, days) for lat, lon in zip(lats, lons)]
+    return location_payload(float(lats[0]), float(lons[0]), weather_code, days)
+
+
+def location_payload(lat, lon, weather_code=61, days=7):
+    rng = random.Random(f"{lat:.2f},{lon:.2f}")
+    start = dt.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    hours = [start + dt.timedelta(hours=i) for i in range(24 * days)]
+    base = 8 + rng.uniform(-3, 3)
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "timezone": "Europe/Berlin",
+        "current": {
+            "time": dt.datetime.now().strftime("%Y-%m-%dT%H:00"),
+            "interval": 900,
+            "temperature_2m": round(base + 3, 1),
+            "apparent_temperature": round(base + 1, 1),
+            "precipitation": 0.2,
+            "weather_code": weather_code,
+            "wind_speed_10m": round(rng.uniform(3, 40), 1),
+            "wind_direction_10m": rng.randrange(360),
+        },
+        "hourly": {
+            "time": [h.strftime("%Y-%m-%dT%H:%M") for h in hours],
+            "temperature_2m": [round(base + 5 * math.sin((i - 9) / 24 * 2 * math.pi), 1) for i in range(len(hours))],
+            "precipitation": [round(max(0.0, rng.gauss(0, 0.6)), 1) for _ in hours],
+        },
+        "daily": {
+            "time": [(start + dt.timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days)],
+            "temperature_2m_max": [round(base + 5 + rng.uniform(-2, 2), 1) for _ in range(days)],
+            "temperature_2m_min": [round(base - 5 + rng.uniform(-2, 2), 1) for _ in range(days)],
+            "precipitation_sum": [round(rng.uniform(0, 6), 1) for _ in range(days)],
+            "weather_code": [weather_code] + [rng.choice([0, 1, 2, 3, 45, 61, 71, 95]) for _ in range(days - 1)],
+            "sunrise": [(start + dt.timedelta(days=d, hours=7, minutes=21)).strftime("%Y-%m-%dT%H:%M") for d in range(days)],
+            "sunset": [(start + dt.timedelta(days=d, hours=18, minutes=12)).strftime("%Y-%m-%dT%H:%M") for d in range(days)],
+        },
+    }
+
+
+def archive_payload(query):
+    # daily history with a seasonal cycle, the same values for a location and day on every request
+    lat, lon = float(query.get("latitude", ["52.52"])[0]), float(query.get("longitude", ["13.40"])[0])
+    start = dt.date.fromisoformat(query["start_date"][0])
+    end = dt.date.fromisoformat(query["end_date"][0])
+    days = [start + dt.timedelta(days=d) for d in range((end - start).days + 1)]
+    daily = {"time": [day.isoformat() for day in days]}
+    columns = {"temperature_2m_max": [], "temperature_2m_min": [], "temperature_2m_mean": [], "precipitation_sum": []}
+    for day in days:
+        if day >= dt.date.today():
+            for values in columns.values():
+                values.append(None)
+            continue
+        rng = random.Random(f"{lat:.2f},{lon:.2f},{day}")
+        mean = 9.5 - (lat - 51) + 9 * math.sin((day.timetuple().tm_yday - 110) / 365.25 * 2 * math.pi) + rng.gauss(0, 3)
+        columns["temperature_2m_mean"].append(round(mean, 1))
+        columns["temperature_2m_max"].append(round(mean + rng.uniform(2, 7), 1))
+        columns["temperature_2m_min"].append(round(mean - rng.uniform(2, 7), 1))
+        columns["precipitation_sum"].append(round(rng.expovariate(0.5), 1) if rng.random() < 0.45 else 0.0)
+    requested = query.get("daily", [""])[0].split(",")
+    daily.update({name: values for name, values in columns.items() if name in requested})
+    return {"latitude": lat, "longitude": lon, "timezone": "Europe/Berlin", "daily": daily}
+
+
+# Recorded Fixtures
+FIXTURE_FILES = {"search": "nominatim.json", "forecast": "open_meteo.json"}
+
+def record_fixtures(directory, nominatim="https://nominatim.openstreetmap.org", open_meteo="https://api.open-meteo.com"):
+    headers = {"User-Agent": "WeatherDashboardStudentProject/1.0 (benchmark fixtures)"}
+
+    def fetch(url):
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=20) as response:
+            return json.load(response)
+
+    search, forecast = {}, {}
+    for name in CITIES:
+        search[name] = fetch(f"{nominatim}/search?" + urlencode({"q": name, "countrycodes": "de", "format": "json", "limit": 1}))
+        time.sleep(1)  # Nominatim usage policy: at most one request per second
+    for lat, lon in CITIES.values():
+        forecast[f"{lat:.4f},{lon:.4f}"] = fetch(
+            f"{open_meteo}/v1/forecast?latitude={lat}&longitude={lon}"
+            "&current=temperature_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m,wind_direction_10m"
+            "&hourly=temperature_2m,precipitation"
+            "&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,weather_code,sunrise,sunset"
+            "&timezone=Europe%2FBerlin&forecast_days=7"
+        )
+    os.makedirs(directory, exist_ok=True)
+    for kind, data in (("search", search), ("forecast", forecast)):
+        with open(os.path.join(directory, FIXTURE_FILES[kind]), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    return len(search), len(forecast)
+
+
+def shift_time(value, days):
+    if not value:
+        return value
+    shifted = dt.datetime.fromisoformat(value) + dt.timedelta(days=days)
+    return shifted.strftime("%Y-%m-%d" if len(value) == 10 else "%Y-%m-%dT%H:%M")
+
+
+def rebase(payload):
+    # recorded forecasts are moved to start today, so "today" slices and the sun arc stay meaningful
+    payload = json.loads(json.dumps(payload))
+    days = (dt.date.today() - dt.date.fromisoformat(payload["daily"]["time"][0])).days
+    for section, columns in (("hourly", ["time"]), ("daily", ["time", "sunrise", "sunset"])):
+        for column in columns:
+            if column in payload.get(section, {}):
+                payload[section][column] = [shift_time(v, days) for v in payload[section][column]]
+    if "current" in payload:
+        payload["current"]["time"] = dt.datetime.now().strftime("%Y-%m-%dT%H:00")
+    return payload
+
+
+def fixture_routes(directory):
+    with open(os.path.join(directory, FIXTURE_FILES["search"]), encoding="utf-8") as f:
+        search = json.load(f)
+    with open(os.path.join(directory, FIXTURE_FILES["forecast"]), encoding="utf-8") as f:
+        recorded = [(tuple(map(float, key.split(","))), payload) for key, payload in json.load(f).items()]
+
+    def nearest(lat, lon):
+        return min(recorded, key=lambda entry: (entry[0][0] - lat) ** 2 + (entry[0][1] - lon) ** 2)[1]
+
+    def forecast(query):
+        lats = [float(v) for v in query.get("latitude", ["52.52"])[0].split(",")]
+        lons = [float(v) for v in query.get("longitude", ["13.40"])[0].split(",")]
+        payloads = [rebase(nearest(lat, lon)) for lat, lon in zip(lats, lons)]
+        return payloads if len(payloads) > 1 else payloads[0]
+
+    return {
+        "/search": lambda query: search.get(query_name(query), []),
+        "/v1/forecast": forecast,
+        "/v1/archive": archive_payload,
+    }
+
+
+class StubUpstream:
+    def __init__(self, latency=0.0, error_rate=0.0, fail_first=0, error_status=503,
+                 host="127.0.0.1", port=0, seed=0, fixtures=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_first = fail_first
+        self.error_status = error_status
+        # overrides current.weather_code of every forecast served, None keeps the payload's own;
+        # vary_weather gives each location its own fixed code instead
+        self.weather_code = None
+        self.vary_weather = False
+        if fixtures:
+            self.routes = fixture_routes(fixtures)
+        else:
+            self.routes = {
+                "/search": nominatim_payload,
+                "/v1/forecast": forecast_payload,
+                "/v1/archive": archive_payload,
+            }
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self):
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+            self.errors = 0
+            self.gzipped = 0
+            self.paths = {}
+            self.arrivals = []
+
+    def _next_status(self):
+        with self._lock:
+            self.requests += 1
+            if self.requests <= self.fail_first or self._rng.random() < self.error_rate:
+                self.errors += 1
+                return self.error_status
+        return None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # headers and body go out as two writes; without this Nagle holds the body for ~40 ms
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out and closed the connection
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                with stub._lock:
+                    stub.paths[parsed.path] = stub.paths.get(parsed.path, 0) + 1
+                    stub.arrivals.append((parsed.path, time.time(), query_name(parse_qs(parsed.query))))
+                if stub.latency:
+                    time.sleep(stub.latency)
+                route = stub.routes.get(parsed.path)
+                status = stub._next_status()
+                if route is None:
+                    status, payload = 404, {"error": True, "reason": "not found"}
+                elif status is not None:
+                    payload = {"error": True, "reason": "stub failure"}
+                else:
+                    status, payload = 200, route(parse_qs(parsed.query))
+                    if (stub.weather_code is not None or stub.vary_weather) and parsed.path == "/v1/forecast":
+                        for location in payload if isinstance(payload, list) else [payload]:
+                            location["current"]["weather_code"] = stub.weather_code if not stub.vary_weather else \
+                                VARIED_CODES[int(location["latitude"] * 100 + location["longitude"] * 100) % len(VARIED_CODES)]
+                body = json.dumps(payload).encode()
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, 5)
+                    self.send_header("Content-Encoding", "gzip")
+                    with stub._lock:
+                        stub.gzipped += 1
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--fixtures", help="serve recorded responses from this directory")
+    parser.add_argument("--vary-weather", action="store_true", help="give every location its own weather class")
+    parser.add_argument("--record", metavar="DIR", help="record responses from the real services and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        searches, forecasts = record_fixtures(args.record)
+        print(f"recorded {searches} searches and {forecasts} forecasts to {args.record}")
+        raise SystemExit(0)
+
+    stub = StubUpstream(latency=args.latency, error_rate=args.error_rate, error_status=args.error_status,
+                        host=args.host, port=args.port, fixtures=args.fixtures)
+    stub.vary_weather = args.vary_weather
+    print(f"stub upstream on {stub.url}", flush=True)
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,106 @@
+"""Check connection reuse and retry behaviour of the upstream client.
+
+Runs geocode_city and fetch_weather against a local stub and exits non-zero
+if the pooled session opens more than one connection or does not retry.
+
+    python bench/upstream_check.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_upstream import StubUpstream
+
+stub = StubUpstream().start()
+os.environ["NOMINATIM_URL"] = stub.url
+os.environ["OPEN_METEO_URL"] = stub.url
+os.environ["WEATHER_CACHE_DIR"] = tempfile.mkdtemp(prefix="weather-cache-")
+os.environ.setdefault("UPSTREAM_RETRY_BACKOFF", "0.01")
+os.environ.setdefault("NOMINATIM_RATE", "1000")
+
+import app  # noqa: E402
+
+failures = []
+
+def check(name, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}: {detail}")
+    if not ok:
+        failures.append(name)
+
+def fresh():
+    app.geocode_cache.clear()
+    app.forecast_cache.clear()
+    stub.reset()
+
+
+# keep-alive: sequential calls share one pooled connection
+fresh()
+for i in range(20):
+    app.geocode_cache.clear()
+    app.geocode_city("Bayrischzell")
+    app.forecast_cache.clear()
+    app.fetch_weather(52.52, 13.405)
+# one pooled connection per adapter, Nominatim has its own without retries
+check("connection reuse", stub.connections == 2, f"{stub.requests} requests over {stub.connections} connection(s)")
+check("gzip negotiation", stub.gzipped == stub.requests, f"{stub.gzipped}/{stub.requests} responses gzip-encoded")
+
+# 5xx is retried with backoff
+fresh()
+stub.fail_first, stub.error_status = 2, 503
+data = app.fetch_weather(52.52, 13.405)
+check("retry on 503", "current" in data and stub.requests == 3, f"{stub.requests} attempts, got data: {'current' in data}")
+
+# 429 is retried, honouring Retry-After
+fresh()
+stub.fail_first, stub.error_status = 2, 429
+data = app.fetch_weather(52.52, 13.405)
+check("retry on 429", "current" in data and stub.requests == 3, f"{stub.requests} attempts, got data: {'current' in data}")
+
+# Nominatim is paced by the scheduler, a retry would go out without a slot
+fresh()
+stub.fail_first, stub.error_status = 1, 429
+coords, error = app.geocode_city("Hiddensee")
+check("no geocode retry", error == "Zu viele Anfragen, bitte gleich erneut versuchen" and stub.requests == 1,
+      f"{stub.requests} attempt(s), result {coords or error}")
+
+# a failing Nominatim is a connection problem, not an unknown city
+fresh()
+stub.fail_first, stub.error_status = 1, 503
+coords, error = app.geocode_city("Hiddensee")
+check("geocode 503", error == "Verbindungsfehler", f"result {coords or error}")
+
+# an expired entry still in its grace period beats the error
+fresh()
+app.geocode_cache.set(app.normalize_city("Hiddensee"), {"coords": (54.55, 13.1)}, expires=time.time() - 60)
+stub.fail_first, stub.error_status = 1, 429
+coords, error = app.geocode_city("Hiddensee")
+check("geocode stale fallback", coords == (54.55, 13.1) and stub.requests == 1, f"result {coords or error}")
+
+# retries are bounded
+fresh()
+stub.fail_first, stub.error_status = 100, 503
+data = app.fetch_weather(52.52, 13.405)
+check("bounded retries", data == {} and stub.requests == app.upstream.RETRY_TOTAL + 1, f"{stub.requests} attempts before giving up")
+
+# a read timeout is not retried: one attempt, surfaced (and labelled) as a timeout
+fresh()
+stub.latency = 0.6
+began = time.perf_counter()
+try:
+    app.upstream.get(f"{stub.url}/v1/forecast", params={"latitude": 1, "longitude": 2}, timeout=(1, 0.3))
+    raised = None
+except app.requests.RequestException as e:
+    raised = e
+elapsed = time.perf_counter() - began
+time.sleep(stub.latency)
+stub.latency = 0
+attempts = stub.paths.get("/v1/forecast", 0)
+timeouts = dict((tuple(k), v) for k, v in app.metrics.UPSTREAM_SECONDS.values()).get(("other", "timeout"))
+check("no read-timeout retry", isinstance(raised, app.requests.ReadTimeout) and attempts == 1 and timeouts,
+      f"{attempts} attempt(s) in {elapsed:.2f} s, {type(raised).__name__}")
+
+stub.stop()
+sys.exit(1 if failures else 0)
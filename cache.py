@@ -0,0 +1,258 @@
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import fastjson
+
+CACHE_DIR = os.environ.get(
+    "WEATHER_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".weather-cache")
+)
+CACHE_DB = os.path.join(CACHE_DIR, "cache.sqlite3")
+
+# Key Normalisation
+UMLAUT_FOLDING = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+def normalize_city(name):
+    # composed first: a decomposed "u" + U+0308 (macOS input, copy-paste) must fold to "ue" like "ü"
+    key = unicodedata.normalize("NFC", " ".join(name.split()).casefold()).translate(UMLAUT_FOLDING)
+    key = unicodedata.normalize("NFKD", key)
+    return "".join(c for c in key if not unicodedata.combining(c))
+
+
+# In-Process LRU
+class LRUCache:
+    def __init__(self, maxsize=1024, grace=0):
+        self.maxsize = maxsize
+        self.grace = grace
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def expires(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+        return entry[1] if entry else None
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= now:
+                # expired entries are kept for the grace period as a stale fallback
+                if expires + self.grace <= now:
+                    del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def get_stale(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] + self.grace <= now:
+                return None
+            return entry
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Persistent Store (shared by all workers)
+class SQLiteStore:
+    PURGE_EVERY = 500
+
+    def __init__(self, table, path=CACHE_DB, grace=0):
+        self.table = table
+        self.path = path
+        self.grace = grace
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self):
+        # one connection per thread and per process, never inherited across a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, now=None, stale=False):
+        now = time.time() if now is None else now
+        if stale:
+            now -= self.grace
+        row = self._connect().execute(
+            f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        return fastjson.loads(row[0]), row[1]
+
+    def set(self, key, value, expires):
+        conn = self._connect()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)",
+            (key, fastjson.dumps(value), expires)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute(f"DELETE FROM {self.table} WHERE expires <= ?", (time.time() - self.grace,))
+
+    def expires(self, key):
+        row = self._connect().execute(
+            f"SELECT expires FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def clear(self):
+        self._connect().execute(f"DELETE FROM {self.table}")
+
+
+# Tiered Cache: LRU in front of SQLite; without a usable cache directory it is memory-only
+class TieredCache:
+    def __init__(self, name, maxsize=1024, path=CACHE_DB, persistent=True, grace=0):
+        self.name = name
+        self.memory = LRUCache(maxsize, grace)
+        self.store = SQLiteStore(name, path, grace) if persistent else None
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stale_hits": 0, "errors": 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def get(self, key):
+        now = time.time()
+        value = self.memory.get(key, now)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.store is not None:
+            try:
+                row = self.store.get(key, now)
+            except (sqlite3.Error, OSError):
+                row = None
+                self._count("errors")
+            if row is not None:
+                value, expires = row
+                self.memory.set(key, value, expires)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def get_stale(self, key):
+        # (value, expires) of an entry past its expiry but still within the grace period
+        now = time.time()
+        entry = self.memory.get_stale(key, now)
+        if entry is None and self.store is not None:
+            try:
+                entry = self.store.get(key, now, stale=True)
+            except (sqlite3.Error, OSError):
+                self._count("errors")
+            if entry is not None:
+                self.memory.set(key, *entry)
+        if entry is not None:
+            self._count("stale_hits")
+        return entry
+
+    def set(self, key, value, ttl=None, expires=None):
+        if expires is None:
+            expires = time.time() + ttl
+        self.memory.set(key, value, expires)
+        if self.store is not None:
+            try:
+                self.store.set(key, value, expires)
+            except (sqlite3.Error, OSError):
+                self._count("errors")
+
+    def expires(self, key):
+        # the shared store is authoritative, another worker may have refreshed the entry
+        if self.store is not None:
+            try:
+                return self.store.expires(key)
+            except (sqlite3.Error, OSError):
+                self._count("errors")
+        return self.memory.expires(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.store is not None:
+            try:
+                self.store.clear()
+            except (sqlite3.Error, OSError):
+                self._count("errors")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
+
+
+# Geocoding Cache
+GEOCODE_TTL = int(os.environ.get("GEOCODE_TTL", 30 * 24 * 3600))
+GEOCODE_NEGATIVE_TTL = int(os.environ.get("GEOCODE_NEGATIVE_TTL", 10 * 60))
+GEOCODE_STALE_TTL = int(os.environ.get("GEOCODE_STALE_TTL", 30 * 24 * 3600))
+
+geocode_cache = TieredCache(
+    "geocode", maxsize=int(os.environ.get("GEOCODE_CACHE_SIZE", 1024)), grace=GEOCODE_STALE_TTL
+)
+
+
+# Forecast Cache
+# Open-Meteo serves ICON-D2 for Germany (~2 km grid) and refreshes current/hourly data every 15 minutes.
+FORECAST_GRID = float(os.environ.get("FORECAST_GRID", 0.02))
+FORECAST_TTL = int(os.environ.get("FORECAST_TTL", 15 * 60))
+FORECAST_TTL_OFFSET = int(os.environ.get("FORECAST_TTL_OFFSET", 60))
+# an expired forecast is shown (marked stale) while it is refreshed in the background for FORECAST_REVALIDATE_TTL;
+# up to FORECAST_STALE_TTL only while Open-Meteo is down or the refresh failed
+FORECAST_REVALIDATE_TTL = int(os.environ.get("FORECAST_REVALIDATE_TTL", FORECAST_TTL))
+FORECAST_STALE_TTL = int(os.environ.get("FORECAST_STALE_TTL", 3 * 3600))
+
+forecast_cache = TieredCache(
+    "forecast", maxsize=int(os.environ.get("FORECAST_CACHE_SIZE", 256)), grace=FORECAST_STALE_TTL
+)
+
+def quantize_coords(lat, lon, grid=FORECAST_GRID):
+    return round(round(lat / grid) * grid, 4), round(round(lon / grid) * grid, 4)
+
+def forecast_key(lat, lon):
+    return f"{lat:.4f},{lon:.4f}"
+
+def forecast_expiry(now=None, ttl=FORECAST_TTL, offset=FORECAST_TTL_OFFSET):
+    # expire on the next update boundary instead of a sliding window
+    now = time.time() if now is None else now
+    return (now - offset) // ttl * ttl + ttl + offset
+
+
+def cache_stats():
+    return {"geocode": geocode_cache.stats(), "forecast": forecast_cache.stats()}
@@ -0,0 +1,76 @@
+import gzip
+import os
+import time
+
+from cache import LRUCache
+from metrics import COMPRESSION_SECONDS, COMPRESSION_BYTES
+from static_assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get("RESPONSE_COMPRESSION", "1") == "1"
+# below about one MTU the header overhead and CPU are not worth it
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1400))
+# levels for per-request bodies, tuned for latency (see bench/compression_bench.py)
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+# fingerprinted Dash bundles never change, they are compressed harder once per worker
+STATIC_GZIP_LEVEL = int(os.environ.get("STATIC_GZIP_LEVEL", 9))
+STATIC_BROTLI_QUALITY = int(os.environ.get("STATIC_BROTLI_QUALITY", 9))
+
+COMPRESSIBLE = {
+    "application/json", "text/html", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "image/svg+xml",
+}
+
+static_bodies = LRUCache(int(os.environ.get("COMPRESS_STATIC_CACHE_SIZE", 64)))
+
+
+def choose_encoding(header):
+    encodings = accepted_encodings(header)
+    if brotli is not None and "br" in encodings:
+        return "br"
+    if "gzip" in encodings:
+        return "gzip"
+    return None
+
+def compress(data, encoding, static=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    return gzip.compress(data, STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+def is_static(path, response):
+    # Dash serves fingerprinted component bundles with a one-year max-age
+    return path.startswith("/_dash-component-suites/") and (response.cache_control.max_age or 0) > 0
+
+
+def compress_response(response, request, route):
+    if (not COMPRESSION_ENABLED or response.direct_passthrough or response.status_code != 200
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    static = is_static(request.path, response)
+    body = static_bodies.get((request.path, encoding)) if static else None
+    if body is None:
+        start = time.perf_counter()
+        body = compress(data, encoding, static)
+        COMPRESSION_SECONDS.observe(time.perf_counter() - start, route, encoding)
+        if static:
+            static_bodies.set((request.path, encoding), body, float("inf"))
+    COMPRESSION_BYTES.inc(route, encoding, "raw", value=len(data))
+    COMPRESSION_BYTES.inc(route, encoding, "sent", value=len(body))
+
+    response.set_data(body)
+    # the ETag is left alone: Dash compares If-None-Match against the hash of the plain body
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,59 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # optional: everything falls back to the stdlib encoder
+    orjson = None
+
+FAST_JSON = os.environ.get("FAST_JSON", "0") == "1"
+FAST_JSON_ENABLED = FAST_JSON and orjson is not None
+
+# same escaping plotly applies, the output may end up inside a <script> tag
+UNSAFE_CHARS = (("<", "\\u003c"), (">", "\\u003e"), ("/", "\\u002f"), ("\u2028", "\\u2028"), ("\u2029", "\\u2029"))
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def loads(data):
+    if FAST_JSON_ENABLED:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(value):
+    if FAST_JSON_ENABLED:
+        return orjson.dumps(value, option=ORJSON_OPTIONS).decode()
+    return json.dumps(value)
+
+
+# Dash Response Encoding
+def plotly_default(value):
+    # components, figures and Patch expose to_plotly_json; orjson only rejects non-contiguous arrays
+    if hasattr(value, "to_plotly_json"):
+        return value.to_plotly_json()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def to_json(value):
+    # plotly's own orjson engine retries through a full clean pass as soon as the tree holds a
+    # component, which is slower than the stdlib encoder for layouts; a default hook is not
+    try:
+        out = orjson.dumps(value, default=plotly_default, option=ORJSON_OPTIONS).decode()
+    except TypeError:
+        from plotly.io.json import to_json_plotly
+        return to_json_plotly(value)
+    for unsafe, safe in UNSAFE_CHARS:
+        if unsafe in out:
+            out = out.replace(unsafe, safe)
+    return out
+
+def install():
+    # Dash has no serializer setting; its modules import _utils.to_json by name
+    if not FAST_JSON_ENABLED:
+        return False
+    import dash._utils, dash._callback, dash._validate, dash.dash
+    for module in (dash._utils, dash._callback, dash._validate, dash.dash):
+        module.to_json = to_json
+    return True
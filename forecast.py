@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+
+from cache import LRUCache, FORECAST_TTL
+from metrics import timed
+
+HOURLY_VARIABLES = ("temperature_2m", "precipitation")
+DAILY_VARIABLES = ("temperature_2m_max", "temperature_2m_min", "precipitation_sum", "weather_code")
+
+def floats(values, n):
+    # missing values (None) become NaN, a missing or short column becomes all NaN
+    if not values or len(values) != n:
+        return np.full(n, np.nan)
+    return np.array(values, dtype=float)
+
+def day_range(times, day):
+    # [start, end) of the hourly rows on day; times must be sorted
+    day = np.datetime64(day, "D")
+    start, end = np.searchsorted(times, [day.astype(times.dtype), (day + 1).astype(times.dtype)])
+    return int(start), int(end)
+
+
+# Columnar Forecast: one parse per upstream response, shared by cards, sun arc and comparison
+class Forecast:
+    __slots__ = ("hourly_time", "hourly", "daily_time", "daily", "weather_code", "sunrise", "sunset", "day_bounds")
+
+    def __init__(self, payload):
+        hourly = payload.get("hourly") or {}
+        daily = payload.get("daily") or {}
+
+        self.hourly_time = np.array(hourly.get("time") or [], dtype="datetime64[m]")
+        n = len(self.hourly_time)
+        self.hourly = {name: floats(hourly.get(name), n) for name in HOURLY_VARIABLES}
+
+        self.daily_time = np.array(daily.get("time") or [], dtype="datetime64[D]")
+        days = len(self.daily_time)
+        self.daily = {name: floats(daily.get(name), days) for name in DAILY_VARIABLES}
+        self.weather_code = np.nan_to_num(self.daily["weather_code"]).astype(int)
+        self.sunrise = np.array(daily.get("sunrise") or [None] * days, dtype="datetime64[m]")
+        self.sunset = np.array(daily.get("sunset") or [None] * days, dtype="datetime64[m]")
+
+        # hourly rows of daily_time[i] are day_bounds[i]:day_bounds[i + 1]
+        self.day_bounds = np.searchsorted(
+            self.hourly_time, np.append(self.daily_time, self.daily_time[-1:] + 1).astype("datetime64[m]")
+        )
+
+    def __len__(self):
+        return len(self.daily_time)
+
+    def day_slice(self, day):
+        i = np.searchsorted(self.daily_time, np.datetime64(day, "D"))
+        if i < len(self.daily_time) and self.daily_time[i] == np.datetime64(day, "D"):
+            return slice(int(self.day_bounds[i]), int(self.day_bounds[i + 1]))
+        return slice(*day_range(self.hourly_time, day))
+
+
+forecast_columns = LRUCache(maxsize=256)
+
+@timed("parse")
+def parse_forecast(payload, cell=None):
+    # the requested cell and model run identify the response, the model's grid point does not:
+    # neighbouring cells snap to the same point but differ in elevation and downscaling
+    key = (cell, payload.get("elevation"), (payload.get("current") or {}).get("time"))
+    if cell is None or key[2] is None:
+        return Forecast(payload)
+    forecast = forecast_columns.get(key)
+    if forecast is None:
+        forecast = Forecast(payload)
+        forecast_columns.set(key, forecast, time.time() + FORECAST_TTL)
+    return forecast
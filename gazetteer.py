@@ -0,0 +1,169 @@
+import bisect
+import os
+import re
+import sys
+
+from cache import normalize_city
+
+GAZETTEER_PATH = os.environ.get(
+    "GAZETTEER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer_de.tsv")
+)
+GAZETTEER_ENABLED = os.environ.get("GAZETTEER_ENABLED", "1") == "1"
+SUGGEST_LIMIT = 8
+
+def index_key(name):
+    # "Halle (Saale)", "halle saale" and "Halle-Saale" share one key
+    return re.sub(r"[^a-z0-9]+", " ", normalize_city(name)).strip()
+
+def within_prefix_distance(query, key, max_edits):
+    # edit distance between query and the closest prefix of key, cut off at max_edits
+    previous = list(range(len(key) + 1))
+    for i, q in enumerate(query, 1):
+        current = [i]
+        for j, k in enumerate(key, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (q != k)))
+        if min(current) > max_edits:
+            return False
+        previous = current
+    return min(previous) <= max_edits
+
+
+# Offline Gazetteer
+class Gazetteer:
+    def __init__(self, names, lats, lons, populations, alternates):
+        self.names = names
+        self.lats = lats
+        self.lons = lons
+        self.populations = populations
+
+        # sorted (key, place) arrays for prefix search; places are ordered by population
+        entries = sorted({
+            (index_key(name), place)
+            for place, name in enumerate(names)
+            for name in [name] + alternates[place]
+            if index_key(name)
+        })
+        self.keys = [key for key, _ in entries]
+        self.places = [place for _, place in entries]
+        self.exact = {}
+        for key, place in entries:
+            if place < self.exact.get(key, len(names)):
+                self.exact[key] = place
+        # a key that is the leading words of a more populous place ("Halle" of "Halle (Saale)", "Neustadt" of
+        # "Neustadt an der Weinstraße") is ambiguous, Nominatim resolves it
+        for key, place in list(self.exact.items()):
+            for i in range(bisect.bisect_left(self.keys, key + " "), len(self.keys)):
+                if not self.keys[i].startswith(key + " "):
+                    break
+                if self.places[i] < place:
+                    del self.exact[key]
+                    break
+        self.buckets = {}
+        for key, place in entries:
+            self.buckets.setdefault(key[0], []).append((key, place))
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH):
+        names, lats, lons, populations, alternates = [], [], [], [], []
+        with open(path, encoding="utf-8") as f:
+            next(f)
+            for line in f:
+                name, alt, lat, lon, population = line.rstrip("\n").split("\t")
+                names.append(name)
+                alternates.append([a for a in alt.split(",") if a])
+                lats.append(float(lat))
+                lons.append(float(lon))
+                populations.append(int(population))
+        return cls(names, lats, lons, populations, alternates)
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, name):
+        place = self.exact.get(index_key(name))
+        if place is None:
+            return None
+        return self.lats[place], self.lons[place]
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        query = index_key(query)
+        if not query:
+            return []
+
+        found = set()
+        start = bisect.bisect_left(self.keys, query)
+        for i in range(start, len(self.keys)):
+            if not self.keys[i].startswith(query):
+                break
+            found.add(self.places[i])
+
+        # typo tolerance: one edit for short input, two from seven characters on
+        if len(found) < limit and len(query) >= 3:
+            max_edits = 1 if len(query) < 7 else 2
+            for key, place in self.buckets.get(query[0], ()):
+                if place not in found and within_prefix_distance(query, key[:len(query) + max_edits], max_edits):
+                    found.add(place)
+
+        return [self.names[place] for place in sorted(found)[:limit]]
+
+
+_gazetteer = None
+
+def get_gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer.load()
+    return _gazetteer
+
+
+# Build from a GeoNames dump: the country file (https://download.geonames.org/export/dump/DE.zip) or
+# cities5000.zip, both have the same columns
+GERMAN_SPELLING = re.compile(r"[A-Za-zÄÖÜäöüß .()'-]+")
+
+def keep_alternate(alternate, name):
+    # German spellings of the place, not the many foreign exonyms ("Monaco di Baviera" must not shadow Monaco):
+    # a spelling with umlauts or ß, or one that starts like the name. The name without its qualifier
+    # ("Brandenburg" of "Brandenburg an der Havel") is not kept, the qualifier is what tells places apart
+    if (alternate == name or len(alternate) > 40 or alternate.isupper() or not alternate[:1].isupper()
+            or not GERMAN_SPELLING.fullmatch(alternate) or index_key(name).startswith(index_key(alternate) + " ")):
+        return False
+    return bool(re.search("[ÄÖÜäöüß]", alternate)) or index_key(alternate)[:3] == index_key(name)[:3]
+
+def build(source, target=GAZETTEER_PATH, min_population=5000):
+    rows = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if cols[6] != "P" or cols[8] != "DE" or int(cols[14] or 0) < min_population:
+                continue
+            name = cols[1]
+            alternates = {}
+            for a in [cols[2]] + cols[3].split(","):
+                if a and keep_alternate(a, name):
+                    # folded duplicates ("München", "Muenchen") share one index key, one of them is enough
+                    alternates.setdefault(index_key(a), a)
+            rows.append((int(cols[14]), name, alternates, float(cols[4]), float(cols[5])))
+
+    # an alternate shared by several places is left to Nominatim; names stay, an exact lookup picks the most
+    # populous place
+    places = {}
+    for _, name, alternates, _, _ in rows:
+        for key in {index_key(name), *alternates}:
+            places[key] = places.get(key, 0) + 1
+    rows = [(population, name, [a for key, a in alternates.items() if places[key] == 1 and key != index_key(name)],
+             lat, lon) for population, name, alternates, lat, lon in rows]
+
+    rows.sort(key=lambda row: (-row[0], row[1]))
+    with open(target, "w", encoding="utf-8") as f:
+        f.write("name\talternatenames\tlatitude\tlongitude\tpopulation\n")
+        for population, name, alternates, lat, lon in rows:
+            f.write(f"{name}\t{','.join(alternates)}\t{lat:.4f}\t{lon:.4f}\t{population}\n")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "build":
+        sys.exit("usage: python gazetteer.py build DE.txt [min_population]")
+    count = build(sys.argv[2], min_population=int(sys.argv[3]) if len(sys.argv) > 3 else 5000)
+    print(f"wrote {count} places to {GAZETTEER_PATH}")
@@ -0,0 +1,32 @@
+import os
+
+from cache import CACHE_DIR
+
+BACKGROUND_CALLBACKS = os.environ.get("BACKGROUND_CALLBACKS", "0") == "1"
+
+diskcache = None
+if BACKGROUND_CALLBACKS:
+    # about 45 ms of worker boot, paid only when background callbacks are switched on
+    try:
+        import diskcache
+        import multiprocess
+        import psutil  # noqa: F401, DiskcacheManager needs it to cancel jobs
+        from dash import DiskcacheManager
+    except ImportError:  # optional: pip install "dash[diskcache]"
+        diskcache = None
+
+BACKGROUND_ENABLED = BACKGROUND_CALLBACKS and diskcache is not None
+BACKGROUND_POLL_INTERVAL = int(os.environ.get("BACKGROUND_POLL_INTERVAL", 250))
+JOBS_DIR = os.environ.get("BACKGROUND_JOBS_DIR", os.path.join(CACHE_DIR, "jobs"))
+
+
+# Background Callbacks: the callback runs in a job process, the worker thread only answers polls
+def callback_manager():
+    if not BACKGROUND_ENABLED:
+        return None
+    # one diskcache directory shared by all workers, a poll may land on any of them
+    return DiskcacheManager(diskcache.Cache(JOBS_DIR))
+
+def in_job():
+    # job processes are forked by multiprocess and exit as soon as their result is stored
+    return BACKGROUND_ENABLED and multiprocess.parent_process() is not None
@@ -0,0 +1,290 @@
+import bisect
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+from cache import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: retiring snapshots is serialised within the process only
+    fcntl = None
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(CACHE_DIR, "metrics"))
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+# a snapshot not rewritten for this long belongs to an exited or hung worker
+METRICS_STALE_AFTER = float(os.environ.get("METRICS_STALE_AFTER", max(30, 6 * METRICS_FLUSH_INTERVAL)))
+RETIRED = "retired.json"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COMPRESSION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+# Metric Types
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, value=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def values(self):
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        # per-bucket counts (not cumulative) plus the sum; cumulated on export
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 2)
+            entry[i] += 1
+            entry[-1] += value
+
+    def values(self):
+        with self._lock:
+            return [[list(labels), list(entry)] for labels, entry in self._values.items()]
+
+
+REGISTRY = []
+COLLECTORS = []
+
+def counter(name, documentation, labelnames=()):
+    metric = Counter(name, documentation, labelnames)
+    REGISTRY.append(metric)
+    return metric
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    metric = Histogram(name, documentation, labelnames, buckets)
+    REGISTRY.append(metric)
+    return metric
+
+def collector(fn):
+    # fn() -> {(name, documentation, labelnames[, kind]): [[labels, value], ...]}, read at flush time only;
+    # gauges are summed over live workers, so they have to be per-worker shares of the total
+    COLLECTORS.append(fn)
+    return fn
+
+
+UPSTREAM_SECONDS = histogram(
+    "weather_upstream_request_seconds", "Upstream request latency including retries.", ("service", "outcome"))
+STAGE_SECONDS = histogram(
+    "weather_render_stage_seconds", "Time spent in one stage of a dashboard callback.", ("stage",))
+UPSTREAM_REJECTED = counter(
+    "weather_upstream_rejected_total", "Upstream calls not made because the circuit breaker was open.", ("service",))
+CALLBACK_SECONDS = histogram(
+    "weather_callback_seconds", "Dash callback request latency.", ("callback",))
+CALLBACK_BYTES = histogram(
+    "weather_callback_response_bytes", "Dash callback response payload size.", ("callback",), BYTES_BUCKETS)
+COMPRESSION_SECONDS = histogram(
+    "weather_compression_seconds", "CPU time spent compressing one response.", ("route", "encoding"),
+    COMPRESSION_BUCKETS)
+COMPRESSION_BYTES = counter(
+    "weather_compression_bytes_total", "Response bytes before and after compression.", ("route", "encoding", "stage"))
+SCHEDULER_WAIT = histogram(
+    "weather_scheduler_wait_seconds", "Time a request queued for a rate-limited upstream slot.", ("scheduler", "priority"))
+ERRORS = counter(
+    "weather_errors_total", "Errors handled without failing the request.", ("where", "type"))
+
+
+def timed(stage):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+        return wrapper if METRICS_ENABLED else fn
+    return decorator
+
+def count_error(where, error):
+    ERRORS.inc(where, type(error).__name__)
+
+
+# Per-Worker Snapshots: every worker writes its own file, /metrics merges all of them
+def snapshot():
+    metrics = {
+        m.name: {"kind": m.kind, "help": m.documentation, "labelnames": list(m.labelnames),
+                 "buckets": list(getattr(m, "buckets", ())), "values": m.values()}
+        for m in REGISTRY
+    }
+    for fn in COLLECTORS:
+        for (name, documentation, labelnames, *kind), values in fn().items():
+            metrics[name] = {"kind": kind[0] if kind else "counter", "help": documentation, "labelnames": list(labelnames),
+                             "buckets": [], "values": values}
+    return metrics
+
+_worker = (None, None)
+
+def worker_id():
+    # pid plus start time, a recycled pid must not overwrite an exited worker's totals
+    global _worker
+    if _worker[0] != os.getpid():
+        _worker = (os.getpid(), f"{os.getpid()}-{int(time.time() * 1000)}")
+    return _worker[1]
+
+def flush():
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{worker_id()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(path + ".tmp", path)
+
+def alive(name, now):
+    # <pid>-<start ms>.json; a recycled pid keeps the old file from being rewritten, so it goes stale
+    path = os.path.join(METRICS_DIR, name)
+    try:
+        if now - os.path.getmtime(path) > METRICS_STALE_AFTER:
+            return False
+        if os.name == "posix":
+            os.kill(int(name.split("-")[0]), 0)
+    except (ProcessLookupError, ValueError, FileNotFoundError):
+        return False
+    except OSError:
+        pass  # the pid exists but belongs to another user
+    return True
+
+def read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def combine(result, worker, gauges=True):
+    for metric_name, metric in worker.items():
+        if metric["kind"] == "gauge" and not gauges:
+            continue
+        target = result.setdefault(metric_name, {**metric, "values": {}})
+        for labels, value in metric["values"]:
+            key = tuple(labels)
+            if isinstance(value, list):
+                current = target["values"].get(key, [0] * len(value))
+                target["values"][key] = [a + b for a, b in zip(current, value)]
+            else:
+                target["values"][key] = target["values"].get(key, 0) + value
+    return result
+
+def listed(result):
+    for metric in result.values():
+        metric["values"] = [[list(key), value] for key, value in metric["values"].items()]
+    return result
+
+_retire_lock = threading.Lock()
+
+def retire(names):
+    # exited workers' counters and histograms move into one file, their gauges are dropped
+    with _retire_lock, open(os.path.join(METRICS_DIR, ".lock"), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        retired_path = os.path.join(METRICS_DIR, RETIRED)
+        result = combine({}, read(retired_path) or {})
+        paths = [os.path.join(METRICS_DIR, name) for name in names]
+        workers = [(path, read(path)) for path in paths if os.path.exists(path)]
+        for _, worker in workers:
+            combine(result, worker or {}, gauges=False)
+        with open(retired_path + ".tmp", "w") as f:
+            json.dump(listed(result), f)
+        os.replace(retired_path + ".tmp", retired_path)
+        for path, _ in workers:
+            os.remove(path)
+
+def merged():
+    # counters of exited workers are kept in retired.json, so totals never go backwards
+    try:
+        flush()
+        now = time.time()
+        own = f"{worker_id()}.json"
+        names = [n for n in os.listdir(METRICS_DIR) if n.endswith(".json")]
+        dead = [n for n in names if n not in (own, RETIRED) and not alive(n, now)]
+    except OSError:
+        return snapshot()
+    if dead:
+        try:
+            retire(dead)
+            names = [n for n in os.listdir(METRICS_DIR) if n.endswith(".json")]
+        except OSError:
+            pass
+    result = {}
+    for name in names:
+        worker = read(os.path.join(METRICS_DIR, name))
+        if worker is not None:
+            # a dead worker whose file could not be retired still counts, its gauges do not
+            combine(result, worker, gauges=name not in dead)
+    return listed(result)
+
+
+# Prometheus Text Format
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def label_text(names, values, extra=""):
+    pairs = [f'{n}="{escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def render(metrics):
+    lines = []
+    for name, metric in sorted(metrics.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in metric["values"]:
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{label_text(metric['labelnames'], labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric["buckets"]) + ["+Inf"], value[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{label_text(metric['labelnames'], labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{label_text(metric['labelnames'], labels)} {value[-1]}")
+            lines.append(f"{name}_count{label_text(metric['labelnames'], labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class Flusher:
+    def __init__(self, interval=METRICS_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                flush()
+            except OSError:
+                pass
+
+    def start(self):
+        # one thread per worker process, like the cache warmer
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="metrics-flush", daemon=True).start()
+
+flusher = Flusher()
@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from cache import CACHE_DIR
+from metrics import SCHEDULER_WAIT
+
+SCHEDULER_DB = os.path.join(CACHE_DIR, "scheduler.sqlite3")
+
+# Nominatim usage policy: an absolute maximum of one request per second
+NOMINATIM_RATE = float(os.environ.get("NOMINATIM_RATE", 1.0))
+# slots are granted before the request is sent; the margin absorbs the jitter until it goes out
+NOMINATIM_SLOT_MARGIN = float(os.environ.get("NOMINATIM_SLOT_MARGIN", 0.05))
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+QUEUE_TIMEOUTS = {
+    INTERACTIVE: float(os.environ.get("NOMINATIM_QUEUE_TIMEOUT", 8)),
+    BACKGROUND: float(os.environ.get("NOMINATIM_BACKGROUND_QUEUE_TIMEOUT", 60)),
+}
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+# Cross-Process Request Scheduler: a token bucket of size one shared by all workers
+class RequestScheduler:
+    def __init__(self, name, rate, margin=0.0, path=SCHEDULER_DB):
+        self.name = name
+        self.interval = 1.0 / rate + margin
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._waiting = Counter()
+        self._stats = {"granted": 0, "timeouts": 0, "boosted": 0, "local": 0}
+        # fallback when the shared database cannot be opened: this process paced on its own
+        self._local_slot = threading.Lock()
+        self._local_last = 0.0
+
+    def _connect(self):
+        # same rules as SQLiteStore: one connection per thread and process
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY AUTOINCREMENT, scheduler TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, key TEXT, enqueued REAL NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS slots (scheduler TEXT PRIMARY KEY, last REAL NOT NULL)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _try_grant(self, conn, ticket, now):
+        # -> (seconds until the ticket can expect its slot, tickets ahead of it); (0, 0) once granted
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # tickets of crashed workers are dropped once no caller could still be waiting on them
+            conn.execute(
+                "DELETE FROM queue WHERE scheduler = ? AND enqueued < ?",
+                (self.name, now - max(QUEUE_TIMEOUTS.values()) - self.interval)
+            )
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM queue AS q, queue AS me WHERE me.id = ? AND q.scheduler = me.scheduler "
+                "AND (q.priority < me.priority OR q.priority = me.priority AND q.id < me.id)", (ticket,)
+            ).fetchone()[0]
+            row = conn.execute("SELECT last FROM slots WHERE scheduler = ?", (self.name,)).fetchone()
+            next_slot = (row[0] if row else 0.0) + self.interval
+            if ahead == 0 and now >= next_slot:
+                conn.execute("INSERT OR REPLACE INTO slots (scheduler, last) VALUES (?, ?)", (self.name, now))
+                conn.execute("DELETE FROM queue WHERE id = ?", (ticket,))
+                conn.execute("COMMIT")
+                return 0.0, 0
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return max(next_slot - now, 0.0) + ahead * self.interval, ahead
+
+    def _acquire_local(self, priority, timeout, start):
+        # no queue and no priorities, callers take the slots in lock order
+        if not self._local_slot.acquire(timeout=timeout):
+            self._count("timeouts")
+            raise QueueTimeout(f"{self.name}: no local slot within {timeout:g}s")
+        try:
+            now = time.time()
+            wait = self._local_last + self.interval - now
+            if now + wait - start > timeout:
+                self._count("timeouts")
+                raise QueueTimeout(f"{self.name}: no local slot within {timeout:g}s")
+            if wait > 0:
+                time.sleep(wait)
+            self._local_last = now = time.time()
+        finally:
+            self._local_slot.release()
+        self._count("granted")
+        self._count("local")
+        SCHEDULER_WAIT.observe(now - start, self.name, PRIORITY_NAMES[priority])
+        return now - start
+
+    def acquire(self, priority=INTERACTIVE, key=None):
+        # blocks until this caller may send one request; fails fast once the slot is out of reach
+        timeout = QUEUE_TIMEOUTS[priority]
+        start = time.time()
+        try:
+            conn = self._connect()
+            ticket = conn.execute(
+                "INSERT INTO queue (scheduler, priority, key, enqueued) VALUES (?, ?, ?, ?)",
+                (self.name, priority, key, start)
+            ).lastrowid
+        except (OSError, sqlite3.Error):
+            # an unusable cache directory must not stop geocoding; the rate then holds per worker only
+            return self._acquire_local(priority, timeout, start)
+        with self._lock:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                now = time.time()
+                wait, ahead = self._try_grant(conn, ticket, now)
+                if not wait:
+                    self._count("granted")
+                    SCHEDULER_WAIT.observe(now - start, self.name, PRIORITY_NAMES[priority])
+                    return now - start
+                if now + wait - start > timeout:
+                    self._count("timeouts")
+                    raise QueueTimeout(f"{self.name}: no slot within {timeout:g}s ({ahead} queued ahead)")
+                # the head sleeps until its slot, the others wake up about when they should be next
+                time.sleep(wait if not ahead else max(wait - self.interval, 0.01))
+        finally:
+            with self._lock:
+                self._waiting[priority] -= 1
+            conn.execute("DELETE FROM queue WHERE id = ?", (ticket,))
+
+    def boost(self, key, priority=INTERACTIVE):
+        # an interactive lookup coalesced onto a queued background one must not wait behind its priority
+        try:
+            changed = self._connect().execute(
+                "UPDATE queue SET priority = ? WHERE scheduler = ? AND key = ? AND priority > ?",
+                (priority, self.name, key, priority)
+            ).rowcount
+        except (OSError, sqlite3.Error):
+            return
+        if changed:
+            self._count("boosted")
+
+    def waiting(self):
+        # this process only; summed over the workers' metric files that is the queue depth
+        with self._lock:
+            return {PRIORITY_NAMES[p]: self._waiting[p] for p in PRIORITY_NAMES}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        return {**stats, "waiting": self.waiting(), "interval": self.interval}
+
+
+nominatim_scheduler = RequestScheduler("nominatim", NOMINATIM_RATE, NOMINATIM_SLOT_MARGIN)
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+from cache import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: coalesce within the process only
+    fcntl = None
+
+LOCK_DIR = os.path.join(CACHE_DIR, "locks")
+LOCK_BUCKETS = 256
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Request Coalescing
+class SingleFlight:
+    def __init__(self, name, cross_process=True):
+        self.name = name
+        self.cross_process = cross_process and fcntl is not None
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "cross_process_coalesced": 0, "lock_errors": 0}
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # calls in flight belong to threads that do not exist in the child, waiting on them never ends
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self._stats[counter] += n
+
+    def begin(self, key):
+        # returns the in-flight call for key and whether the caller has to execute it
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self._stats["executions"] += 1
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        call.result, call.error = result, error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.event.set()
+
+    def wait(self, call):
+        call.event.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, fn, recheck=None):
+        call, leader = self.begin(key)
+        if not leader:
+            return self.wait(call)
+        try:
+            with self.process_lock([key]):
+                result = recheck() if recheck is not None else None
+                if result is None:
+                    result = fn()
+                else:
+                    self.count("cross_process_coalesced")
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    @contextmanager
+    def process_lock(self, keys):
+        # other workers block here until the leader has written the shared cache
+        if not self.cross_process or not keys:
+            yield
+            return
+        buckets = sorted({int(hashlib.sha1(key.encode()).hexdigest(), 16) % LOCK_BUCKETS for key in keys})
+        files = []
+        try:
+            try:
+                os.makedirs(LOCK_DIR, exist_ok=True)
+                for bucket in buckets:
+                    f = open(os.path.join(LOCK_DIR, f"{self.name}-{bucket:03d}.lock"), "a")
+                    files.append(f)
+                    fcntl.flock(f, fcntl.LOCK_EX)
+            except OSError:
+                # an unusable lock directory costs the cross-process coalescing, not the request
+                self.count("lock_errors")
+            yield
+        finally:
+            for f in reversed(files):
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
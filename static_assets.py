@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+from io import BytesIO
+
+from cache import normalize_city
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+DIST_DIR = os.path.join(ASSETS_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+ASSET_PIPELINE = os.environ.get("ASSET_PIPELINE", "1") == "1"
+ASSET_SPRITE = os.environ.get("ASSET_SPRITE", "1") == "1"
+
+# icons are shown at 100 CSS px, twice that covers high-density screens
+ICON_SIZE = int(os.environ.get("ASSET_ICON_SIZE", 200))
+IMMUTABLE = "public, max-age=31536000, immutable"
+FINGERPRINT = re.compile(r"\.[0-9a-f]{10}\.\w+$")
+
+# preferred first; PNG is the fallback every browser takes
+IMAGE_FORMATS = (("image/avif", "avif"), ("image/webp", "webp"))
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", normalize_city(os.path.splitext(name)[0])).strip("-")
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+# Runtime: resolve original names to the build output
+class AssetManifest:
+    def __init__(self, files=None, variants=None, sprite=None, replaced=()):
+        self.files = files or {}
+        self.variants = variants or {}
+        self.sprite = sprite if ASSET_SPRITE else None
+        self.replaced = list(replaced)
+        if sprite and not ASSET_SPRITE:
+            self.replaced.append(os.path.basename(sprite["css"]))
+
+    @classmethod
+    def load(cls, path=MANIFEST_PATH):
+        if not ASSET_PIPELINE:
+            return cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError):
+            return cls()
+
+    def __bool__(self):
+        return bool(self.files)
+
+    def name(self, original):
+        return self.files.get(original, original)
+
+    def sprite_class(self, name):
+        return self.sprite["classes"].get(name) if self.sprite else None
+
+    def assets_ignore(self):
+        # Dash includes every stylesheet under assets/, either the originals or their build output
+        if not self:
+            return FINGERPRINT.pattern
+        return "^(" + "|".join(re.escape(name) for name in self.replaced) + ")$"
+
+    def variant(self, path, accept):
+        # path relative to assets/; an AVIF or WebP copy when the browser announces it
+        for mimetype, _ in IMAGE_FORMATS:
+            if mimetype in accept and mimetype in self.variants.get(path, {}):
+                return self.variants[path][mimetype]
+        return path
+
+
+def accepted_encodings(header):
+    encodings = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if token and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(token.lower())
+    return encodings
+
+
+# Build: python static_assets.py build
+def write(name, data):
+    # fingerprinted copy under dist/, returned relative to assets/
+    stem, ext = os.path.splitext(name)
+    target = f"{stem}.{fingerprint(data)}{ext}"
+    with open(os.path.join(DIST_DIR, target), "wb") as f:
+        f.write(data)
+    return f"dist/{target}"
+
+def precompress(path, data):
+    # served instead of the plain file when the browser accepts it; kept only when it saves bytes
+    full = os.path.join(ASSETS_DIR, path)
+    compressed = [(".gz", gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        compressed.append((".br", brotli.compress(data, quality=11, mode=brotli.MODE_TEXT)))
+    for suffix, body in compressed:
+        if len(body) < len(data):
+            with open(full + suffix, "wb") as f:
+                f.write(body)
+
+def encode_image(image, fmt):
+    out = BytesIO()
+    if fmt == "png":
+        image.save(out, "PNG", optimize=True)
+    elif fmt == "webp":
+        image.save(out, "WEBP", quality=85, method=6)
+    else:
+        image.save(out, "AVIF", quality=60, speed=4)
+    return out.getvalue()
+
+def supported_formats():
+    from PIL import features
+    return [(mimetype, ext) for mimetype, ext in IMAGE_FORMATS if features.check(ext)]
+
+def load_icon(path, size=ICON_SIZE):
+    from PIL import Image
+    image = Image.open(path).convert("RGBA")
+    image.thumbnail((size, size), Image.LANCZOS)
+    # non-square icons are centred on a transparent square, like object-fit: contain
+    canvas = Image.new("RGBA", (size, size))
+    canvas.paste(image, ((size - image.width) // 2, (size - image.height) // 2))
+    return canvas
+
+def build_icons(names, formats):
+    files, variants, icons = {}, {}, {}
+    for name in names:
+        icon = load_icon(os.path.join(ASSETS_DIR, name))
+        icons[name] = icon
+        png = write(f"{slug(name)}.png", encode_image(icon, "png"))
+        files[name] = png
+        variants[png] = {mimetype: write(f"{slug(name)}.{ext}", encode_image(icon, ext)) for mimetype, ext in formats}
+    return files, variants, icons
+
+def build_sprite(files, icons, formats, size=ICON_SIZE):
+    # one sheet for every icon; positions in percent so the sprite scales with the element
+    from PIL import Image
+    columns = math.ceil(math.sqrt(len(icons)))
+    rows = math.ceil(len(icons) / columns)
+    sheet = Image.new("RGBA", (columns * size, rows * size))
+    rules, classes = [], {}
+    for i, (name, icon) in enumerate(icons.items()):
+        col, row = i % columns, i // columns
+        sheet.paste(icon, (col * size, row * size))
+        cls = f"icon-{slug(name)}"
+        classes[files[name]] = cls
+        x = col / (columns - 1) * 100 if columns > 1 else 0
+        y = row / (rows - 1) * 100 if rows > 1 else 0
+        rules.append(f".{cls}{{background-position:{x:.4g}% {y:.4g}%}}")
+
+    png = write("icons.png", encode_image(sheet, "png"))
+    sources = [f'url("{os.path.basename(write(f"icons.{ext}", encode_image(sheet, ext)))}") type("{mimetype}")'
+               for mimetype, ext in formats]
+    sources.append(f'url("{os.path.basename(png)}") type("image/png")')
+    css = (
+        f'.icon-sprite{{display:block;background-repeat:no-repeat;'
+        f'background-size:{columns * 100}% {rows * 100}%;'
+        f'background-image:url("{os.path.basename(png)}");'
+        f'background-image:image-set({",".join(sources)})}}\n' + "\n".join(rules) + "\n"
+    ).encode()
+    path = write("icons.css", css)
+    precompress(path, css)
+    return {"css": path, "classes": classes}
+
+def build_stylesheets(names):
+    files = {}
+    for name in names:
+        with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+            data = f.read()
+        files[name] = write(name, data)
+        precompress(files[name], data)
+    return files
+
+def build():
+    # Pillow is imported by the build only, the app serves whatever the build left behind
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        sys.exit("the asset build needs Pillow: pip install Pillow")
+    if os.path.isdir(DIST_DIR):
+        for name in os.listdir(DIST_DIR):
+            os.remove(os.path.join(DIST_DIR, name))
+    os.makedirs(DIST_DIR, exist_ok=True)
+
+    names = sorted(os.listdir(ASSETS_DIR))
+    formats = supported_formats()
+    files, variants, icons = build_icons([n for n in names if n.endswith(".png")], formats)
+    sprite = build_sprite(files, icons, formats)
+    stylesheets = [n for n in names if n.endswith(".css")]
+    files.update(build_stylesheets(stylesheets))
+
+    manifest = {"files": files, "variants": variants, "sprite": sprite, "replaced": stylesheets}
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    return manifest
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        sys.exit("usage: python static_assets.py build")
+    manifest = build()
+    sizes = {}
+    for name in os.listdir(DIST_DIR):
+        ext = name.rsplit(".", 1)[-1]
+        sizes[ext] = sizes.get(ext, 0) + os.path.getsize(os.path.join(DIST_DIR, name))
+    print(f"{len(manifest['files'])} assets, sprite of {len(manifest['sprite']['classes'])} icons in {DIST_DIR}")
+    print("  " + ", ".join(f"{ext} {size / 1024:.0f} KB" for ext, size in sorted(sizes.items())))
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import fastjson
+from metrics import UPSTREAM_SECONDS, UPSTREAM_REJECTED
+
+NOMINATIM_URL = os.environ.get("NOMINATIM_URL", "https://nominatim.openstreetmap.org")
+OPEN_METEO_URL = os.environ.get("OPEN_METEO_URL", "https://api.open-meteo.com")
+OPEN_METEO_ARCHIVE_URL = os.environ.get("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com")
+
+USER_AGENT = "WeatherDashboardStudentProject/1.0"
+
+# (connect, read) in seconds
+GEOCODE_TIMEOUT = (
+    float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 2)),
+    float(os.environ.get("GEOCODE_READ_TIMEOUT", 5))
+)
+FORECAST_TIMEOUT = (
+    float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 2)),
+    float(os.environ.get("FORECAST_READ_TIMEOUT", 10))
+)
+ARCHIVE_TIMEOUT = (
+    float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 2)),
+    float(os.environ.get("ARCHIVE_READ_TIMEOUT", 20))
+)
+
+POOL_CONNECTIONS = int(os.environ.get("UPSTREAM_POOL_CONNECTIONS", 4))
+POOL_MAXSIZE = int(os.environ.get("UPSTREAM_POOL_MAXSIZE", 16))
+
+RETRY_TOTAL = int(os.environ.get("UPSTREAM_RETRIES", 3))
+RETRY_BACKOFF = float(os.environ.get("UPSTREAM_RETRY_BACKOFF", 0.3))
+RETRY_JITTER = float(os.environ.get("UPSTREAM_RETRY_JITTER", 0.2))
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Nominatim is paced by the request scheduler, a urllib3 retry would send outside of its slots
+NOMINATIM_RETRIES = int(os.environ.get("NOMINATIM_RETRIES", 0))
+
+# consecutive failed calls (after retries) that open a breaker, and seconds until the next probe
+BREAKER_THRESHOLD = int(os.environ.get("UPSTREAM_BREAKER_THRESHOLD", 5))
+BREAKER_RESET = float(os.environ.get("UPSTREAM_BREAKER_RESET", 30))
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+
+def build_adapter(retries):
+    # connect failures and RETRY_STATUS only: a read timeout already took the full read timeout and is
+    # re-raised as requests.ReadTimeout, not retried
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=False,
+        status=retries,
+        backoff_factor=RETRY_BACKOFF,
+        backoff_jitter=RETRY_JITTER,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    return HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+
+
+def build_session():
+    adapter = build_adapter(RETRY_TOTAL)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # the longest matching prefix wins
+    session.mount(f"{NOMINATIM_URL}/search", build_adapter(NOMINATIM_RETRIES))
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive"
+    })
+    return session
+
+
+def get_session():
+    # one pool per worker process; a session inherited through a gunicorn fork is discarded
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = build_session()
+                _session_pid = pid
+    return _session
+
+
+# Circuit Breaker: a known-bad upstream is not called again until the reset timeout has passed
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # exactly one caller probes, everyone else keeps failing fast until it reports back
+                self.state = "half_open"
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def is_open(self):
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    self._stats["opened"] += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, **self._stats}
+
+
+breakers = {}
+
+def breaker(service):
+    with _lock:
+        if service not in breakers:
+            breakers[service] = CircuitBreaker(service)
+        return breakers[service]
+
+def breaker_stats():
+    return {name: cb.stats() for name, cb in sorted(breakers.items())}
+
+
+def reject(service):
+    UPSTREAM_REJECTED.inc(service)
+    raise CircuitOpenError(f"{service} circuit open")
+
+
+def get(url, params=None, timeout=FORECAST_TIMEOUT, service="other", scheduler=None, priority=0, key=None,
+        **kwargs):
+    cb = breaker(service)
+    if scheduler is not None:
+        # paced upstreams queue for a slot first; nobody queues for an upstream known to be down
+        if cb.is_open():
+            reject(service)
+        scheduler.acquire(priority, key)
+    if not cb.allow():
+        reject(service)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        response = get_session().get(url, params=params, timeout=timeout, **kwargs)
+        outcome = "ok" if response.status_code < 400 else f"http_{response.status_code // 100}xx"
+        return response
+    except requests.Timeout:
+        outcome = "timeout"
+        raise
+    except requests.ConnectionError:
+        outcome = "connection_error"
+        raise
+    finally:
+        # a 4xx answer still means the upstream is up; retries are exhausted by now
+        if outcome == "ok" or outcome == "http_4xx" and response.status_code != 429:
+            cb.success()
+        else:
+            cb.failure()
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, service, outcome)
+
+
+def decode(response):
+    # forecast responses are the largest documents decoded per request; orjson when FAST_JSON=1
+    return fastjson.loads(response.content)
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from cache import CACHE_DB, CACHE_DIR, normalize_city
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+WARMER_ENABLED = os.environ.get("WARMER_ENABLED", "1") == "1"
+WARMER_SEEDS = [
+    name.strip() for name in os.environ.get(
+        "WARMER_SEEDS",
+        "Berlin,Hamburg,München,Köln,Frankfurt am Main,Stuttgart,Düsseldorf,Leipzig,Dortmund,Essen,Bremen,Dresden"
+    ).split(",") if name.strip()
+]
+WARMER_TOP_N = int(os.environ.get("WARMER_TOP_N", 20))
+WARMER_LEAD = int(os.environ.get("WARMER_LEAD", 120))
+WARMER_TICK = float(os.environ.get("WARMER_TICK", 5))
+WARMER_MAX_PER_TICK = int(os.environ.get("WARMER_MAX_PER_TICK", 4))
+WARMER_WINDOW = int(os.environ.get("WARMER_WINDOW", 24 * 3600))
+WARMER_LOCK = os.path.join(CACHE_DIR, "warmer.lock")
+
+
+# Background Cache Warmer
+class CacheWarmer:
+    def __init__(self, geocode, expires_of, refresh, seeds=WARMER_SEEDS, top_n=WARMER_TOP_N,
+                 lead=WARMER_LEAD, tick=WARMER_TICK, max_per_tick=WARMER_MAX_PER_TICK, path=CACHE_DB):
+        # geocode(name) -> (coords, error); expires_of(coords) -> timestamp or None; refresh(coords) -> bool
+        self.geocode = geocode
+        self.expires_of = expires_of
+        self.refresh = refresh
+        self.seeds = list(seeds)
+        self.top_n = top_n
+        self.lead = lead
+        self.tick = tick
+        self.max_per_tick = max_per_tick
+        self.path = path
+        self._pending = Counter()
+        self._names = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._leader_file = None
+        self._conn = None
+        self._conn_pid = None
+        self._stats = {"ticks": 0, "refreshes": 0, "failures": 0}
+
+    def record(self, city_name):
+        key = normalize_city(city_name)
+        with self._lock:
+            self._pending[key] += 1
+            self._names.setdefault(key, city_name)
+
+    # Request frequency, shared by all workers
+    def _connect(self):
+        # never reuse a connection across a fork (gunicorn workers, background-callback jobs)
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._conn_pid = os.getpid()
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS city_hits "
+                "(key TEXT PRIMARY KEY, name TEXT NOT NULL, hits INTEGER NOT NULL, last_seen REAL NOT NULL)"
+            )
+        return self._conn
+
+    def flush(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            pending, names = self._pending, self._names
+            self._pending, self._names = Counter(), {}
+        if not pending:
+            return
+        self._connect().executemany(
+            "INSERT INTO city_hits (key, name, hits, last_seen) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET hits = hits + excluded.hits, last_seen = excluded.last_seen",
+            [(key, names[key], hits, now) for key, hits in pending.items()]
+        )
+
+    def popular(self, now=None):
+        now = time.time() if now is None else now
+        rows = self._connect().execute(
+            "SELECT name FROM city_hits WHERE last_seen >= ? ORDER BY hits DESC LIMIT ?",
+            (now - WARMER_WINDOW, self.top_n)
+        ).fetchall()
+        cities = {}
+        for name in self.seeds + [row[0] for row in rows]:
+            cities.setdefault(normalize_city(name), name)
+        return list(cities.values())
+
+    # Scheduling
+    def jitter(self, city_name):
+        # a stable per-city offset spreads refreshes over the lead window instead of one burst
+        digest = hashlib.sha1(normalize_city(city_name).encode()).digest()
+        return int.from_bytes(digest[:4], "big") / 2 ** 32 * self.lead * 0.75
+
+    def due(self, city_name, coords, now):
+        expires = self.expires_of(coords)
+        if expires is None:
+            return True
+        return now >= expires - self.lead + self.jitter(city_name)
+
+    def run_once(self, now=None):
+        now = time.time() if now is None else now
+        self._stats["ticks"] += 1
+        refreshed = 0
+        for city_name in self.popular(now):
+            if refreshed >= self.max_per_tick:
+                break
+            coords, error = self.geocode(city_name)
+            if error or not self.due(city_name, coords, now):
+                continue
+            refreshed += 1
+            if self.refresh(coords):
+                self._stats["refreshes"] += 1
+            else:
+                self._stats["failures"] += 1
+        return refreshed
+
+    # Thread
+    def _is_leader(self):
+        # only one worker refreshes; the others keep flushing their request counts
+        if fcntl is None:
+            return True
+        if self._leader_file is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            f = open(WARMER_LOCK, "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+            self._leader_file = f
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.flush()
+                if self._is_leader():
+                    self.run_once()
+            except (sqlite3.Error, OSError):
+                self._stats["failures"] += 1
+
+    def start(self):
+        # started lazily per worker process, a thread from a pre-fork parent does not survive the fork
+        pid = os.getpid()
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._conn = None
+            self._leader_file = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {**self._stats, "leader": self._leader_file is not None, "seeds": len(self.seeds)}